@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProductionMachine, ProductionStatus
+
+ACTIVE = [ProductionStatus.STANDBY, ProductionStatus.ONGOING]
+
+
+# ✅ Agenda de máquinas.
+#
+# Cada vínculo ativo (produção STANDBY/ONGOING) ocupa a máquina:
+#   - na janela planned_start -> planned_end, se houver (e enquanto a produção estiver ONGOING);
+#   - de agora até a produção ser encerrada, se não houver (cadastro imediato).
+# Para uma janela de consulta, uma única query (índice machine, planned_start, planned_end)
+# traz os vínculos que a tocam. As janelas planejadas vão para o índice em memória; os
+# vínculos sem janela ficam à parte (não entram no índice como intervalos infinitos).
+
+class IntervalIndex:
+    """
+    Índice de intervalos semiabertos [início, fim) ordenados pelo início, com o maior fim
+    acumulado (prefix max). Equivale a uma árvore de intervalos aumentada achatada em arrays:
+
+    - overlaps(): O(log n) — algum intervalo começa antes de `end` e termina depois de `start`?
+    - conflicts(): O(log n + k) para reservas que não se sobrepõem entre si (o caso da agenda).
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in self.intervals]
+        self.max_end = list(accumulate((item[1] for item in self.intervals), max))
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def overlaps(self, start, end):
+        count = bisect_left(self.starts, end)  # intervalos que começam antes de `end`
+        return count > 0 and self.max_end[count - 1] > start
+
+    def conflicts(self, start, end):
+        count = bisect_left(self.starts, end)
+        found = []
+        for index in range(count - 1, -1, -1):
+            if self.max_end[index] <= start:
+                break  # nenhum intervalo daqui para trás termina depois de `start`
+            if self.intervals[index][1] > start:
+                found.append(self.intervals[index])
+        return found[::-1]
+
+    def free_slots(self, start, end, min_duration=timedelta(0)):
+        """Horários livres dentro de [start, end) com pelo menos `min_duration`."""
+        slots = []
+        first = bisect_right(self.starts, start)  # os anteriores já começaram: só importa o maior fim
+        cursor = max(start, self.max_end[first - 1]) if first else start
+        for busy_start, busy_end, _ in self.intervals[first:]:
+            if busy_start >= end:
+                break
+            if busy_start > cursor and busy_start - cursor >= min_duration:
+                slots.append((cursor, min(busy_start, end)))
+            cursor = max(cursor, busy_end)
+            if cursor >= end:
+                break
+        if cursor < end and end - cursor >= min_duration:
+            slots.append((cursor, end))
+        return slots
+
+
+def occupied_at(now):
+    """
+    Vínculos ativos que ocupam a máquina em `now`: sem janela, de produção já em andamento
+    ou com a janela planejada em curso. Reservas futuras não ocupam a máquina agora.
+    """
+    return Q(production__status__in=ACTIVE) & (
+        Q(planned_start__isnull=True)
+        | Q(production__status=ProductionStatus.ONGOING)
+        | Q(planned_start__lte=now, planned_end__gt=now)
+    )
+
+
+class MachineCalendar:
+    """Reservas de uma máquina: janelas planejadas (IntervalIndex) + vínculos sem janela."""
+
+    def __init__(self, intervals, held):
+        self.index = IntervalIndex(intervals)
+        # Vínculos sem janela ocupam a máquina de held_since (criação) até a produção ser encerrada
+        self.held = sorted(held, key=lambda pm: pm.created_at)
+        self.held_since = self.held[0].created_at if self.held else None
+
+    def conflicts(self, start, end):
+        held = [pm for pm in self.held if pm.created_at < end]
+        windows = [pm for _, _, pm in self.index.conflicts(start, end)]
+        return held + windows
+
+    def free_slots(self, start, end, min_duration=timedelta(0)):
+        if self.held_since is not None:
+            end = min(end, max(start, self.held_since))
+        return self.index.free_slots(start, end, min_duration) if end > start else []
+
+
+def load_calendar(machine_ids, start, end):
+    """machine_id -> MachineCalendar com os vínculos ativos que tocam [start, end)."""
+    bookings = (
+        ProductionMachine.objects.filter(machine_id__in=machine_ids, production__status__in=ACTIVE)
+        .filter(Q(planned_start__isnull=True) | Q(planned_start__lt=end, planned_end__gt=start))
+        .select_related("production", "machine")
+        .order_by("machine_id", "planned_start")
+    )
+
+    intervals = {machine_id: [] for machine_id in machine_ids}
+    held = {machine_id: [] for machine_id in machine_ids}
+    for pm in bookings:
+        if pm.planned_start is None:
+            held[pm.machine_id].append(pm)
+        else:
+            intervals[pm.machine_id].append((pm.planned_start, pm.planned_end, pm))
+    return {machine_id: MachineCalendar(intervals[machine_id], held[machine_id]) for machine_id in machine_ids}
+
+
+def find_conflicts(machine_ids, start, end):
+    """
+    Lista de ProductionMachine que impedem reservar as máquinas em [start, end): reservas
+    sobrepostas e vínculos sem janela (o fim deles não é conhecido).
+    """
+    calendar = load_calendar(machine_ids, start, end)
+    return [pm for machine_calendar in calendar.values() for pm in machine_calendar.conflicts(start, end)]
+
+
+def start_conflicts(production, now=None):
+    """
+    Vínculos de outras produções que ocupam agora as máquinas de `production`.
+    Ex.: produção sem janela que ainda está rodando quando a reserva seguinte começa.
+    """
+    now = now or timezone.now()
+    return list(
+        ProductionMachine.objects.filter(occupied_at(now))
+        .filter(machine_id__in=ProductionMachine.objects.filter(production=production).values("machine_id"))
+        .exclude(production=production)
+        .select_related("machine")
+    )
@@ -1,14 +1,15 @@
+THEME_COOKIE = "ui_theme"
+THEMES = ("light", "dark")
+
+
 def ui_theme(request):
     """
     Retorna o tema atual para templates.
-    Ordem:
-      1) session
-      2) cookie
-      3) default light
+    Lido apenas do cookie (sem acessar a sessão, evitando um SELECT por página):
+      1) cookie
+      2) default light
     """
-    theme = request.session.get("ui_theme")
-    if not theme:
-        theme = request.COOKIES.get("ui_theme")
-    if theme not in ["light", "dark"]:
+    theme = request.COOKIES.get(THEME_COOKIE)
+    if theme not in THEMES:
         theme = "light"
     return {"ui_theme": theme}
@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, StdDev
+from django.utils import timezone
+
+from . import memo
+from .models import ProductionMachine, ProductionMachineStatus
+
+
+# ✅ Previsão de término (ETA) a partir do histórico de working_time.
+#
+# O ajuste (fit) roda no banco: Count/Avg/StdDev de "minutos por unidade"
+# (working_time / quantity) das execuções FINISHED, agrupados por máquina, por modelo
+# de máquina e no geral. Quem ajusta é o comando fit_forecast (agendado); o resultado vai
+# para o cache e cada request só faz um cache.get_many (memorizado no request) e contas
+# simples em Python, sem tocar no histórico. Request nunca reajusta: sem parâmetros no
+# cache, a página sai sem ETA.
+
+PARAMS_CACHE_KEY = "forecast:params"
+# Cópia de vida longa: se o agendamento atrasar, serve os parâmetros antigos em vez de nada
+STALE_PARAMS_CACHE_KEY = "forecast:params:stale"
+MIN_SAMPLES = 3  # abaixo disso a média da máquina não é confiável: usa o modelo / geral
+Z_P90 = 1.2816  # quantil 90% da normal, para a estimativa "pessimista"
+
+
+@dataclass(frozen=True)
+class CycleStats:
+    samples: int
+    mean: float  # minutos por unidade
+    std: float
+
+    def minutes(self, quantity, z=0.0):
+        return max(self.mean + z * self.std, 0.0) * quantity
+
+
+@dataclass(frozen=True)
+class Estimate:
+    expected_at: object
+    p90_at: object
+    basis: str  # "máquina", "modelo" ou "geral"
+
+
+def _rows(queryset, key):
+    return {
+        row[key]: (row["samples"], row["mean"], row["std"] or 0.0)
+        for row in queryset
+        if row["samples"] >= MIN_SAMPLES
+    }
+
+
+def fit_params():
+    """Ajusta os parâmetros a partir das execuções finalizadas (3 queries agregadas)."""
+    history = ProductionMachine.objects.filter(
+        status=ProductionMachineStatus.FINISHED,
+        working_time__gt=0,
+        production__quantity__gt=0,
+    ).annotate(
+        rate=ExpressionWrapper(F("working_time") * 1.0 / F("production__quantity"), output_field=FloatField())
+    )
+    aggregates = {"samples": Count("id"), "mean": Avg("rate"), "std": StdDev("rate")}
+
+    overall = history.aggregate(**aggregates)
+    return {
+        "machines": _rows(history.values("machine_id").annotate(**aggregates), "machine_id"),
+        "models": _rows(history.values("machine__model").annotate(**aggregates), "machine__model"),
+        "global": (overall["samples"], overall["mean"], overall["std"] or 0.0) if overall["samples"] else None,
+        "fitted_at": timezone.now(),
+    }
+
+
+EMPTY_PARAMS = {"machines": {}, "models": {}, "global": None, "fitted_at": None}
+
+
+def refresh_params():
+    params = fit_params()
+    cache.set(PARAMS_CACHE_KEY, params, settings.FORECAST_PARAMS_TIMEOUT)
+    cache.set(STALE_PARAMS_CACHE_KEY, params, settings.FORECAST_STALE_PARAMS_TIMEOUT)
+    return params
+
+
+def cached_params():
+    """Parâmetros do cache (os recentes ou, na falta deles, a cópia antiga) ou None."""
+    found = cache.get_many([PARAMS_CACHE_KEY, STALE_PARAMS_CACHE_KEY])
+    return found.get(PARAMS_CACHE_KEY) or found.get(STALE_PARAMS_CACHE_KEY)
+
+
+@memo.memoized
+def get_forecaster(fit_if_missing=False):
+    """
+    Forecaster com os parâmetros do cache. Numa falta, só ajusta na hora com
+    fit_if_missing=True (comandos); nos requests a falta vira "sem ETA".
+    """
+    params = cached_params()
+    if params is None:
+        params = refresh_params() if fit_if_missing else EMPTY_PARAMS
+    return Forecaster(params)
+
+
+class Forecaster:
+    def __init__(self, params):
+        self.params = params
+
+    def stats_for(self, machine):
+        """Estatística mais específica disponível: da máquina, do modelo ou geral."""
+        for basis, row in (
+            ("máquina", self.params["machines"].get(machine.id)),
+            ("modelo", self.params["models"].get(machine.model)),
+            ("geral", self.params["global"]),
+        ):
+            if row is not None:
+                return basis, CycleStats(*row)
+        return None, None
+
+    def estimate_pm(self, pm, quantity, now=None):
+        """
+        ETA da execução: início (ou agora / início planejado, se ainda em STANDBY) + minutos/unidade * quantidade.
+        Uma execução já além do esperado passa a ter ETA "agora". None se encerrada ou sem histórico.
+        """
+        if pm.status not in (ProductionMachineStatus.STANDBY, ProductionMachineStatus.ONGOING):
+            return None
+        basis, stats = self.stats_for(pm.machine)
+        if stats is None:
+            return None
+
+        now = now or timezone.now()
+        if pm.status == ProductionMachineStatus.ONGOING and pm.started_at:
+            start = pm.started_at
+        else:
+            # Reserva futura (core/booking.py) começa no início planejado
+            start = max(pm.planned_start or now, now)
+        return Estimate(
+            expected_at=max(start + timedelta(minutes=stats.minutes(quantity)), now),
+            p90_at=max(start + timedelta(minutes=stats.minutes(quantity, Z_P90)), now),
+            basis=basis,
+        )
+
+    def estimate_production(self, production, production_machines, now=None):
+        """As máquinas trabalham em paralelo: a produção termina quando a última terminar."""
+        estimates = [self.estimate_pm(pm, production.quantity, now) for pm in production_machines]
+        estimates = [estimate for estimate in estimates if estimate is not None]
+        if not estimates:
+            return None
+        return Estimate(
+            expected_at=max(estimate.expected_at for estimate in estimates),
+            p90_at=max(estimate.p90_at for estimate in estimates),
+            basis=min((estimate.basis for estimate in estimates), key=["geral", "modelo", "máquina"].index),
+        )
+
+
+def forecast_open_work(user, now=None):
+    """
+    Para o dashboard: ETA de cada produção aberta e "livre em" de cada máquina ocupada,
+    com uma única query (execuções abertas do usuário com produção e máquina).
+    """
+    forecaster = get_forecaster()
+    now = now or timezone.now()
+    open_pms = (
+        ProductionMachine.objects.filter(
+            production__user=user,
+            status__in=[ProductionMachineStatus.STANDBY, ProductionMachineStatus.ONGOING],
+        )
+        .select_related("production", "machine")
+        .order_by("production_id", "id")
+    )
+
+    by_production = {}
+    machines = []
+    for pm in open_pms:
+        by_production.setdefault(pm.production_id, (pm.production, []))[1].append(pm)
+        machines.append((pm.machine, pm.production, forecaster.estimate_pm(pm, pm.production.quantity, now)))
+
+    productions = [
+        (production, forecaster.estimate_production(production, pms, now))
+        for production, pms in by_production.values()
+    ]
+    return productions, machines
@@ -1,8 +1,9 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from .models import Machine, Production, ProductionMachine, ProductionStatus, ProductionMachineStatus
-from .services import get_available_machines_for_user
+from django.forms.models import ModelChoiceIterator
+from django.utils import timezone
+from .models import Machine, Production
+from .services import available_machines, create_production, get_available_machines_for_user
 
 
 class MachineForm(forms.ModelForm):
@@ -41,8 +42,50 @@ class MachineForm(forms.ModelForm):
         return obj
 
 
+class _MemoChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        for obj in self.field.get_objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.get_objects())
+
+    def __bool__(self):
+        return bool(self.field.get_objects())
+
+
+class AvailableMachinesField(forms.ModelMultipleChoiceField):
+    """
+    ✅ Checkboxes de máquinas que renderizam E validam a partir da mesma lista
+    memorizada do request (services.available_machines), em vez de uma query para
+    montar o HTML e outra no clean().
+    """
+
+    iterator = _MemoChoiceIterator
+
+    def __init__(self, *args, **kwargs):
+        self.user = None
+        super().__init__(*args, **kwargs)
+
+    def get_objects(self):
+        return available_machines(self.user) if self.user is not None else []
+
+    def _check_values(self, value):
+        by_pk = {str(obj.pk): obj for obj in self.get_objects()}
+        selected = []
+        for pk in dict.fromkeys(str(v) for v in value):
+            if pk not in by_pk:
+                raise ValidationError(
+                    self.error_messages["invalid_choice"],
+                    code="invalid_choice",
+                    params={"value": pk},
+                )
+            selected.append(by_pk[pk])
+        return selected
+
+
 class ProductionCreateForm(forms.ModelForm):
-    machines = forms.ModelMultipleChoiceField(
+    machines = AvailableMachinesField(
         queryset=Machine.objects.none(),
         widget=forms.CheckboxSelectMultiple,
         required=True,
@@ -59,31 +102,79 @@ class ProductionCreateForm(forms.ModelForm):
 
         if self.user is not None:
             self.fields["machines"].queryset = get_available_machines_for_user(self.user)
+            self.fields["machines"].user = self.user
 
     def clean(self):
         cleaned = super().clean()
         if self.user is None:
             raise ValidationError("Usuário não informado.")
         machines = cleaned.get("machines")
-        if not machines or machines.count() == 0:
+        if not machines:
             raise ValidationError("Não é permitido cadastrar uma produção sem máquinas associadas.")
         return cleaned
 
-    @transaction.atomic
     def save(self, commit=True):
-        production = super().save(commit=False)
-        production.user = self.user
-        production.status = ProductionStatus.STANDBY
+        # ✅ Disponibilidade revalidada sob lock + um único bulk_create (ver services.create_production)
+        created = create_production(
+            self.user,
+            description=self.cleaned_data["description"],
+            quantity=self.cleaned_data["quantity"],
+            machine_ids=[m.id for m in self.cleaned_data["machines"]],
+        )
+        self.instance = created.production
+        return created.production
+
+
+class BookingForm(forms.ModelForm):
+    """
+    ✅ Reserva futura: produção STANDBY com janela planejada nas máquinas escolhidas.
+    Lista todas as máquinas do usuário; o conflito de agenda é checado em create_production.
+    """
 
-        if commit:
-            production.save()
+    machines = forms.ModelMultipleChoiceField(
+        queryset=Machine.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+        required=True,
+        label="Máquinas",
+    )
+    planned_start = forms.DateTimeField(
+        label="Início planejado",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+    )
+    planned_end = forms.DateTimeField(
+        label="Fim planejado",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+    )
 
-        machines = self.cleaned_data["machines"]
-        for m in machines:
-            ProductionMachine.objects.create(
-                production=production,
-                machine=m,
-                status=ProductionMachineStatus.STANDBY,
-            )
+    class Meta:
+        model = Production
+        fields = ["description", "quantity", "machines", "planned_start", "planned_end"]
 
-        return production
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user", None)
+        super().__init__(*args, **kwargs)
+
+        if self.user is not None:
+            self.fields["machines"].queryset = Machine.objects.filter(owner_user=self.user).order_by("model", "serialnumber")
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get("planned_start"), cleaned.get("planned_end")
+        if start and end and end <= start:
+            raise ValidationError("O fim planejado deve ser depois do início.")
+        # ✅ Janela já encerrada: a reserva nunca poderia ser iniciada (start_production)
+        if end and end <= timezone.now():
+            raise ValidationError("O fim planejado já passou.")
+        return cleaned
+
+    def save(self, commit=True):
+        created = create_production(
+            self.user,
+            description=self.cleaned_data["description"],
+            quantity=self.cleaned_data["quantity"],
+            machine_ids=[m.id for m in self.cleaned_data["machines"]],
+            planned_start=self.cleaned_data["planned_start"],
+            planned_end=self.cleaned_data["planned_end"],
+        )
+        self.instance = created.production
+        return created.production
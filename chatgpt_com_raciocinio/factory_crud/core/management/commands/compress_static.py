@@ -0,0 +1,50 @@
+import gzip
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import brotli  # opcional: gera .br apenas se o pacote estiver instalado
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".svg", ".json", ".txt", ".html", ".xml"}
+MIN_SIZE = 256  # bytes; arquivos menores não compensam a compressão
+
+
+class Command(BaseCommand):
+    help = "Gera variantes pré-comprimidas (.gz e, se disponível, .br) dos arquivos em STATIC_ROOT."
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT:
+            raise CommandError("STATIC_ROOT não configurado. Use factory_manager.settings_production.")
+
+        root = Path(settings.STATIC_ROOT)
+        if not root.is_dir():
+            raise CommandError(f"{root} não existe. Rode collectstatic antes.")
+
+        written = 0
+        for path in root.rglob("*"):
+            if not path.is_file() or path.suffix not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            data = path.read_bytes()
+            if len(data) < MIN_SIZE:
+                continue
+
+            gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz_data) < len(data):
+                Path(f"{path}.gz").write_bytes(gz_data)
+                written += 1
+
+            if brotli is not None:
+                br_data = brotli.compress(data, quality=11)
+                if len(br_data) < len(data):
+                    Path(f"{path}.br").write_bytes(br_data)
+                    written += 1
+
+        if brotli is None:
+            self.stdout.write("Pacote 'brotli' não instalado: apenas variantes .gz foram geradas.")
+        self.stdout.write(self.style.SUCCESS(f"{written} arquivos comprimidos gerados em {root}."))
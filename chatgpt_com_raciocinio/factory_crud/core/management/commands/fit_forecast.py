@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.forecast import refresh_params
+
+
+class Command(BaseCommand):
+    help = "Reajusta os parâmetros de previsão de ETA a partir do histórico e grava no cache."
+
+    def handle(self, *args, **options):
+        params = refresh_params()
+        overall = params["global"]
+        self.stdout.write(
+            f"Máquinas: {len(params['machines'])} | modelos: {len(params['models'])} | "
+            f"execuções: {overall[0] if overall else 0}"
+        )
+        if overall:
+            self.stdout.write(f"Geral: {overall[1]:.3f} ± {overall[2]:.3f} min/unidade")
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Executado em um processo novo (cold start de verdade): monta o WSGI e responde /healthz.
+BOOT_SCRIPT = """
+import io, json, time
+t0 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+app = get_wsgi_application()
+t1 = time.perf_counter()
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": "/healthz", "SERVER_NAME": "localhost",
+    "SERVER_PORT": "80", "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http",
+}
+status = []
+b"".join(app(environ, lambda s, h: status.append(s)))
+t2 = time.perf_counter()
+print(json.dumps({"setup_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000, "status": status[0]}))
+"""
+
+
+def package_key(module):
+    # django.contrib.admin, django.db, ... separados; demais módulos pelo pacote raiz.
+    parts = module.split(".")
+    if parts[0] != "django":
+        return parts[0]
+    return ".".join(parts[:3] if parts[1:2] == ["contrib"] else parts[:2])
+
+
+def parse_importtime(stderr):
+    """Soma o tempo cumulativo (us) dos imports de primeiro nível por pacote."""
+    per_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        depth = len(name) - len(name.lstrip(" "))
+        if depth == 1:  # import direto do script; os aninhados já estão no cumulativo
+            per_package[package_key(name.strip())] += int(cumulative_us)
+    return per_package
+
+
+class Command(BaseCommand):
+    help = "Mede o cold start (import por pacote, django.setup + WSGI, primeiro request em /healthz)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        runs = []
+        packages = defaultdict(list)
+
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result["process_ms"] = (time.perf_counter() - started) * 1000
+            runs.append(result)
+            for package, cumulative in parse_importtime(proc.stderr).items():
+                packages[package].append(cumulative)
+
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2]
+
+        self.stdout.write(f"Settings: {settings.SETTINGS_MODULE} ({len(runs)} execuções, mediana)")
+        self.stdout.write(f"  processo completo (python -> 1ª resposta): {median([r['process_ms'] for r in runs]):8.1f} ms")
+        self.stdout.write(f"  django.setup + WSGI:                       {median([r['setup_ms'] for r in runs]):8.1f} ms")
+        self.stdout.write(f"  primeiro request (/healthz):               {median([r['first_request_ms'] for r in runs]):8.1f} ms")
+        self.stdout.write(f"  status /healthz: {runs[-1]['status']}")
+
+        self.stdout.write("\nImport por pacote (cumulativo, ms):")
+        ranking = sorted(packages.items(), key=lambda item: median(item[1]), reverse=True)
+        for package, values in ranking[: options["top"]]:
+            self.stdout.write(f"  {package:<30} {median(values) / 1000:8.1f}")
@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.simulation.engine import monte_carlo
+from core.simulation.scenarios import NoHistoryError, build_scenarios
+
+
+METRICS = [
+    ("throughput_per_day", "Produções/dia", "{:8.2f}"),
+    ("mean_wait", "Espera média (min)", "{:8.1f}"),
+    ("p90_wait", "Espera p90 (min)", "{:8.1f}"),
+    ("utilization", "Utilização", "{:8.1%}"),
+    ("makespan", "Fim da última (min)", "{:8.0f}"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula a carga de produções sobre a frota de um usuário (Monte Carlo) e, opcionalmente, "
+        "compara com máquinas adicionais. Ex.: simulate_capacity joao --add-machines 5"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--days", type=int, default=7, help="Janela de carga (padrão: 7 dias)")
+        parser.add_argument("--synthetic", type=int, default=0, help="Gera N produções sintéticas em vez de reproduzir o histórico")
+        parser.add_argument("--add-machines", type=int, default=0)
+        parser.add_argument("--add-model", default=None, help="Modelo das máquinas adicionais (padrão: o mais comum da frota)")
+        parser.add_argument("--runs", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=None, help="Processos (padrão: número de CPUs)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Usuário {options['username']} não encontrado.")
+
+        try:
+            scenarios = build_scenarios(
+                user,
+                days=options["days"],
+                extra=options["add_machines"],
+                extra_model=options["add_model"],
+                synthetic=options["synthetic"],
+                seed=options["seed"],
+            )
+        except NoHistoryError as exc:
+            raise CommandError(str(exc))
+
+        if not scenarios[0].jobs:
+            raise CommandError("Nenhuma produção na janela. Use --synthetic N para gerar carga.")
+        if not scenarios[0].fleet:
+            raise CommandError("O usuário não tem máquinas.")
+
+        started = time.perf_counter()
+        results = [
+            monte_carlo(scenario, options["runs"], workers=options["workers"], seed=options["seed"])
+            for scenario in scenarios
+        ]
+        elapsed = time.perf_counter() - started
+
+        first = scenarios[0]
+        self.stdout.write(
+            f"{len(first.jobs)} produções em {options['days']} dias, {options['runs']} execuções por cenário "
+            f"({elapsed:.2f} s)\n"
+        )
+        header = f"{'':<22}" + "".join(f"{f'{s.name} ({len(s.fleet)} máq.)':>28}" for s in scenarios)
+        self.stdout.write(header)
+        for key, label, fmt in METRICS:
+            cells = []
+            for result in results:
+                mean, low, high = result.metrics[key]
+                cells.append(f"{fmt.format(mean)} [{fmt.format(low).strip()}–{fmt.format(high).strip()}]")
+            self.stdout.write(f"{label:<22}" + "".join(f"{cell:>28}" for cell in cells))
+        self.stdout.write("\n[p5–p95] entre as execuções do Monte Carlo.")
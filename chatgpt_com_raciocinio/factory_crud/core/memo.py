@@ -0,0 +1,82 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import models
+
+
+# ✅ Memória por request: o mesmo dado (máquinas disponíveis, produção do usuário...) é
+# carregado uma vez e reaproveitado por serviços, forms e views até o fim do request.
+_store = ContextVar("request_memo", default=None)
+
+
+class RequestMemoMiddleware:
+    """Abre a memória do request; fora de um request (shell, comandos) nada é memorizado."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _store.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _store.reset(token)
+
+
+def _key_part(value):
+    # Instâncias de model entram na chave por (label, pk), não por identidade do objeto
+    if isinstance(value, models.Model):
+        return (value._meta.label, value.pk)
+    return value
+
+
+def memoized(func):
+    """Memoriza o resultado de `func` por argumentos, durante o request atual."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        store = _store.get()
+        if store is None:
+            return func(*args, **kwargs)
+
+        key = (
+            func.__module__,
+            func.__qualname__,
+            tuple(_key_part(arg) for arg in args),
+            tuple(sorted((name, _key_part(value)) for name, value in kwargs.items())),
+        )
+        if key not in store:
+            store[key] = func(*args, **kwargs)
+        return store[key]
+
+    return wrapper
+
+
+def identity_get(model, pk, loader):
+    """
+    Identity map: devolve a instância de `model` com esse pk já carregada neste request
+    ou chama `loader()` e guarda o resultado.
+    """
+    store = _store.get()
+    if store is None:
+        return loader()
+
+    key = ("identity", model._meta.label, int(pk))
+    if key not in store:
+        store[key] = loader()
+    return store[key]
+
+
+def identity_put(instance):
+    """Registra (ou substitui) a instância no identity map, ex.: após um SELECT ... FOR UPDATE."""
+    store = _store.get()
+    if store is not None:
+        store[("identity", instance._meta.label, instance.pk)] = instance
+    return instance
+
+
+def clear():
+    """Descarta tudo o que foi memorizado (chamar depois de escritas que mudam os dados)."""
+    store = _store.get()
+    if store is not None:
+        store.clear()
@@ -0,0 +1,105 @@
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+HEALTHCHECK_PATH = "/healthz"
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=60"
+
+
+class HealthCheckMiddleware:
+    """
+    ✅ /healthz respondido antes de qualquer outro middleware (primeiro da lista).
+
+    Não passa por sessão, auth, CSRF nem mensagens e não depende de ALLOWED_HOSTS (probes
+    do orquestrador costumam chamar pelo IP do container). Faz só um SELECT 1 no banco.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path != HEALTHCHECK_PATH:
+            return self.get_response(request)
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError:
+            return JsonResponse({"status": "error", "database": "unavailable"}, status=503)
+        return JsonResponse({"status": "ok"})
+
+
+class StaticAssetMiddleware:
+    """
+    ✅ Serve STATIC_ROOT direto pelo app server (sem nginx), para o settings de produção.
+
+    - Arquivos com hash do manifest (styles.3f2a1c.css) recebem cache imutável de 1 ano.
+    - Usa as variantes pré-comprimidas (.br/.gz, geradas por compress_static) quando o
+      navegador aceita, sem comprimir nada em tempo de request.
+    - Qualquer outro path segue para as views normalmente.
+    """
+
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL
+        self.static_root = str(settings.STATIC_ROOT) if getattr(settings, "STATIC_ROOT", None) else None
+        self.hashed_names = self._load_hashed_names()
+
+    def _load_hashed_names(self):
+        if not self.static_root:
+            return set()
+        manifest = Path(self.static_root) / "staticfiles.json"
+        if not manifest.is_file():
+            return set()
+        with manifest.open() as fp:
+            return set(json.load(fp).get("paths", {}).values())
+
+    def __call__(self, request):
+        if self.static_root and request.path.startswith(self.static_url) and request.method in ("GET", "HEAD"):
+            response = self._serve(request, request.path[len(self.static_url):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def _serve(self, request, name):
+        try:
+            path = safe_join(self.static_root, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path)
+            served_path, encoding = self._pick_variant(request, path)
+            response = FileResponse(open(served_path, "rb"), content_type=content_type or "application/octet-stream")
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+            response.headers["Last-Modified"] = http_date(stat.st_mtime)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE if name in self.hashed_names else REVALIDATE_CACHE
+        return response
+
+    def _pick_variant(self, request, path):
+        accepted = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        for encoding, suffix in self.ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                return path + suffix, encoding
+        return path, None
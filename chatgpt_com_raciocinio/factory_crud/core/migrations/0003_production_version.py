@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_productionmachine_working_time"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="production",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="productionmachine",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
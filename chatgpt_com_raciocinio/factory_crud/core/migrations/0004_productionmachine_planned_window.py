@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_production_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productionmachine",
+            name="planned_start",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="productionmachine",
+            name="planned_end",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="productionmachine",
+            index=models.Index(fields=["machine", "planned_start", "planned_end"], name="pm_machine_planned"),
+        ),
+        migrations.AddConstraint(
+            model_name="productionmachine",
+            constraint=models.CheckConstraint(
+                check=(
+                    models.Q(planned_start__isnull=True, planned_end__isnull=True)
+                    | models.Q(planned_end__gt=models.F("planned_start"))
+                ),
+                name="pm_planned_window_valid",
+            ),
+        ),
+    ]
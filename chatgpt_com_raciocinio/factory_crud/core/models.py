@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
 
@@ -39,6 +40,40 @@ class BaseModel(models.Model):
         self.save(update_fields=["deleted_at"])
 
 
+class ConcurrentTransitionError(Exception):
+    """
+    ✅ Concorrência otimista: o registro mudou (version diferente) entre a leitura e a escrita.
+    É um erro "retentável": basta reler o registro e repetir a transição.
+    """
+
+
+class VersionedModel(BaseModel):
+    """
+    BaseModel + coluna version para compare-and-swap:
+      UPDATE ... SET ..., version = version + 1 WHERE id = ? AND version = ?
+    Nenhum lock é mantido entre a leitura e as validações feitas em Python.
+    """
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def _compare_and_swap(self, field_names):
+        now = timezone.now()
+        values = {name: getattr(self, name) for name in field_names}
+        updated = type(self).all_objects.filter(pk=self.pk, version=self.version).update(
+            **values,
+            updated_at=now,
+            version=F("version") + 1,
+        )
+        if not updated:
+            raise ConcurrentTransitionError(
+                f"{type(self).__name__} #{self.pk} foi alterado por outra operação. Tente novamente."
+            )
+        self.version += 1
+        self.updated_at = now
+
+
 class ProductionStatus(models.TextChoices):
     STANDBY = "STANDBY", "STANDBY"
     ONGOING = "ONGOING", "ONGOING"
@@ -67,7 +102,7 @@ class Machine(BaseModel):
         return f"{self.model} / {self.serialnumber}"
 
 
-class Production(BaseModel):
+class Production(VersionedModel):
     description = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
     user = models.ForeignKey(
@@ -84,8 +119,9 @@ class Production(BaseModel):
         return f"Production #{self.id} - {self.description}"
 
     def can_finish(self) -> bool:
-        machines = self.production_machines.all()
-        if not machines.exists():
+        # Uma única query (ou nenhuma, se production_machines já veio no prefetch)
+        machines = list(self.production_machines.all())
+        if not machines:
             return False
         return all(pm.status not in [ProductionMachineStatus.STANDBY, ProductionMachineStatus.ONGOING] for pm in machines)
 
@@ -98,10 +134,10 @@ class Production(BaseModel):
             self.finished_at = now
         if new_status == ProductionStatus.CANCELED and self.canceled_at is None:
             self.canceled_at = now
-        self.save()
+        self._compare_and_swap(["status", "started_at", "finished_at", "canceled_at"])
 
 
-class ProductionMachine(BaseModel):
+class ProductionMachine(VersionedModel):
     production = models.ForeignKey(
         Production,
         on_delete=models.CASCADE,
@@ -120,9 +156,24 @@ class ProductionMachine(BaseModel):
     # ✅ Incremental: tempo total de operação (minutos)
     working_time = models.PositiveIntegerField(default=0)
 
+    # ✅ Agenda: janela planejada de uso da máquina (core/booking.py).
+    # Sem janela, o vínculo ativo ocupa a máquina por tempo indeterminado (comportamento original).
+    planned_start = models.DateTimeField(null=True, blank=True)
+    planned_end = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["production", "machine"], name="uniq_production_machine_pair"),
+            models.CheckConstraint(
+                check=(
+                    models.Q(planned_start__isnull=True, planned_end__isnull=True)
+                    | models.Q(planned_end__gt=models.F("planned_start"))
+                ),
+                name="pm_planned_window_valid",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["machine", "planned_start", "planned_end"], name="pm_machine_planned"),
         ]
 
     def __str__(self):
@@ -172,4 +223,4 @@ class ProductionMachine(BaseModel):
         # ✅ calcula working_time automaticamente quando encerrar
         self._recalculate_working_time_if_possible()
 
-        self.save()
+        self._compare_and_swap(["status", "started_at", "finished_at", "canceled_at", "working_time"])
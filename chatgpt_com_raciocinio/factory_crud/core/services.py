@@ -1,27 +1,36 @@
-from django.db.models import Q, Subquery
-from .models import Machine, Production, ProductionMachine, ProductionStatus
+from dataclasses import dataclass
 
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
 
-def get_available_machines_for_user(user):
+from . import memo
+from .booking import find_conflicts, occupied_at
+from .models import Machine, Production, ProductionMachine, ProductionMachineStatus, ProductionStatus
+
+
+def get_available_machines_for_user(user, now=None):
     """
     Regra de negócio:
     - só máquinas do usuário
-    - não pode selecionar máquina que já esteja vinculada a outra produção
-      que ainda não foi finalizada ou cancelada (status STANDBY/ONGOING)
+    - não pode selecionar máquina ocupada agora por outra produção STANDBY/ONGOING:
+      vínculo sem janela, produção em andamento ou reserva com a janela em curso.
+      Reservas futuras não bloqueiam o uso imediato (core/booking.py).
     """
-    active_production_ids = Production.objects.filter(
-        status__in=[ProductionStatus.STANDBY, ProductionStatus.ONGOING]
-    ).values("id")
-
-    busy_machine_ids = ProductionMachine.objects.filter(
-        production_id__in=Subquery(active_production_ids),
-    ).values("machine_id")
+    busy_machine_ids = ProductionMachine.objects.filter(occupied_at(now or timezone.now())).values("machine_id")
 
     return Machine.objects.filter(owner_user=user).exclude(id__in=Subquery(busy_machine_ids))
 
 
+@memo.memoized
+def available_machines(user):
+    """Lista das máquinas disponíveis, carregada uma vez por request (form, validação e dashboard)."""
+    return list(get_available_machines_for_user(user).order_by("model", "serialnumber"))
+
+
 def get_machine_counts_for_dashboard(user):
-    available = get_available_machines_for_user(user).count()
+    available = len(available_machines(user))
 
     active_production_ids = Production.objects.filter(
         user=user,
@@ -37,3 +46,69 @@ def get_machine_counts_for_dashboard(user):
         "available": available,
         "used": used,
     }
+
+
+@dataclass
+class CreatedProduction:
+    production: Production
+    production_machines: list
+
+
+@transaction.atomic
+def create_production(user, description, quantity, machine_ids, planned_start=None, planned_end=None):
+    """
+    ✅ Cria a produção e todos os vínculos com um número fixo de queries, qualquer que
+    seja a quantidade de máquinas:
+
+    1. trava as máquinas selecionadas do usuário (SELECT ... FOR UPDATE);
+    2. uma única query verifica se alguma delas está ocupada agora por outra produção
+       STANDBY/ONGOING (feita depois do lock, para enxergar produções criadas em paralelo);
+       com janela planejada, só conflitam as reservas que se sobrepõem a ela (core/booking.py);
+    3. INSERT da produção + um bulk_create de ProductionMachine.
+    """
+    machine_ids = {int(machine_id) for machine_id in machine_ids}
+    if not machine_ids:
+        raise ValidationError("Não é permitido cadastrar uma produção sem máquinas associadas.")
+
+    machines = list(
+        Machine.objects.select_for_update()
+        .filter(owner_user=user, id__in=machine_ids)
+        .order_by("id")
+    )
+    if len(machines) != len(machine_ids):
+        raise ValidationError("Você só pode selecionar máquinas de sua propriedade.")
+
+    if planned_start is not None:
+        conflicts = find_conflicts(machine_ids, planned_start, planned_end)
+        if conflicts:
+            raise ValidationError(
+                "Conflito de agenda: "
+                + "; ".join(f"{pm.machine} já reservada para a produção #{pm.production_id}" for pm in conflicts)
+                + "."
+            )
+    else:
+        busy = ProductionMachine.objects.filter(occupied_at(timezone.now()), machine_id__in=machine_ids).exists()
+        if busy:
+            raise ValidationError("Uma ou mais máquinas selecionadas já estão vinculadas a outra produção ativa.")
+
+    production = Production.objects.create(
+        user=user,
+        description=description,
+        quantity=quantity,
+        status=ProductionStatus.STANDBY,
+    )
+    production_machines = ProductionMachine.objects.bulk_create(
+        [
+            ProductionMachine(
+                production=production,
+                machine=machine,
+                status=ProductionMachineStatus.STANDBY,
+                planned_start=planned_start,
+                planned_end=planned_end,
+            )
+            for machine in machines
+        ]
+    )
+    # As máquinas escolhidas deixaram de estar disponíveis: descarta o que foi memorizado
+    memo.clear()
+    return CreatedProduction(production=production, production_machines=production_machines)
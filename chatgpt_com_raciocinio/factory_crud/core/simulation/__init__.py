@@ -0,0 +1,8 @@
+"""
+Simulação de eventos discretos da fábrica, para planejamento de capacidade.
+
+- engine.py: motor puro em Python (heapq + random), sem Django, para poder rodar em
+  processos separados no Monte Carlo.
+- scenarios.py: monta os cenários a partir do banco (frota do usuário, histórico de
+  produções e distribuições de working_time ajustadas em core/forecast.py).
+"""
@@ -0,0 +1,153 @@
+import heapq
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from statistics import fmean
+
+
+@dataclass(frozen=True)
+class Job:
+    """Uma produção: chega em `arrival` (minutos) e ocupa `machines` máquinas em paralelo."""
+
+    arrival: float
+    quantity: int
+    machines: int
+
+
+@dataclass(frozen=True)
+class SimMachine:
+    """Máquina da frota com a distribuição de minutos por unidade (média, desvio)."""
+
+    label: str
+    mean: float
+    std: float
+
+    def sample_minutes(self, rng, quantity):
+        # Normal truncada: tempos negativos viram 0 (máquina "instantânea" não faz sentido, mas é raro)
+        return max(rng.gauss(self.mean, self.std), 0.0) * quantity
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    fleet: tuple
+    jobs: tuple
+    horizon: float  # minutos considerados para throughput/utilização
+
+
+@dataclass
+class RunResult:
+    completed: int
+    throughput_per_day: float
+    mean_wait: float
+    p90_wait: float
+    utilization: float
+    makespan: float
+
+
+@dataclass
+class MonteCarloResult:
+    scenario: str
+    runs: int
+    metrics: dict = field(default_factory=dict)  # métrica -> (média, p5, p95)
+
+
+ARRIVAL, RELEASE = 0, 1
+
+
+def _percentile(values, q):
+    """Percentil pelo método nearest-rank."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
+
+
+def simulate(scenario, seed):
+    """
+    Uma execução. Eventos em um heap (tempo, seq, tipo, dado):
+    - ARRIVAL: a produção entra na fila (FIFO);
+    - RELEASE: uma máquina termina sua parte e volta para o pool livre.
+    Sempre que algo muda, a produção da frente da fila começa se houver máquinas livres
+    suficientes; cada máquina sorteia seu tempo (STANDBY -> ONGOING -> FINISHED) e a
+    produção termina quando a última máquina terminar.
+    """
+    rng = random.Random(seed)
+    fleet = scenario.fleet
+    fleet_size = len(fleet)
+    free = list(range(fleet_size))
+    busy_minutes = 0.0
+
+    events = []
+    seq = 0
+    for job_index, job in enumerate(scenario.jobs):
+        heapq.heappush(events, (job.arrival, seq, ARRIVAL, job_index))
+        seq += 1
+
+    queue = []
+    waits = []
+    finish_times = []
+    now = 0.0
+
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if kind == ARRIVAL:
+            queue.append(payload)
+        else:
+            free.append(payload)
+
+        while queue:
+            job = scenario.jobs[queue[0]]
+            needed = min(job.machines, fleet_size)
+            if len(free) < needed:
+                break
+            queue.pop(0)
+            waits.append(now - job.arrival)
+            # Máquinas mais rápidas primeiro (o planejador escolhe as melhores livres)
+            free.sort(key=lambda index: fleet[index].mean)
+            chosen, free = free[:needed], free[needed:]
+            job_end = now
+            for index in chosen:
+                minutes = fleet[index].sample_minutes(rng, job.quantity)
+                busy_minutes += minutes
+                job_end = max(job_end, now + minutes)
+                heapq.heappush(events, (now + minutes, seq, RELEASE, index))
+                seq += 1
+            finish_times.append(job_end)
+
+    horizon_days = max(scenario.horizon, 1.0) / 1440.0
+    elapsed = max(scenario.horizon, now, 1.0)
+    return RunResult(
+        completed=len(finish_times),
+        throughput_per_day=sum(1 for end in finish_times if end <= scenario.horizon) / horizon_days,
+        mean_wait=fmean(waits) if waits else 0.0,
+        p90_wait=_percentile(waits, 0.9),
+        utilization=busy_minutes / (fleet_size * elapsed) if fleet_size else 0.0,
+        makespan=now,
+    )
+
+
+def _run_batch(scenario, seeds):
+    # Um lote de seeds por processo: o cenário é serializado uma vez por lote, não por execução
+    return [simulate(scenario, seed) for seed in seeds]
+
+
+def monte_carlo(scenario, runs, workers=None, seed=0):
+    """Repete a simulação `runs` vezes (seeds seed..seed+runs-1), em paralelo entre processos."""
+    seeds = list(range(seed, seed + runs))
+    workers = max(1, min(workers or os.cpu_count() or 1, runs))
+
+    if workers == 1:
+        results = _run_batch(scenario, seeds)
+    else:
+        batches = [seeds[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [result for batch in pool.map(_run_batch, [scenario] * workers, batches) for result in batch]
+
+    metrics = {}
+    for name in ("throughput_per_day", "mean_wait", "p90_wait", "utilization", "makespan"):
+        values = [getattr(result, name) for result in results]
+        metrics[name] = (fmean(values), _percentile(values, 0.05), _percentile(values, 0.95))
+    return MonteCarloResult(scenario=scenario.name, runs=runs, metrics=metrics)
@@ -0,0 +1,105 @@
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+
+from ..forecast import get_forecaster
+from ..models import Machine, Production
+from .engine import Job, Scenario, SimMachine
+
+
+class NoHistoryError(Exception):
+    """Não há execuções finalizadas para estimar os tempos de ciclo."""
+
+
+def build_fleet(user, extra=0, extra_model=None):
+    """
+    Frota do usuário, cada máquina com a distribuição de minutos/unidade mais específica
+    (máquina, modelo ou geral). `extra` máquinas hipotéticas de `extra_model` (padrão: o
+    modelo mais comum da frota) entram no cenário "e se".
+    """
+    forecaster = get_forecaster(fit_if_missing=True)
+    machines = list(Machine.objects.filter(owner_user=user).order_by("id"))
+
+    fleet = []
+    for machine in machines:
+        _, stats = forecaster.stats_for(machine)
+        if stats is None:
+            raise NoHistoryError("Sem execuções finalizadas para estimar os tempos de ciclo.")
+        fleet.append(SimMachine(label=str(machine), mean=stats.mean, std=stats.std))
+
+    if extra:
+        if extra_model is None and machines:
+            extra_model = Counter(machine.model for machine in machines).most_common(1)[0][0]
+        _, stats = forecaster.stats_for(Machine(model=extra_model or ""))
+        if stats is None:
+            raise NoHistoryError("Sem execuções finalizadas para estimar os tempos de ciclo.")
+        fleet.extend(
+            SimMachine(label=f"{extra_model} / nova-{n}", mean=stats.mean, std=stats.std)
+            for n in range(1, extra + 1)
+        )
+    return tuple(fleet)
+
+
+def _history(user, since):
+    return list(
+        Production.objects.filter(user=user, created_at__gte=since)
+        .annotate(machine_count=Count("production_machines"))
+        .filter(machine_count__gt=0)
+        .order_by("created_at")
+        .values_list("created_at", "quantity", "machine_count")
+    )
+
+
+def replay_jobs(user, days, now=None):
+    """Reproduz as produções criadas nos últimos `days` dias, nos mesmos instantes relativos."""
+    now = now or timezone.now()
+    since = now - timedelta(days=days)
+    return tuple(
+        Job(arrival=(created_at - since).total_seconds() / 60.0, quantity=quantity, machines=machine_count)
+        for created_at, quantity, machine_count in _history(user, since)
+    )
+
+
+def synthetic_jobs(user, days, count, seed=0, now=None):
+    """
+    Carga sintética: `count` produções em `days` dias com chegadas de Poisson; quantidade e
+    número de máquinas sorteados juntos do histórico do usuário (últimos 90 dias).
+    """
+    now = now or timezone.now()
+    samples = [(quantity, machine_count) for _, quantity, machine_count in _history(user, now - timedelta(days=90))]
+    if not samples:
+        raise NoHistoryError("Sem produções recentes para sintetizar a carga.")
+
+    rng = random.Random(seed)
+    mean_gap = days * 1440.0 / count
+    jobs = []
+    arrival = 0.0
+    for _ in range(count):
+        arrival += rng.expovariate(1.0 / mean_gap)
+        quantity, machine_count = rng.choice(samples)
+        jobs.append(Job(arrival=arrival, quantity=quantity, machines=machine_count))
+    return tuple(jobs)
+
+
+def build_scenarios(user, days, extra=0, extra_model=None, synthetic=None, seed=0):
+    """Cenário atual e, se `extra` > 0, o mesmo workload com as máquinas adicionais."""
+    if synthetic:
+        jobs = synthetic_jobs(user, days, synthetic, seed=seed)
+    else:
+        jobs = replay_jobs(user, days)
+
+    horizon = days * 1440.0
+    scenarios = [Scenario(name="atual", fleet=build_fleet(user), jobs=jobs, horizon=horizon)]
+    if extra:
+        scenarios.append(
+            Scenario(
+                name=f"+{extra} máquinas",
+                fleet=build_fleet(user, extra=extra, extra_model=extra_model),
+                jobs=jobs,
+                horizon=horizon,
+            )
+        )
+    return scenarios
@@ -0,0 +1,346 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.booking import IntervalIndex, MachineCalendar
+from core.forecast import (
+    EMPTY_PARAMS,
+    PARAMS_CACHE_KEY,
+    STALE_PARAMS_CACHE_KEY,
+    Forecaster,
+    fit_params,
+    get_forecaster,
+    refresh_params,
+)
+from core.forms import BookingForm, ProductionCreateForm
+from core.memo import RequestMemoMiddleware
+from core.models import (
+    ConcurrentTransitionError,
+    Machine,
+    Production,
+    ProductionMachine,
+    ProductionMachineStatus,
+    ProductionStatus,
+)
+from core.services import available_machines, create_production
+from core.views import TRANSITION_ATTEMPTS, lifecycle_transition
+
+User = get_user_model()
+
+BASE = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def at(hours):
+    return BASE + timedelta(hours=hours)
+
+
+def make_user(username):
+    return User.objects.create_user(username=username, email=f"{username}@example.com", password="x", name=username)
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def setUp(self):
+        # [1h, 10h) contém [3h, 4h): a reserva aninhada termina antes da que a envolve
+        self.index = IntervalIndex([
+            (at(3), at(4), "aninhada"),
+            (at(0), at(2), "primeira"),
+            (at(1), at(10), "longa"),
+            (at(12), at(14), "última"),
+        ])
+
+    def names(self, start, end):
+        return [name for _, _, name in self.index.conflicts(at(start), at(end))]
+
+    def test_overlapping_windows_conflict(self):
+        self.assertEqual(self.names(1.5, 3.5), ["primeira", "longa", "aninhada"])
+        self.assertTrue(self.index.overlaps(at(13), at(20)))
+
+    def test_touching_windows_do_not_conflict(self):
+        # Intervalos semiabertos: terminar às 12h não conflita com começar às 12h
+        self.assertEqual(self.names(10, 12), [])
+        self.assertFalse(self.index.overlaps(at(14), at(15)))
+
+    def test_window_nested_in_a_long_booking_is_found_by_the_prefix_max(self):
+        # Depois de "aninhada" (que termina às 4h) a varredura para trás precisa achar "longa"
+        self.assertEqual(self.names(5, 6), ["longa"])
+
+    def test_free_slots_skip_every_booking(self):
+        slots = self.index.free_slots(at(-2), at(16), min_duration=timedelta(hours=1))
+        self.assertEqual(slots, [(at(-2), at(0)), (at(10), at(12)), (at(14), at(16))])
+
+
+class MachineCalendarTests(SimpleTestCase):
+    def test_held_machine_conflicts_with_every_window_after_it_was_linked(self):
+        held = SimpleNamespace(created_at=at(2))
+        calendar = MachineCalendar([(at(5), at(6), "reserva")], [held])
+
+        self.assertEqual(calendar.conflicts(at(0), at(1)), [])
+        self.assertEqual(calendar.conflicts(at(30), at(31)), [held])
+        self.assertEqual(calendar.conflicts(at(5), at(7)), [held, "reserva"])
+        self.assertEqual(calendar.free_slots(at(0), at(10)), [(at(0), at(2))])
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.user = make_user("booking")
+        self.machine = Machine.objects.create(model="Prensa", serialnumber="BK-1", owner_user=self.user)
+        self.client.force_login(self.user)
+
+    def book(self, start, end):
+        return create_production(self.user, "Reserva", 1, [self.machine.id], planned_start=start, planned_end=end).production
+
+    def start(self, production):
+        self.client.post(reverse("production_start", args=[production.pk]))
+        production.refresh_from_db()
+        return production.status
+
+    def test_form_rejects_a_window_that_already_ended(self):
+        now = timezone.now()
+        form = BookingForm(
+            data={
+                "description": "Atrasada",
+                "quantity": 1,
+                "machines": [self.machine.id],
+                "planned_start": now - timedelta(hours=3),
+                "planned_end": now - timedelta(hours=1),
+            },
+            user=self.user,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("O fim planejado já passou.", form.non_field_errors())
+
+    def test_start_is_refused_before_the_window(self):
+        now = timezone.now()
+        production = self.book(now + timedelta(hours=1), now + timedelta(hours=2))
+        self.assertEqual(self.start(production), ProductionStatus.STANDBY)
+
+    def test_start_is_refused_after_the_window(self):
+        now = timezone.now()
+        production = self.book(now - timedelta(hours=2), now - timedelta(hours=1))
+        self.assertEqual(self.start(production), ProductionStatus.STANDBY)
+
+    def test_start_inside_the_window(self):
+        now = timezone.now()
+        production = self.book(now - timedelta(minutes=5), now + timedelta(hours=1))
+        self.assertEqual(self.start(production), ProductionStatus.ONGOING)
+
+    def test_start_waits_for_a_held_machine(self):
+        now = timezone.now()
+        reservation = self.book(now + timedelta(hours=1), now + timedelta(hours=2))
+        # Uso imediato (sem janela) continua permitido antes da reserva começar
+        immediate = create_production(self.user, "Agora", 1, [self.machine.id]).production
+        self.assertEqual(self.start(immediate), ProductionStatus.ONGOING)
+
+        # A janela da reserva começa enquanto a produção sem janela ainda está rodando
+        reservation.production_machines.update(planned_start=now - timedelta(minutes=1))
+        self.assertEqual(self.start(reservation), ProductionStatus.STANDBY)
+
+
+class ConcurrentTransitionTests(TestCase):
+    def setUp(self):
+        self.user = make_user("cas")
+        self.production = Production.objects.create(user=self.user, description="CAS", quantity=1)
+
+    def request(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return request
+
+    def test_stale_version_raises_and_keeps_the_winner(self):
+        stale = Production.objects.get(pk=self.production.pk)
+        self.production.set_status(ProductionStatus.ONGOING)
+
+        with self.assertRaises(ConcurrentTransitionError):
+            stale.set_status(ProductionStatus.CANCELED)
+
+        self.production.refresh_from_db()
+        self.assertEqual(self.production.status, ProductionStatus.ONGOING)
+        self.assertEqual(self.production.version, 1)
+
+    def test_transition_is_retried_with_the_record_reread(self):
+        attempts = []
+
+        @lifecycle_transition
+        def view(request, pk):
+            production = Production.objects.get(pk=pk)
+            attempts.append(production.version)
+            if len(attempts) == 1:
+                # Outra operação altera a produção entre a leitura e a escrita
+                Production.objects.get(pk=pk).set_status(ProductionStatus.ONGOING)
+            production.set_status(ProductionStatus.CANCELED)
+            return "ok"
+
+        self.assertEqual(view(self.request(), self.production.pk), "ok")
+        self.assertEqual(attempts, [0, 0])
+        # A primeira tentativa foi desfeita junto com a alteração concorrente
+        self.production.refresh_from_db()
+        self.assertEqual(self.production.status, ProductionStatus.CANCELED)
+        self.assertEqual(self.production.version, 1)
+
+    def test_gives_up_with_a_warning_after_the_last_attempt(self):
+        attempts = []
+
+        @lifecycle_transition
+        def view(request, pk):
+            attempts.append(pk)
+            raise ConcurrentTransitionError("alterada")
+
+        request = self.request()
+        response = view(request, self.production.pk)
+
+        self.assertEqual(len(attempts), TRANSITION_ATTEMPTS)
+        self.assertEqual(response.url, reverse("production_detail", args=[self.production.pk]))
+        self.assertEqual([m.level_tag for m in get_messages(request)], ["warning"])
+
+
+class CreateProductionTests(TestCase):
+    def setUp(self):
+        self.user = make_user("create")
+        self.machines = [
+            Machine.objects.create(model="Torno", serialnumber=f"CR-{n}", owner_user=self.user) for n in range(3)
+        ]
+
+    def form(self, machines):
+        return ProductionCreateForm(
+            data={"description": "Lote", "quantity": 5, "machines": [m.id for m in machines]},
+            user=self.user,
+        )
+
+    def test_creates_every_link_in_one_bulk_insert(self):
+        # lock das máquinas, checagem de ocupação, INSERT da produção e um bulk_create (+ savepoint)
+        with self.assertNumQueries(6):
+            created = create_production(self.user, "Lote", 5, [m.id for m in self.machines])
+        self.assertEqual(len(created.production_machines), 3)
+
+    def test_machine_taken_after_the_form_was_validated_is_refused(self):
+        form = self.form(self.machines[:2])
+        self.assertTrue(form.is_valid())
+
+        # Outra produção pega uma das máquinas entre a validação do form e o save
+        create_production(self.user, "Concorrente", 1, [self.machines[1].id])
+
+        with self.assertRaises(ValidationError):
+            form.save()
+        self.assertEqual(Production.objects.count(), 1)
+
+    def test_view_shows_the_conflict_instead_of_failing(self):
+        self.client.force_login(self.user)
+        create_production(self.user, "Concorrente", 1, [self.machines[0].id])
+
+        # POST montado antes da máquina ser pega (a validação do form já a exclui)
+        response = self.client.post(
+            reverse("production_create"),
+            {"description": "Lote", "quantity": 5, "machines": [self.machines[0].id]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Production.objects.count(), 1)
+
+    def test_machines_of_another_user_are_refused(self):
+        other = Machine.objects.create(model="Torno", serialnumber="CR-X", owner_user=make_user("other"))
+        with self.assertRaises(ValidationError):
+            create_production(self.user, "Lote", 1, [self.machines[0].id, other.id])
+
+
+class RequestMemoTests(TestCase):
+    def setUp(self):
+        self.user = make_user("memo")
+        self.machine = Machine.objects.create(model="Fresa", serialnumber="MM-1", owner_user=self.user)
+
+    def in_request(self, body):
+        return RequestMemoMiddleware(lambda request: body())(RequestFactory().get("/"))
+
+    def test_loaded_once_per_request(self):
+        def body():
+            with self.assertNumQueries(1):
+                first = available_machines(self.user)
+                self.assertIs(available_machines(self.user), first)
+            return first
+
+        self.assertEqual(self.in_request(body), [self.machine])
+
+    def test_each_request_starts_empty(self):
+        self.in_request(lambda: available_machines(self.user))
+        other = Machine.objects.create(model="Fresa", serialnumber="MM-2", owner_user=self.user)
+
+        self.assertEqual(self.in_request(lambda: available_machines(self.user)), [self.machine, other])
+
+    def test_cleared_after_create_production(self):
+        def body():
+            self.assertEqual(available_machines(self.user), [self.machine])
+            create_production(self.user, "Lote", 1, [self.machine.id])
+            return available_machines(self.user)
+
+        self.assertEqual(self.in_request(body), [])
+
+    def test_nothing_is_memoized_outside_a_request(self):
+        with self.assertNumQueries(2):
+            available_machines(self.user)
+            available_machines(self.user)
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        cache.delete_many([PARAMS_CACHE_KEY, STALE_PARAMS_CACHE_KEY])
+        self.user = make_user("forecast")
+        self.fast = self.machine("Torno", "FC-1", [2, 2, 2])
+        self.new = self.machine("Torno", "FC-2", [8])
+        self.other = self.machine("Fresa", "FC-3", [5, 5])
+
+    def machine(self, model, serial, rates):
+        """Máquina com uma execução FINISHED de 10 unidades por taxa (minutos por unidade)."""
+        machine = Machine.objects.create(model=model, serialnumber=serial, owner_user=self.user)
+        for rate in rates:
+            production = Production.objects.create(
+                user=self.user, description="Histórico", quantity=10, status=ProductionStatus.FINISHED
+            )
+            ProductionMachine.objects.create(
+                production=production,
+                machine=machine,
+                status=ProductionMachineStatus.FINISHED,
+                working_time=rate * 10,
+            )
+        return machine
+
+    def test_stats_fall_back_from_machine_to_model_to_global(self):
+        forecaster = Forecaster(fit_params())
+
+        basis, stats = forecaster.stats_for(self.fast)
+        self.assertEqual((basis, stats.samples, stats.mean), ("máquina", 3, 2.0))
+
+        # Só 1 execução própria: usa as 4 do modelo Torno
+        basis, stats = forecaster.stats_for(self.new)
+        self.assertEqual((basis, stats.samples, stats.mean), ("modelo", 4, 3.5))
+
+        # Fresa tem só 2 execuções no modelo: usa as 6 no geral
+        basis, stats = forecaster.stats_for(self.other)
+        self.assertEqual((basis, stats.samples, stats.mean), ("geral", 6, 4.0))
+
+    def test_no_history_means_no_stats(self):
+        self.assertEqual(Forecaster(EMPTY_PARAMS).stats_for(self.fast), (None, None))
+
+    def test_cache_miss_serves_no_eta_without_fitting(self):
+        with self.assertNumQueries(0):
+            forecaster = get_forecaster()
+        self.assertEqual(forecaster.params, EMPTY_PARAMS)
+
+    def test_expired_params_fall_back_to_the_stale_copy(self):
+        params = refresh_params()
+        cache.delete(PARAMS_CACHE_KEY)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_forecaster().params, params)
+
+    def test_commands_can_fit_on_a_miss(self):
+        forecaster = get_forecaster(fit_if_missing=True)
+        self.assertEqual(forecaster.stats_for(self.fast)[0], "máquina")
+        self.assertIsNotNone(cache.get(PARAMS_CACHE_KEY))
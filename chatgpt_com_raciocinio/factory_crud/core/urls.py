@@ -6,6 +6,7 @@ from .views import (
     ProductionListView,
     ProductionCreateView,
     ProductionDetailView,
+    BookingCalendarView,
     start_production,
     cancel_production,
     finish_production,
@@ -23,6 +24,7 @@ urlpatterns = [
     path("productions/", ProductionListView.as_view(), name="production_list"),
     path("productions/new/", ProductionCreateView.as_view(), name="production_create"),
     path("productions/<int:pk>/", ProductionDetailView.as_view(), name="production_detail"),
+    path("calendar/", BookingCalendarView.as_view(), name="booking_calendar"),
 
     path("productions/<int:pk>/start/", start_production, name="production_start"),
     path("productions/<int:pk>/cancel/", cancel_production, name="production_cancel"),
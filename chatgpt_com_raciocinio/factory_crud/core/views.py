@@ -1,19 +1,32 @@
+from datetime import datetime, time, timedelta
+from functools import wraps
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Max
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.generic import ListView, CreateView, DetailView
 from django.utils.decorators import method_decorator
 
 from .models import (
+    ConcurrentTransitionError,
     Machine,
     Production,
     ProductionMachine,
     ProductionStatus,
     ProductionMachineStatus,
 )
-from .forms import MachineForm, ProductionCreateForm
+from . import memo
+from .booking import load_calendar, start_conflicts
+from .context_processors import THEME_COOKIE, THEMES
+from .forecast import forecast_open_work, get_forecaster
+from .forms import BookingForm, MachineForm, ProductionCreateForm
 from .services import get_machine_counts_for_dashboard
 
 
@@ -35,6 +48,8 @@ class DashboardView(ListView):
         ctx["machine_total"] = counts["total"]
         ctx["machine_used"] = counts["used"]
         ctx["machine_available"] = counts["available"]
+        ctx["row_cache_timeout"] = settings.PRODUCTION_ROW_CACHE_TIMEOUT
+        ctx["production_etas"], ctx["machine_etas"] = forecast_open_work(self.request.user)
         return ctx
 
 
@@ -72,12 +87,19 @@ class ProductionListView(ListView):
 
     def get_queryset(self):
         # ✅ para mostrar working_time por máquina na lista, sem N+1
+        # ✅ machines_updated_at compõe a chave do cache de fragmento de cada linha
         return (
             Production.objects.filter(user=self.request.user)
+            .annotate(machines_updated_at=Max("production_machines__updated_at"))
             .prefetch_related("production_machines__machine")
             .order_by("-created_at")
         )
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["row_cache_timeout"] = settings.PRODUCTION_ROW_CACHE_TIMEOUT
+        return ctx
+
 
 @method_decorator(login_required, name="dispatch")
 class ProductionCreateView(CreateView):
@@ -91,11 +113,73 @@ class ProductionCreateView(CreateView):
         return kwargs
 
     def form_valid(self, form):
-        prod = form.save()
+        try:
+            prod = form.save()
+        except ValidationError as exc:
+            # Outra produção pegou uma das máquinas entre o GET do formulário e o POST
+            form.add_error(None, exc)
+            return self.form_invalid(form)
         messages.success(self.request, f"Produção #{prod.id} cadastrada com sucesso.")
         return redirect("production_detail", pk=prod.id)
 
 
+@method_decorator(login_required, name="dispatch")
+class BookingCalendarView(CreateView):
+    """
+    ✅ Agenda: reservas e horários livres de cada máquina nos próximos BOOKING_HORIZON_DAYS
+    dias (ou a partir de ?start=AAAA-MM-DD; ?machine=<id> filtra uma máquina) + formulário
+    de reserva com checagem de conflito.
+    """
+    template_name = "productions/booking_calendar.html"
+    model = Production
+    form_class = BookingForm
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
+
+    def get_window(self):
+        start = parse_date(self.request.GET.get("start") or "")
+        if start is None:
+            start = timezone.localdate()
+        window_start = timezone.make_aware(datetime.combine(start, time.min))
+        return window_start, window_start + timedelta(days=settings.BOOKING_HORIZON_DAYS)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        window_start, window_end = self.get_window()
+
+        machines = Machine.objects.filter(owner_user=self.request.user).order_by("model", "serialnumber")
+        selected = self.request.GET.get("machine")
+        if selected and selected.isdigit():
+            machines = machines.filter(id=int(selected))
+        machines = list(machines)
+
+        calendar = load_calendar([m.id for m in machines], window_start, window_end)
+        ctx["rows"] = [
+            {
+                "machine": machine,
+                "bookings": calendar[machine.id].conflicts(window_start, window_end),
+                "free_slots": calendar[machine.id].free_slots(window_start, window_end, timedelta(hours=1)),
+            }
+            for machine in machines
+        ]
+        ctx["window_start"], ctx["window_end"] = window_start, window_end
+        ctx["previous_start"] = (window_start - timedelta(days=settings.BOOKING_HORIZON_DAYS)).date().isoformat()
+        ctx["next_start"] = window_end.date().isoformat()
+        return ctx
+
+    def form_valid(self, form):
+        try:
+            prod = form.save()
+        except ValidationError as exc:
+            form.add_error(None, exc)
+            return self.form_invalid(form)
+        messages.success(self.request, f"Reserva da produção #{prod.id} cadastrada.")
+        return redirect(f"{reverse('booking_calendar')}?start={form.cleaned_data['planned_start'].date().isoformat()}")
+
+
 @method_decorator(login_required, name="dispatch")
 class ProductionDetailView(DetailView):
     template_name = "productions/production_detail.html"
@@ -105,24 +189,93 @@ class ProductionDetailView(DetailView):
     def get_queryset(self):
         return Production.objects.filter(user=self.request.user)
 
+    def get_object(self, queryset=None):
+        return _owned_production(self.request, self.kwargs["pk"])
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["machines"] = self.object.production_machines.select_related("machine").order_by("id")
+        machines = list(self.object.production_machines.select_related("machine").order_by("id"))
+        forecaster = get_forecaster()
+        for pm in machines:
+            pm.eta = forecaster.estimate_pm(pm, self.object.quantity)
+        ctx["machines"] = machines
+        ctx["eta"] = forecaster.estimate_production(self.object, machines)
         return ctx
 
 
+TRANSITION_ATTEMPTS = 3
+
+
+def lifecycle_transition(view):
+    """
+    ✅ Concorrência otimista: executa a transição em uma transação e, se algum
+    compare-and-swap de version falhar (ConcurrentTransitionError), desfaz tudo e
+    repete com o estado relido. Esgotadas as tentativas, avisa o usuário.
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        for _ in range(TRANSITION_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return view(request, pk, *args, **kwargs)
+            except ConcurrentTransitionError:
+                continue
+        messages.warning(request, "A produção foi alterada por outra operação ao mesmo tempo. Tente novamente.")
+        return redirect("production_detail", pk=pk)
+
+    return wrapper
+
+
+def _owned_production(request, pk):
+    """Produção do usuário logado, carregada uma vez por request (identity map)."""
+    return memo.identity_get(
+        Production, pk, lambda: get_object_or_404(Production, pk=pk, user=request.user)
+    )
+
+
+def _lock_production(request, pk):
+    """
+    ✅ Concorrência: trava a linha da produção (SELECT ... FOR UPDATE) até o fim da transação.
+    Cliques/terminais concorrentes na MESMA produção são serializados e cada transição
+    valida o status já atualizado; produções diferentes não se bloqueiam.
+    A versão travada substitui qualquer cópia anterior no identity map do request.
+    """
+    return memo.identity_put(
+        get_object_or_404(Production.objects.select_for_update(), pk=pk, user=request.user)
+    )
+
+
 @login_required
-@transaction.atomic
+@lifecycle_transition
 def start_production(request, pk):
-    production = get_object_or_404(Production, pk=pk, user=request.user)
+    production = _lock_production(request, pk)
 
     if production.status != ProductionStatus.STANDBY:
         messages.error(request, "A produção só pode ser iniciada se estiver em STANDBY.")
         return redirect("production_detail", pk=pk)
 
+    # ✅ Agenda: reserva só inicia dentro da janela planejada e com as máquinas livres agora
+    now = timezone.now()
+    pms = list(production.production_machines.all())
+    planned = next((pm for pm in pms if pm.planned_start), None)
+    if planned and now < planned.planned_start:
+        messages.error(request, f"A reserva começa em {timezone.localtime(planned.planned_start):%d/%m/%Y %H:%M}.")
+        return redirect("production_detail", pk=pk)
+    if planned and now >= planned.planned_end:
+        messages.error(request, "A janela planejada desta reserva já terminou. Cadastre uma nova reserva.")
+        return redirect("production_detail", pk=pk)
+    conflicts = start_conflicts(production, now)
+    if conflicts:
+        messages.error(
+            request,
+            "Máquinas ainda ocupadas: "
+            + "; ".join(f"{pm.machine} pela produção #{pm.production_id}" for pm in conflicts)
+            + ".",
+        )
+        return redirect("production_detail", pk=pk)
+
     production.set_status(ProductionStatus.ONGOING)
 
-    pms = production.production_machines.all()
     for pm in pms:
         if pm.status == ProductionMachineStatus.STANDBY:
             pm.set_status(ProductionMachineStatus.ONGOING)
@@ -132,9 +285,9 @@ def start_production(request, pk):
 
 
 @login_required
-@transaction.atomic
+@lifecycle_transition
 def cancel_production(request, pk):
-    production = get_object_or_404(Production, pk=pk, user=request.user)
+    production = _lock_production(request, pk)
 
     if production.status in [ProductionStatus.FINISHED, ProductionStatus.CANCELED]:
         messages.error(request, "Não é possível cancelar uma produção finalizada ou já cancelada.")
@@ -152,9 +305,9 @@ def cancel_production(request, pk):
 
 
 @login_required
-@transaction.atomic
+@lifecycle_transition
 def finish_production(request, pk):
-    production = get_object_or_404(Production, pk=pk, user=request.user)
+    production = _lock_production(request, pk)
 
     if production.status in [ProductionStatus.FINISHED, ProductionStatus.CANCELED]:
         messages.error(request, "Não é possível finalizar uma produção cancelada ou já finalizada.")
@@ -173,10 +326,12 @@ def finish_production(request, pk):
 
 
 @login_required
-@transaction.atomic
+@lifecycle_transition
 def cancel_production_machine(request, pk, pm_id):
-    production = get_object_or_404(Production, pk=pk, user=request.user)
-    pm = get_object_or_404(ProductionMachine, pk=pm_id, production=production)
+    production = _lock_production(request, pk)
+    pm = get_object_or_404(
+        ProductionMachine.objects.select_for_update().select_related("machine"), pk=pm_id, production=production
+    )
 
     if production.status in [ProductionStatus.FINISHED, ProductionStatus.CANCELED]:
         messages.error(request, "Não é possível alterar máquinas de uma produção finalizada/cancelada.")
@@ -196,10 +351,12 @@ def cancel_production_machine(request, pk, pm_id):
 
 
 @login_required
-@transaction.atomic
+@lifecycle_transition
 def finish_production_machine(request, pk, pm_id):
-    production = get_object_or_404(Production, pk=pk, user=request.user)
-    pm = get_object_or_404(ProductionMachine, pk=pm_id, production=production)
+    production = _lock_production(request, pk)
+    pm = get_object_or_404(
+        ProductionMachine.objects.select_for_update().select_related("machine"), pk=pm_id, production=production
+    )
 
     if production.status in [ProductionStatus.FINISHED, ProductionStatus.CANCELED]:
         messages.error(request, "Não é possível finalizar máquinas de uma produção finalizada/cancelada.")
@@ -233,15 +390,13 @@ def finish_production_machine(request, pk, pm_id):
 def set_theme(request, mode):
     """
     ✅ Incremental: alternância Light/Dark.
-    - Persistência por navegador: session + cookie.
+    - Persistência por navegador: somente cookie (não escreve sessão nem usuário).
     - Retrocompatível: não altera auth nem dados existentes.
     """
     mode = (mode or "").lower().strip()
-    if mode not in ["light", "dark"]:
+    if mode not in THEMES:
         mode = "light"
 
-    request.session["ui_theme"] = mode
-
     resp = redirect(request.META.get("HTTP_REFERER") or "dashboard")
-    resp.set_cookie("ui_theme", mode, max_age=60 * 60 * 24 * 365, samesite="Lax")
+    resp.set_cookie(THEME_COOKIE, mode, max_age=60 * 60 * 24 * 365, samesite="Lax")
     return resp
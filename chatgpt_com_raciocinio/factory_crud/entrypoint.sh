@@ -12,5 +12,16 @@ if [ ! -L /app/db.sqlite3 ]; then
   ln -s /app/db_data/db.sqlite3 /app/db.sqlite3
 fi
 
-python manage.py migrate --noinput
+# MIGRATE_MODE:
+#   apply (padrão) -> aplica as migrations no boot (comportamento antigo)
+#   check          -> só verifica se o schema está em dia e falha se não estiver
+#                     (as migrations rodam uma vez, fora do boot de cada réplica)
+#   skip           -> não toca no banco
+case "${MIGRATE_MODE:-apply}" in
+  apply) python manage.py migrate --noinput ;;
+  check) python manage.py migrate --check --noinput ;;
+  skip) ;;
+  *) echo "MIGRATE_MODE inválido: ${MIGRATE_MODE}" >&2; exit 1 ;;
+esac
+
 python manage.py runserver 0.0.0.0:8000
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,11 +21,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # ✅ Primeiro da cadeia: /healthz não paga sessão/auth/mensagens
+    "core.middleware.HealthCheckMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # ✅ Memória por request (core/memo.py) para serviços e forms
+    "core.memo.RequestMemoMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -52,6 +57,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "factory_manager.wsgi.application"
 
+# ✅ Cache (fragmentos das tabelas de produção, previsão de ETA). Padrão: memória local do processo.
+# Para um cache compartilhado entre workers, ex.:
+#   DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache DJANGO_CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "factory-crud"),
+    }
+}
+LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+SHARED_CACHE = CACHES["default"]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+# Tempo (segundos) que uma linha renderizada da tabela de produções fica em cache.
+# A chave já muda quando a produção ou alguma de suas máquinas é alterada.
+PRODUCTION_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Validade (segundos) dos parâmetros de previsão de ETA em cache (core/forecast.py).
+# O reajuste é do "manage.py fit_forecast", agendado com esse intervalo; requests não reajustam.
+FORECAST_PARAMS_TIMEOUT = 60 * 15
+# Validade da cópia antiga, servida enquanto o próximo fit_forecast não roda.
+FORECAST_STALE_PARAMS_TIMEOUT = 60 * 60 * 24 * 7
+
+# Dias exibidos por página na agenda de máquinas (/calendar/).
+BOOKING_HORIZON_DAYS = 7
+
+# ✅ Engine de sessão configurável (DJANGO_SESSION_ENGINE):
+#   - db: comportamento original do Django (padrão com o cache local)
+#   - cached_db: lê do cache e só vai ao banco em cache miss (padrão com cache compartilhado).
+#     Com o cache local (LocMemCache), cada worker teria a sua cópia: um logout em um processo
+#     deixaria a sessão viva no cache dos outros. Só use com um único processo.
+#   - signed_cookies: sessão inteira no cookie assinado, nenhuma query
+SESSION_ENGINES = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get("DJANGO_SESSION_ENGINE", "cached_db" if SHARED_CACHE else "db")]
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
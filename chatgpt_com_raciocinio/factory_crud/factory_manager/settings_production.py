@@ -0,0 +1,62 @@
+"""
+Settings de produção.
+
+Uso:
+  DJANGO_SETTINGS_MODULE=factory_manager.settings_production
+
+Herda tudo de settings.py e ajusta apenas o que muda em produção:
+  - DEBUG desligado
+  - templates compilados uma única vez por processo (cached loader)
+  - estáticos com hash no nome + variantes .gz/.br, servidos pelo próprio app
+
+Build dos estáticos (feito no Dockerfile):
+  python manage.py collectstatic --noinput
+  python manage.py compress_static
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)  # noqa: F405
+
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "*").split(",")
+
+# ✅ Cached loader explícito: cada template é lido e compilado uma vez por processo.
+# Com "loaders" definido, APP_DIRS precisa ser False (o app_directories.Loader entra na lista).
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    }
+]
+
+# ✅ Pipeline de estáticos: nomes com hash (manifest) para cache imutável no navegador.
+STATIC_ROOT = str(BASE_DIR / "staticfiles")
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"},
+}
+
+# Serve STATIC_ROOT antes de sessão/auth: CSS/JS não pagam nenhum middleware pesado.
+_security = MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1
+MIDDLEWARE = [
+    *MIDDLEWARE[:_security],
+    "core.middleware.StaticAssetMiddleware",
+    *MIDDLEWARE[_security:],
+]
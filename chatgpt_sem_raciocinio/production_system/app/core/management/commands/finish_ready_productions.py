@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Production
+
+
+class Command(BaseCommand):
+    help = 'Finaliza em lote as produções ONGOING cujas máquinas já foram todas encerradas.'
+
+    def handle(self, *args, **options):
+        finished = Production.finish_ready()
+        self.stdout.write(f'{finished} produção(ões) finalizada(s).')
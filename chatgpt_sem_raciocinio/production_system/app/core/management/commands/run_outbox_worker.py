@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Processa os eventos do outbox (trabalho feito depois do commit das transições).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa o que estiver pendente e sai.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Segundos de espera quando não há eventos.')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            done = process_batch(limit=options['batch_size'])
+            if done:
+                self.stdout.write(f'{done} evento(s) processado(s).')
+            if options['once']:
+                return
+            if not done:
+                time.sleep(options['interval'])
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
@@ -58,6 +59,34 @@ class Production(BaseModel):
         for pm in self.productionmachine_set.all():
             pm.cancel()
 
+    @classmethod
+    def finish_ready(cls, production_ids=None):
+        """
+        Versão em lote do try_finish: finaliza, com um único UPDATE, todas as produções
+        ONGOING com pelo menos uma máquina vinculada e nenhuma em STANDBY/ONGOING.
+        Produções em STANDBY nunca foram iniciadas e não são finalizadas aqui.
+        Retorna quantas produções foram finalizadas.
+        """
+        pending_machines = ProductionMachine.objects.filter(
+            production=OuterRef('pk'),
+            status__in=['STANDBY', 'ONGOING'],
+        )
+        any_machine = ProductionMachine.objects.filter(production=OuterRef('pk'))
+        ready = (
+            cls.objects.filter(status='ONGOING')
+            .filter(Exists(any_machine))
+            .exclude(Exists(pending_machines))
+        )
+        if production_ids is not None:
+            ready = ready.filter(pk__in=production_ids)
+
+        now = timezone.now()
+        return cls.objects.filter(pk__in=ready.values('pk')).update(
+            status='FINISHED',
+            finished_at=now,
+            updated_at=now,
+        )
+
     def try_finish(self):
         pending = self.productionmachine_set.filter(
             status__in=['STANDBY', 'ONGOING']
@@ -153,4 +182,31 @@ class ProductionMachine(BaseModel):
         self.status = 'FINISHED'
         self.finished_at = now
         self._calculate_working_time(now)
-        self.save()
\ No newline at end of file
+        self.save()
+
+class OutboxEvent(BaseModel):
+    """
+    Outbox transacional: o evento é gravado na MESMA transação da mudança de estado
+    e processado depois do commit pelo worker (python manage.py run_outbox_worker).
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.id} ({self.status})'
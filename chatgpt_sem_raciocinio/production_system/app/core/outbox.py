@@ -0,0 +1,118 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent, Production
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 300  # tempo máximo de um lote nas mãos de um worker
+
+_handlers = {}
+_batch_handlers = {}
+
+
+def handler(topic):
+    """Registra a função que processa os eventos de um tópico, um por vez."""
+    def decorator(func):
+        _handlers[topic] = func
+        return func
+    return decorator
+
+
+def batch_handler(topic):
+    """Registra a função que recebe, de uma vez, os payloads de todos os eventos pendentes do tópico."""
+    def decorator(func):
+        _batch_handlers[topic] = func
+        return func
+    return decorator
+
+
+def enqueue(topic, **payload):
+    """
+    Grava o evento no outbox. Chamado dentro da transação da mudança de estado:
+    se a transação for desfeita, o evento também é.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def _claim(event, now):
+    # Compare-and-swap + lease no mesmo UPDATE: com mais de um worker, só um fica com o evento,
+    # e o available_at empurrado para frente esconde o evento dos outros enquanto o handler roda.
+    # Se o worker morrer no meio, o evento volta a ficar disponível quando o lease vence.
+    return OutboxEvent.objects.filter(
+        pk=event.pk, status='PENDING', attempts=event.attempts, available_at__lte=now
+    ).update(
+        attempts=event.attempts + 1,
+        available_at=now + timedelta(seconds=LEASE_SECONDS),
+        updated_at=now,
+    ) == 1
+
+
+def _run(events, func):
+    """Executa `func` para o grupo de eventos e marca todos como DONE ou para nova tentativa."""
+    try:
+        with transaction.atomic():
+            func()
+    except Exception as exc:
+        for event in events:
+            logger.exception('Falha ao processar %s', event)
+            event.last_error = repr(exc)
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = 'FAILED'
+            else:
+                # backoff exponencial: 2s, 4s, 8s, ...
+                event.available_at = timezone.now() + timedelta(seconds=2 ** event.attempts)
+            event.save(update_fields=['status', 'last_error', 'available_at', 'updated_at'])
+        return 0
+
+    now = timezone.now()
+    OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+        status='DONE', processed_at=now, updated_at=now,
+    )
+    return len(events)
+
+
+def process_batch(limit=100):
+    """Processa até `limit` eventos pendentes. Retorna quantos foram concluídos."""
+    now = timezone.now()
+    events = list(
+        OutboxEvent.objects.filter(status='PENDING', available_at__lte=now)
+        .order_by('id')[:limit]
+    )
+
+    by_topic = defaultdict(list)
+    for event in events:
+        if _claim(event, now):
+            event.attempts += 1
+            by_topic[event.topic].append(event)
+
+    done = 0
+    for topic, group in by_topic.items():
+        if topic in _batch_handlers:
+            payloads = [event.payload for event in group]
+            done += _run(group, lambda: _batch_handlers[topic](payloads))
+            continue
+
+        for event in group:
+            func = _handlers.get(topic)
+            if func is None:
+                done += _run([event], lambda: _missing_handler(topic))
+            else:
+                done += _run([event], lambda: func(**event.payload))
+
+    return done
+
+
+def _missing_handler(topic):
+    raise LookupError(f'Nenhum handler para o tópico {topic!r}')
+
+
+@batch_handler('production.evaluate_finish')
+def evaluate_finish(payloads):
+    # Antes era um try_finish() inline por máquina; agora um único UPDATE para o lote todo
+    Production.finish_ready({payload['production_id'] for payload in payloads})
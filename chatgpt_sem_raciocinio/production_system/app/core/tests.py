@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from . import outbox
+from .models import Machine, OutboxEvent, Production, ProductionMachine, User
+
+
+class OutboxTest(TestCase):
+    def register(self, topic, func):
+        outbox.handler(topic)(func)
+        self.addCleanup(outbox._handlers.pop, topic)
+
+    def expire(self, event):
+        # Simula a passagem do tempo: backoff ou lease vencido
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+
+    def test_done_after_handler_runs(self):
+        calls = []
+        self.register('teste.ok', lambda **payload: calls.append(payload))
+        event = outbox.enqueue('teste.ok', valor=1)
+
+        self.assertEqual(outbox.process_batch(), 1)
+        self.assertEqual(calls, [{'valor': 1}])
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('DONE', 1))
+        self.assertIsNotNone(event.processed_at)
+
+    def test_leased_event_is_not_claimed_by_another_worker(self):
+        calls = []
+
+        def slow_handler():
+            calls.append('início')
+            # Um segundo worker consulta o outbox enquanto o handler ainda roda
+            self.assertEqual(outbox.process_batch(), 0)
+            calls.append('fim')
+
+        self.register('teste.lento', slow_handler)
+        event = outbox.enqueue('teste.lento')
+
+        before = timezone.now()
+        self.assertEqual(outbox.process_batch(), 1)
+        self.assertEqual(calls, ['início', 'fim'])
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertGreaterEqual(event.available_at, before + timedelta(seconds=outbox.LEASE_SECONDS))
+
+    def test_event_comes_back_when_the_lease_expires(self):
+        self.register('teste.ok', lambda: None)
+        event = outbox.enqueue('teste.ok')
+        # Worker que pegou o evento e morreu: attempts já incrementado, lease ainda valendo
+        self.assertTrue(outbox._claim(event, timezone.now()))
+        self.assertEqual(outbox.process_batch(), 0)
+
+        self.expire(event)
+        self.assertEqual(outbox.process_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('DONE', 2))
+
+    def test_failure_backs_off_and_gives_up_after_max_attempts(self):
+        def broken():
+            raise RuntimeError('quebrou')
+
+        self.register('teste.falha', broken)
+        event = outbox.enqueue('teste.falha')
+
+        for attempt in range(1, outbox.MAX_ATTEMPTS):
+            before = timezone.now()
+            with self.assertLogs('core.outbox', 'ERROR'):
+                self.assertEqual(outbox.process_batch(), 0)
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts), ('PENDING', attempt))
+            self.assertIn('quebrou', event.last_error)
+            # backoff exponencial: 2s, 4s, 8s, ...
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=2 ** attempt))
+            self.assertLess(event.available_at, before + timedelta(seconds=2 ** attempt + 60))
+            # Ainda no backoff: nenhum worker pega o evento
+            self.assertEqual(outbox.process_batch(), 0)
+            self.assertEqual(OutboxEvent.objects.get(pk=event.pk).attempts, attempt)
+            self.expire(event)
+
+        with self.assertLogs('core.outbox', 'ERROR'):
+            outbox.process_batch()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('FAILED', outbox.MAX_ATTEMPTS))
+
+    def test_unknown_topic_is_retried_and_recorded(self):
+        event = outbox.enqueue('teste.sem_handler', valor=1)
+
+        with self.assertLogs('core.outbox', 'ERROR'):
+            self.assertEqual(outbox.process_batch(), 0)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('PENDING', 1))
+        self.assertIn('LookupError', event.last_error)
+
+        # Um deploy que registra o handler resolve o evento na próxima tentativa
+        calls = []
+        self.register('teste.sem_handler', lambda **payload: calls.append(payload))
+        self.expire(event)
+        self.assertEqual(outbox.process_batch(), 1)
+        self.assertEqual(calls, [{'valor': 1}])
+
+
+class FinishReadyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fabrica', password='x', name='Fábrica', cnpj='1')
+        self.machines = [
+            Machine.objects.create(model='Torno', serialnumber=f'FR-{n}', owner_user=self.user) for n in range(2)
+        ]
+
+    def production(self, status, *machine_statuses):
+        production = Production.objects.create(description='Lote', quantity=1, user=self.user, status=status)
+        for machine, machine_status in zip(self.machines, machine_statuses):
+            ProductionMachine.objects.create(production=production, machine=machine, status=machine_status)
+        return production
+
+    def status(self, production):
+        production.refresh_from_db()
+        return production.status
+
+    def test_finishes_only_ongoing_productions_with_every_machine_closed(self):
+        ready = self.production('ONGOING', 'FINISHED', 'CANCELED')
+        running = self.production('ONGOING', 'FINISHED', 'ONGOING')
+        never_started = self.production('STANDBY', 'CANCELED', 'CANCELED')
+        without_machines = self.production('ONGOING')
+        canceled = self.production('CANCELED', 'CANCELED')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Production.finish_ready(), 1)
+
+        self.assertEqual(self.status(ready), 'FINISHED')
+        self.assertIsNotNone(ready.finished_at)
+        self.assertEqual(self.status(running), 'ONGOING')
+        self.assertEqual(self.status(never_started), 'STANDBY')
+        self.assertEqual(self.status(without_machines), 'ONGOING')
+        self.assertEqual(self.status(canceled), 'CANCELED')
+
+    def test_limited_to_the_given_ids(self):
+        first = self.production('ONGOING', 'FINISHED')
+        second = self.production('ONGOING', 'FINISHED')
+
+        self.assertEqual(Production.finish_ready({first.pk}), 1)
+        self.assertEqual(self.status(first), 'FINISHED')
+        self.assertEqual(self.status(second), 'ONGOING')
+
+    def test_outbox_batch_finishes_each_production_once(self):
+        production = self.production('ONGOING', 'FINISHED', 'FINISHED')
+        # Uma avaliação por máquina encerrada, todas resolvidas pelo mesmo UPDATE
+        for _ in self.machines:
+            outbox.enqueue('production.evaluate_finish', production_id=production.pk)
+
+        self.assertEqual(outbox.process_batch(), 2)
+        self.assertEqual(self.status(production), 'FINISHED')
+        self.assertEqual(Production.finish_ready(), 0)
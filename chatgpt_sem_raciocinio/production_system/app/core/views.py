@@ -5,6 +5,8 @@ from .models import Machine, Production, ProductionMachine
 from .forms import MachineForm, ProductionForm, UserRegisterForm
 from django.contrib.auth import login
 from django.db.models import Q
+from django.db import transaction
+from .outbox import enqueue
 
 @login_required
 def dashboard(request):
@@ -150,8 +152,10 @@ def cancel_machine(request, pm_id):
         production__user=request.user
     )
 
-    pm.cancel()                 # 🔥 regra centralizada
-    pm.production.try_finish()  # 🔥 verifica produção
+    with transaction.atomic():
+        pm.cancel()                 # 🔥 regra centralizada
+        # 🔥 verificação da produção fica para o worker (outbox), fora do request
+        enqueue('production.evaluate_finish', production_id=pm.production_id)
 
     return redirect('dashboard')
 
@@ -163,8 +167,9 @@ def finish_machine(request, pm_id):
         production__user=request.user
     )
 
-    pm.finish()
-    pm.production.try_finish()
+    with transaction.atomic():
+        pm.finish()
+        enqueue('production.evaluate_finish', production_id=pm.production_id)
 
     return redirect('dashboard')
 
@@ -222,8 +227,9 @@ def cancel_production_machine(request, pk):
     if pm.machine.owner_user != request.user:
         return redirect('dashboard')
 
-    pm.cancel()
-    pm.production.try_finish()
+    with transaction.atomic():
+        pm.cancel()
+        enqueue('production.evaluate_finish', production_id=pm.production_id)
     return redirect('dashboard')
 
 
@@ -259,8 +265,9 @@ def finish_production_machine(request, pk):
     if pm.machine.owner_user != request.user:
         return redirect('dashboard')
 
-    pm.finish()
-    pm.production.try_finish()
+    with transaction.atomic():
+        pm.finish()
+        enqueue('production.evaluate_finish', production_id=pm.production_id)
     return redirect('dashboard')
 
 @login_required
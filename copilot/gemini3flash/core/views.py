@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.utils import timezone
+from django.db import transaction
 from .models import Machine, Production, ProductionMachine
 from .forms import MachineForm, ProductionForm, UserRegistrationForm
 from django.db.models import Count, Q
@@ -66,18 +67,30 @@ def production_create(request):
     if request.method == 'POST':
         form = ProductionForm(request.POST, user=request.user)
         if form.is_valid():
-            production = form.save(commit=False)
-            production.user = request.user
-            production.save()
-            
-            machines = form.cleaned_data['machines']
-            for machine in machines:
-                ProductionMachine.objects.create(
-                    production=production,
-                    machine=machine,
-                    status='STANDBY'
-                )
-            return redirect('home')
+            selected_ids = [m.id for m in form.cleaned_data['machines']]
+            with transaction.atomic():
+                # Trava as máquinas escolhidas e confere a disponibilidade de todas numa query só
+                machines = list(Machine.objects.select_for_update().filter(owner=request.user, id__in=selected_ids))
+                busy = ProductionMachine.objects.filter(
+                    machine__in=machines,
+                    production__status__in=['STANDBY', 'ONGOING']
+                ).exists()
+
+                if busy or len(machines) != len(selected_ids):
+                    form.add_error('machines', "Uma ou mais máquinas não estão mais disponíveis.")
+                else:
+                    production = form.save(commit=False)
+                    production.user = request.user
+                    production.save()
+
+                    # Um único INSERT para todos os vínculos
+                    ProductionMachine.objects.bulk_create([
+                        ProductionMachine(production=production, machine=machine, status='STANDBY')
+                        for machine in machines
+                    ])
+
+            if form.is_valid():
+                return redirect('home')
     else:
         form = ProductionForm(user=request.user)
     return render(request, 'core/production_form.html', {'form': form})
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from core.common.sharding import mirror_user
+
+        post_save.connect(mirror_user, sender=self.get_model('User'), dispatch_uid='mirror_user_to_shard')
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_is_premium'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='shard',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
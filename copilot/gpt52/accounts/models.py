@@ -47,6 +47,8 @@ class User(BaseModel, AbstractBaseUser, PermissionsMixin):
 	email = models.EmailField(max_length=255)
 	cnpj = models.CharField(max_length=32)
 	is_premium = models.BooleanField(default=False)
+	# Shard dos dados do tenant (ver core.common.sharding); vazio = hash do CNPJ.
+	shard = models.PositiveSmallIntegerField(null=True, blank=True)
 
 	is_staff = models.BooleanField(default=False)
 	is_active = models.BooleanField(default=True)
@@ -0,0 +1,143 @@
+"""
+Roteamento primário/réplica.
+
+- Escritas sempre vão para `default` (primário).
+- Leituras vão para `replica` somente dentro de views marcadas com @use_replica
+  (dashboard, listas, relatórios) e apenas em GET/HEAD.
+- Depois de uma escrita, o navegador recebe um cookie que mantém as leituras no primário
+  por REPLICA_STICKY_SECONDS: o redirect após um POST enxerga o que acabou de ser gravado,
+  mesmo que a réplica ainda esteja atrasada. "Escrita" é um INSERT/UPDATE/DELETE que de
+  fato chegou a um banco (execute_wrapper nas conexões), e não uma consulta ao roteador:
+  escolher o banco para uma escrita que não acontece não prende o cliente ao primário.
+
+Sem o alias `replica` em DATABASES, tudo continua no `default`.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary_until'
+
+# Apps que nunca leem da réplica: a sessão precisa refletir o login/logout imediatamente.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+@dataclass
+class _RoutingState:
+    replica_allowed: bool = False
+    pinned_to_primary: bool = False
+    wrote: bool = False
+
+
+_state: ContextVar[_RoutingState | None] = ContextVar('db_routing_state', default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in connections.databases
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.replica_allowed
+            or state.pinned_to_primary
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            or not replica_configured()
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados: relações entre eles são válidas.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o schema por replicação, nunca por migrate.
+        return db == DEFAULT_DB_ALIAS
+
+
+# Comandos que não alteram dados (o SAVEPOINT do transaction.atomic também passa por aqui).
+READ_ONLY_SQL = ('SELECT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'PRAGMA', 'EXPLAIN', 'SHOW', 'SET')
+
+
+class _WriteTracker:
+    """execute_wrapper que marca o request como "escreveu" ao ver um comando que altera dados."""
+
+    def __init__(self, state: _RoutingState):
+        self.state = state
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.state.wrote and not sql.lstrip().upper().startswith(READ_ONLY_SQL):
+            self.state.wrote = True
+            # Leituras seguintes do mesmo request também precisam ver a escrita.
+            self.state.pinned_to_primary = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaStickinessMiddleware:
+    """Abre o estado de roteamento do request e grava o cookie de "ler do primário" após escritas."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RoutingState(pinned_to_primary=self._is_sticky(request))
+        token = _state.set(state)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_WriteTracker(state)))
+                response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote:
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(int(time.time()) + window),
+                max_age=window,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _is_sticky(request) -> bool:
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def use_replica(view_func):
+    """Permite que as leituras da view (somente GET/HEAD) sejam servidas pela réplica."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        previous = state.replica_allowed
+        state.replica_allowed = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.replica_allowed = previous
+
+    return wrapper
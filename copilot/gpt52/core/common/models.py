@@ -6,7 +6,9 @@ from django.utils import timezone
 
 class SoftDeleteQuerySet(models.QuerySet):
     def delete(self):
-        return super().update(deleted_at=timezone.now())
+        # updated_at também: .update() não passa pelo auto_now e o feed de mudanças depende dele.
+        now = timezone.now()
+        return super().update(deleted_at=now, updated_at=now)
 
     def hard_delete(self):
         return super().delete()
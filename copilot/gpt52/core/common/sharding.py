@@ -0,0 +1,161 @@
+"""
+Sharding por tenant (usuário/CNPJ).
+
+Opcional: só entra em ação quando TENANT_SHARDS > 0 cria os aliases `shard_0..shard_N-1`.
+
+- `default` continua sendo o diretório: usuários, sessões, admin.
+- Os dados do app `factory` (máquinas, produções, execuções, rollups) moram no shard do
+  dono. O shard vem de `User.shard` (definido ao mover o tenant) ou, se vazio, de um hash
+  estável do CNPJ.
+- A linha do usuário é espelhada no shard dele, para as FKs (owner/user) continuarem
+  válidas dentro do banco do shard.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+SHARD_PREFIX = 'shard_'
+# Faixa de ids de cada shard (shard_N começa em N * SHARD_ID_SPAN; ver migrate_shards).
+SHARD_ID_SPAN = 10**12
+
+# Apps cujos dados ficam no shard do tenant.
+SHARDED_APPS = {'factory'}
+# Apps cujas tabelas também existem nos shards (o usuário espelhado e suas dependências).
+MIRRORED_APPS = {'accounts', 'auth', 'contenttypes'}
+
+_current_shard: ContextVar[str | None] = ContextVar('tenant_shard', default=None)
+
+
+def shard_aliases() -> list[str]:
+    aliases = [alias for alias in connections.databases if alias.startswith(SHARD_PREFIX)]
+    return sorted(aliases, key=lambda alias: int(alias[len(SHARD_PREFIX):]))
+
+
+def sharding_enabled() -> bool:
+    return bool(shard_aliases())
+
+
+def shard_alias(index: int) -> str:
+    alias = f'{SHARD_PREFIX}{index}'
+    if alias not in connections.databases:
+        raise ValueError(f'Shard inexistente: {alias}')
+    return alias
+
+
+def shard_for_user(user) -> str:
+    aliases = shard_aliases()
+    if user.shard is not None:
+        return shard_alias(user.shard)
+    key = (user.cnpj or str(user.pk)).encode()
+    return aliases[int.from_bytes(hashlib.sha256(key).digest()[:8], 'big') % len(aliases)]
+
+
+def tenant_alias(user) -> str:
+    """Banco dos dados de `factory` do usuário (o próprio `default` sem shards)."""
+    return shard_for_user(user) if sharding_enabled() else DEFAULT_DB_ALIAS
+
+
+def _is_user(instance) -> bool:
+    return instance._meta.label == settings.AUTH_USER_MODEL
+
+
+@contextmanager
+def tenant_context(alias: str | None):
+    """Define o shard usado pelas queries de `factory` sem instância de referência."""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+@contextmanager
+def instance_transaction(instance):
+    """transaction.atomic no banco onde a instância mora, com o tenant dela ativo."""
+    alias = instance._state.db or router.db_for_write(type(instance), instance=instance)
+    with tenant_context(alias), transaction.atomic(using=alias):
+        yield
+
+
+def instance_atomic(method):
+    """
+    instance_transaction(self) como decorator.
+
+    Substitui @transaction.atomic nos métodos de ciclo de vida: com shards, a transação
+    precisa ser aberta no shard (e não no `default`) para cobrir as escritas e os locks.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with instance_transaction(self):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class TenantShardRouter:
+    def _db_for_model(self, model, **hints):
+        if model._meta.app_label not in SHARDED_APPS or not sharding_enabled():
+            return None
+
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._meta.app_label in SHARDED_APPS and instance._state.db:
+                return instance._state.db
+            if _is_user(instance):
+                # request.user.productions etc.: o usuário vem do `default`, os dados do shard dele.
+                return shard_for_user(instance)
+
+        alias = _current_shard.get()
+        if alias is None or alias == DEFAULT_DB_ALIAS:
+            raise RuntimeError(
+                f'Acesso a {model._meta.label} sem tenant definido; use tenant_context() ou .using().'
+            )
+        return alias
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled() and {obj1._meta.app_label, obj2._meta.app_label} & SHARDED_APPS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db.startswith(SHARD_PREFIX):
+            return app_label in SHARDED_APPS | MIRRORED_APPS
+        if app_label in SHARDED_APPS and sharding_enabled():
+            return False
+        return None
+
+
+class TenantShardMiddleware:
+    """Ativa o shard do usuário logado durante o request (depois do AuthenticationMiddleware)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding_enabled() or not request.user.is_authenticated:
+            return self.get_response(request)
+        with tenant_context(shard_for_user(request.user)):
+            return self.get_response(request)
+
+
+def mirror_user(sender, instance, using, raw=False, **kwargs):
+    """post_save do usuário: copia a linha para o shard do tenant."""
+    if raw or using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+    sender._base_manager.using(shard_for_user(instance)).update_or_create(pk=instance.pk, defaults=values)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.template import TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+
+def iter_template_names(backend) -> list[str]:
+    """Lista os nomes (relativos) de todos os templates visíveis pelo backend (DIRS + apps)."""
+    # Com 'loaders' explícito o backend tem APP_DIRS=False, então os diretórios dos apps entram aqui.
+    directories = [*backend.engine.dirs, *get_app_template_dirs('templates')]
+    names = set()
+    for directory in directories:
+        root = Path(directory)
+        if not root.is_dir():
+            continue
+        for path in root.rglob('*.html'):
+            names.add(path.relative_to(root).as_posix())
+    return sorted(names)
+
+
+def precompile_templates(alias: str = 'django') -> int:
+    """
+    Carrega todos os templates no cached loader do engine.
+
+    Só tem efeito quando o engine usa `django.template.loaders.cached.Loader`;
+    nesse caso o primeiro request já encontra os templates compilados.
+    Retorna quantos templates foram compilados.
+    """
+    backend = engines[alias]
+    engine = backend.engine
+    compiled = 0
+    for name in iter_template_names(backend):
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            # Templates de terceiros podem depender de libs não instaladas; não derrubam o boot.
+            continue
+        compiled += 1
+    return compiled
@@ -48,10 +48,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.common.db.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.common.sharding.TenantShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,9 +86,65 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.environ.get('SQLITE_PATH', str(BASE_DIR / 'data' / 'db.sqlite3')),
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: no SQLite, SELECT ... FOR UPDATE é ignorado; pegar o lock de
+            # escrita no início da transação evita que duas transições leiam o mesmo estado.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # Arquivo (e não memória compartilhada) para os testes com várias threads/conexões.
+            'NAME': str(BASE_DIR / 'data' / 'test_db.sqlite3'),
+        },
     }
 }
 
+# Réplica de leitura (opcional): outro arquivo SQLite (cópia mantida por replicação externa,
+# ex.: litestream) ou um postgres. Só é usada pelas views marcadas com @use_replica.
+if os.environ.get('REPLICA_SQLITE_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['REPLICA_SQLITE_PATH'],
+        'OPTIONS': {'timeout': 20},
+        # Nos testes a réplica aponta para o mesmo banco do primário.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Sharding por tenant (opcional): TENANT_SHARDS=N cria shard_0..shard_N-1, um SQLite cada.
+# Migrar com `python manage.py migrate_shards`.
+TENANT_SHARDS = int(os.environ.get('TENANT_SHARDS', '0'))
+SHARDS_DIR = Path(os.environ.get('SHARDS_DIR', str(BASE_DIR / 'data')))
+for _index in range(TENANT_SHARDS):
+    DATABASES[f'shard_{_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(SHARDS_DIR / f'shard_{_index}.sqlite3'),
+        'OPTIONS': DATABASES['default']['OPTIONS'],
+        'TEST': {'NAME': str(SHARDS_DIR / f'test_shard_{_index}.sqlite3')},
+    }
+
+DATABASE_ROUTERS = [
+    'core.common.sharding.TenantShardRouter',
+    'core.common.db.PrimaryReplicaRouter',
+]
+
+# Janela (segundos) em que o navegador lê do primário depois de uma escrita.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
+# Contagem de unidades produzidas (factory/ingest.py): journal por processo + flush em lote.
+INGEST_JOURNAL_DIR = Path(os.environ.get('INGEST_JOURNAL_DIR', str(BASE_DIR / 'data' / 'ingest')))
+INGEST_FLUSH_EVENTS = int(os.environ.get('INGEST_FLUSH_EVENTS', '500'))
+INGEST_FLUSH_SECONDS = float(os.environ.get('INGEST_FLUSH_SECONDS', '2'))
+# fsync a cada evento: sobrevive a queda de energia, não só do processo.
+INGEST_FSYNC = os.environ.get('INGEST_FSYNC', '1') == '1'
+
+# Heartbeat das máquinas (factory/heartbeat.py): pings em memória, gravados em lote.
+HEARTBEAT_FLUSH_SECONDS = float(os.environ.get('HEARTBEAT_FLUSH_SECONDS', '30'))
+# Sem ping há mais que isso: a máquina é considerada sem sinal.
+HEARTBEAT_STALE_SECONDS = int(os.environ.get('HEARTBEAT_STALE_SECONDS', '120'))
+
+# Feed de mudanças (factory/changes.py): mudanças mais novas que isso esperam a próxima página.
+SYNC_SETTLE_SECONDS = float(os.environ.get('SYNC_SETTLE_SECONDS', '2'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,39 @@
+"""
+Perfil de produção.
+
+Uso: DJANGO_SETTINGS_MODULE=core.settings_production
+
+Herda core.settings e muda apenas o necessário:
+- DEBUG desligado por padrão (DJANGO_DEBUG continua podendo sobrescrever);
+- cached template loader explícito;
+- pré-compilação de todos os templates no boot do worker (ver core/wsgi.py).
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+DEBUG = os.environ.get('DJANGO_DEBUG', '0') == '1'
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        # Com 'loaders' definido, APP_DIRS precisa ser False (app_directories.Loader entra na lista).
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                (
+                    'django.template.loaders.cached.Loader',
+                    [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ],
+                ),
+            ],
+        },
+    },
+]
+
+TEMPLATES_PRECOMPILE = os.environ.get('DJANGO_TEMPLATES_PRECOMPILE', '1') == '1'
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Perfil de produção: compila todos os templates antes do primeiro request.
+if getattr(settings, 'TEMPLATES_PRECOMPILE', False):
+    from core.common.templates import precompile_templates
+
+    precompile_templates()
@@ -1,25 +1,275 @@
-from django.contrib import admin
+from urllib.parse import parse_qs
 
-from .models import Machine, Production, ProductionMachine
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from core.common.sharding import shard_aliases, sharding_enabled
+
+from .models import (
+	Machine,
+	MachineRequest,
+	MachineRollup,
+	Production,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+	SyncEvent,
+	UserRollup,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+	"""
+	Paginator que não faz COUNT(*) completo em tabelas grandes sem filtro.
+
+	Sem filtro/busca, conta no máximo `count_cap` linhas (COUNT sobre subquery com LIMIT,
+	que para de ler ao atingir o limite); se passar disso, usa uma estimativa barata da
+	tabela inteira: `reltuples` do planner no PostgreSQL, `MAX(id) - MIN(id) + 1` no SQLite
+	(duas buscas no rowid; conta também buracos e linhas excluídas). Com filtro ou busca,
+	a estimativa da tabela não vale para o subconjunto: faz um único COUNT real.
+	"""
+
+	count_cap = 10_000
+
+	@cached_property
+	def count(self):
+		if not isinstance(self.object_list, QuerySet):
+			return super().count
+		if not self._is_unfiltered():
+			return self.object_list.order_by().count()
+
+		capped = self.object_list.order_by()[: self.count_cap + 1].count()
+		if capped <= self.count_cap:
+			return capped
+		return max(self._estimated_table_rows(), capped)
+
+	def _is_unfiltered(self) -> bool:
+		# Mesmo WHERE do manager padrão (soft delete): nenhum filtro lateral nem busca aplicados.
+		default = self.object_list.model._default_manager.all()
+		return self.object_list.query.where == default.query.where
+
+	def _estimated_table_rows(self) -> int:
+		connection = connections[self.object_list.db]
+		table = connection.ops.quote_name(self.object_list.model._meta.db_table)
+		if connection.vendor == 'postgresql':
+			sql, params = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [self.object_list.model._meta.db_table]
+		elif connection.vendor == 'sqlite':
+			# Cada subquery com um único MAX/MIN vira uma busca na ponta do rowid.
+			sql, params = f'SELECT (SELECT MAX(id) FROM {table}) - (SELECT MIN(id) FROM {table}) + 1', []
+		else:
+			return 0
+		with connection.cursor() as cursor:
+			cursor.execute(sql, params)
+			row = cursor.fetchone()
+		return int(row[0]) if row and row[0] is not None else 0
+
+
+class SerialPrefixSearchMixin:
+	"""
+	Soma à busca padrão os registros cujo serial começa com o termo.
+
+	O prefixo vira uma faixa no índice único de serialnumber
+	(`serialnumber >= termo AND serialnumber < termo + U+10FFFF`), sensível a maiúsculas;
+	o `^`/`istartswith` do admin vira `LIKE` sem distinção de maiúsculas, que o SQLite não
+	atende pelo índice. Os demais `search_fields` continuam com `icontains`, em OR.
+	"""
+
+	serial_search_field = 'serialnumber'
+
+	def get_search_results(self, request, queryset, search_term):
+		results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+		term = search_term.strip()
+		if term:
+			field = self.serial_search_field
+			results |= queryset.filter(**{f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'})
+		return results, may_have_duplicates
+
+
+class ShardListFilter(admin.SimpleListFilter):
+	"""Seletor de shard na lateral do changelist (o filtro em si é aplicado em get_queryset)."""
+
+	title = 'shard'
+	parameter_name = 'shard'
+
+	def __init__(self, request, params, model, model_admin):
+		self.selected = model_admin.selected_shard(request)
+		super().__init__(request, params, model, model_admin)
+
+	def lookups(self, request, model_admin):
+		return [(alias, alias) for alias in shard_aliases()]
+
+	def queryset(self, request, queryset):
+		return queryset
+
+	def choices(self, changelist):
+		for alias, title in self.lookup_choices:
+			yield {
+				'selected': alias == self.selected,
+				'query_string': changelist.get_query_string({self.parameter_name: alias}),
+				'display': title,
+			}
+
+
+class ShardAdminMixin:
+	"""
+	Admin dos dados de `factory` com shards: cada changelist lista um shard por vez,
+	escolhido no filtro lateral (padrão: shard_0), e todas as leituras/escritas usam esse banco.
+	Não há listagem unificada de todos os shards: o ChangeList do admin precisa de um único
+	QuerySet (filtro, ordenação e paginação no banco). Sem shards, nada muda.
+	"""
+
+	def get_list_filter(self, request):
+		list_filter = tuple(super().get_list_filter(request))
+		return (ShardListFilter, *list_filter) if sharding_enabled() else list_filter
+
+	def selected_shard(self, request):
+		aliases = shard_aliases()
+		if not aliases:
+			return None
+		shard = request.GET.get('shard')
+		if shard is None:
+			# change_view/delete_view preservam os filtros do changelist em _changelist_filters.
+			preserved = parse_qs(request.GET.get('_changelist_filters', ''))
+			shard = preserved.get('shard', [None])[0]
+		return shard if shard in aliases else aliases[0]
+
+	def get_queryset(self, request):
+		queryset = super().get_queryset(request)
+		shard = self.selected_shard(request)
+		return queryset.using(shard) if shard else queryset
+
+	def has_add_permission(self, request):
+		# Com shards, os cadastros nascem pelo app, já no shard do tenant.
+		return not sharding_enabled() and super().has_add_permission(request)
+
+	def formfield_for_foreignkey(self, db_field, request, **kwargs):
+		shard = self.selected_shard(request)
+		if shard:
+			kwargs['using'] = shard
+		return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+	def formfield_for_manytomany(self, db_field, request, **kwargs):
+		shard = self.selected_shard(request)
+		if shard:
+			kwargs['using'] = shard
+		return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class LargeTableAdmin(ShardAdminMixin, admin.ModelAdmin):
+	paginator = EstimatedCountPaginator
+	# Evita o segundo COUNT(*) sem filtros que o admin faz para exibir "N total".
+	show_full_result_count = False
+	list_per_page = 50
 
 
 @admin.register(Machine)
-class MachineAdmin(admin.ModelAdmin):
+class MachineAdmin(SerialPrefixSearchMixin, LargeTableAdmin):
 	list_display = ('id', 'model', 'serialnumber', 'owner', 'created_at', 'deleted_at')
-	search_fields = ('model', 'serialnumber', 'owner__name')
+	list_select_related = ('owner',)
+	search_fields = ('model', 'owner__name')
 	list_filter = ('deleted_at',)
 
 
 @admin.register(Production)
-class ProductionAdmin(admin.ModelAdmin):
+class ProductionAdmin(LargeTableAdmin):
 	list_display = ('id', 'description', 'user', 'status', 'created_at', 'deleted_at')
+	list_select_related = ('user',)
 	search_fields = ('description', 'user__name')
 	list_filter = ('status', 'deleted_at')
+	actions = ('cancel_productions', 'finish_productions')
+
+	@admin.action(description='Cancelar produções selecionadas (e suas máquinas)')
+	def cancel_productions(self, request, queryset):
+		done = 0
+		with transaction.atomic(using=queryset.db):
+			for production in queryset.exclude(status__in=[ProductionStatus.FINISHED, ProductionStatus.CANCELED]):
+				production.cancel()
+				done += 1
+			skipped = queryset.count() - done
+		self._report(request, 'canceladas', done, skipped)
+
+	@admin.action(description='Finalizar produções selecionadas')
+	def finish_productions(self, request, queryset):
+		done = 0
+		with transaction.atomic(using=queryset.db):
+			for production in queryset.exclude(status__in=[ProductionStatus.FINISHED, ProductionStatus.CANCELED]):
+				try:
+					production.finish()
+				except ValueError:
+					continue
+				done += 1
+			skipped = queryset.count() - done
+		self._report(request, 'finalizadas', done, skipped)
+
+	def _report(self, request, verb, done, skipped):
+		self.message_user(request, f'{done} produções {verb}.', messages.SUCCESS)
+		if skipped:
+			self.message_user(request, f'{skipped} ignoradas (já encerradas ou com máquinas em STANDBY/ONGOING).', messages.WARNING)
 
 
 @admin.register(ProductionMachine)
-class ProductionMachineAdmin(admin.ModelAdmin):
+class ProductionMachineAdmin(SerialPrefixSearchMixin, LargeTableAdmin):
 	list_display = ('id', 'production', 'machine', 'status', 'created_at', 'deleted_at')
+	list_select_related = ('production', 'machine')
 	list_filter = ('status', 'deleted_at')
+	search_fields = ('production__description',)
+	serial_search_field = 'machine__serialnumber'
+	actions = ('cancel_executions', 'finish_executions')
+
+	def _open_executions(self, queryset):
+		return queryset.exclude(status__in=[ProductionMachineStatus.FINISHED, ProductionMachineStatus.CANCELED])
+
+	@admin.action(description='Cancelar execuções selecionadas')
+	def cancel_executions(self, request, queryset):
+		with transaction.atomic(using=queryset.db):
+			pms = list(self._open_executions(queryset))
+			for pm in pms:
+				pm.cancel()
+		self.message_user(request, f'{len(pms)} execuções canceladas.', messages.SUCCESS)
+
+	@admin.action(description='Finalizar execuções selecionadas')
+	def finish_executions(self, request, queryset):
+		with transaction.atomic(using=queryset.db):
+			pms = list(self._open_executions(queryset))
+			for pm in pms:
+				pm.finish()
+		self.message_user(request, f'{len(pms)} execuções finalizadas.', messages.SUCCESS)
+
+
+@admin.register(MachineRequest)
+class MachineRequestAdmin(LargeTableAdmin):
+	list_display = ('id', 'production', 'machine_model', 'priority', 'due_at', 'status', 'assigned_machine', 'created_at')
+	list_select_related = ('production', 'assigned_machine')
+	list_filter = ('status',)
+	search_fields = ('machine_model', 'production__description')
+
+
+@admin.register(SyncEvent)
+class SyncEventAdmin(LargeTableAdmin):
+	list_display = ('id', 'user', 'key', 'kind', 'target_id', 'client_at', 'outcome', 'status', 'created_at')
+	list_select_related = ('user',)
+	list_filter = ('outcome', 'kind')
+	search_fields = ('key',)
+
+
+@admin.register(UserRollup)
+class UserRollupAdmin(LargeTableAdmin):
+	list_display = (
+		'bucket', 'granularity', 'user', 'productions_started', 'productions_finished',
+		'productions_canceled', 'quantity_produced', 'working_minutes',
+	)
+	list_select_related = ('user',)
+	list_filter = ('granularity',)
+
 
-# Register your models here.
+@admin.register(MachineRollup)
+class MachineRollupAdmin(LargeTableAdmin):
+	list_display = (
+		'bucket', 'granularity', 'machine', 'executions_started', 'executions_finished',
+		'executions_canceled', 'working_minutes',
+	)
+	list_select_related = ('machine',)
+	list_filter = ('granularity',)
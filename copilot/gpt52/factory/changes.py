@@ -0,0 +1,108 @@
+"""
+Feed de mudanças ("changes since cursor") para terminais e integrações.
+
+O cliente guarda um cursor opaco e pede só o que mudou depois dele: produções, execuções
+(ProductionMachine) e máquinas criadas, alteradas ou excluídas (soft delete), lidas de
+`all_objects`. Cada modelo anda pela ordem (updated_at, id), coberta por índice, então o
+custo de uma sincronização acompanha a quantidade de mudanças e não o tamanho da base.
+
+Toda escrita precisa atualizar `updated_at`: `save()` faz isso sozinho (auto_now), mas
+`.update()` não, e por isso os updates em lote do projeto passam `updated_at` explicitamente.
+Exceção proposital: o heartbeat (`Machine.last_seen`) não entra no feed.
+
+Linhas com updated_at nos últimos SYNC_SETTLE_SECONDS ficam para a próxima página: uma
+transação mais lenta ainda pode gravar um horário anterior, e o cursor não pode passar dela.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Machine, Production, ProductionMachine
+
+FEEDS = {
+	'productions': (
+		Production,
+		'user',
+		(
+			'id', 'description', 'quantity', 'produced', 'status', 'started_at', 'finished_at',
+			'canceled_at', 'created_at', 'updated_at', 'deleted_at',
+		),
+	),
+	'production_machines': (
+		ProductionMachine,
+		'production__user',
+		(
+			'id', 'production_id', 'machine_id', 'status', 'started_at', 'finished_at', 'canceled_at',
+			'working_time', 'created_at', 'updated_at', 'deleted_at',
+		),
+	),
+	'machines': (
+		Machine,
+		'owner',
+		('id', 'model', 'serialnumber', 'created_at', 'updated_at', 'deleted_at'),
+	),
+}
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+
+class InvalidCursor(ValueError):
+	pass
+
+
+def encode_cursor(positions: dict) -> str:
+	raw = json.dumps(
+		{name: [updated_at.isoformat(), pk] for name, (updated_at, pk) in positions.items() if updated_at},
+		separators=(',', ':'),
+	)
+	return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token: str | None) -> dict:
+	"""Cursor vazio = desde o início. Devolve feed -> (updated_at, id)."""
+	if not token:
+		return {}
+	try:
+		raw = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+		return {
+			name: (datetime.fromisoformat(updated_at), int(pk))
+			for name, (updated_at, pk) in raw.items()
+			if name in FEEDS
+		}
+	except (ValueError, TypeError, AttributeError, UnicodeDecodeError):
+		raise InvalidCursor('Cursor inválido')
+
+
+def changes_since(user, token: str | None, limit: int = DEFAULT_LIMIT, now=None) -> dict:
+	"""
+	Uma página do feed: até `limit` linhas de cada modelo depois do cursor.
+	`has_more` indica que o cliente deve pedir de novo com `next_cursor` logo em seguida.
+	"""
+	positions = decode_cursor(token)
+	settled = (now or timezone.now()) - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+	changes = {}
+	has_more = False
+	for name, (model, owner_field, fields) in FEEDS.items():
+		queryset = model.all_objects.filter(**{owner_field: user}, updated_at__lt=settled)
+		position = positions.get(name)
+		if position:
+			updated_at, pk = position
+			queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+		rows = list(queryset.order_by('updated_at', 'id').values(*fields)[: limit + 1])
+		if len(rows) > limit:
+			rows = rows[:limit]
+			has_more = True
+		if rows:
+			positions[name] = (rows[-1]['updated_at'], rows[-1]['id'])
+		changes[name] = rows
+
+	return {'changes': changes, 'next_cursor': encode_cursor(positions), 'has_more': has_more}
@@ -0,0 +1,97 @@
+"""
+Autenticação das máquinas e terminais do chão de fábrica.
+
+Um dispositivo não guarda cookie de sessão nem token CSRF: cada requisição traz
+`Authorization: Device <id da máquina>.<segredo>`. O token é emitido por máquina
+(`python manage.py issue_device_token <serial>`); só o SHA-256 do segredo fica em
+`Machine.device_token_hash`, e emitir outro invalida o anterior.
+
+A requisição autenticada pelo token roda como o dono da máquina, no shard dele, e fica
+isenta de CSRF (não há cookie para um site de terceiros aproveitar). Sem o cabeçalho, as
+mesmas views continuam aceitando o usuário logado no navegador, com sessão e CSRF.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import secrets
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+from django.db import DEFAULT_DB_ALIAS
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from core.common.sharding import shard_aliases, tenant_context
+
+from .models import Machine
+
+AUTH_SCHEME = 'Device'
+
+# id da máquina -> banco onde ela mora (os ids não se repetem entre shards)
+_machine_aliases: dict[int, str] = {}
+
+
+def _hash(secret: str) -> str:
+	return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def issue_token(machine: Machine) -> str:
+	"""Gera um token novo para a máquina (o anterior deixa de valer) e o devolve em claro."""
+	secret = secrets.token_urlsafe(32)
+	machine.device_token_hash = _hash(secret)
+	machine.save(update_fields=['device_token_hash', 'updated_at'])
+	return f'{machine.pk}.{secret}'
+
+
+def _find_machine(machine_id: int) -> Machine | None:
+	cached = _machine_aliases.get(machine_id)
+	aliases = shard_aliases() or [DEFAULT_DB_ALIAS]
+	for alias in ([cached] if cached in aliases else []) + [a for a in aliases if a != cached]:
+		machine = Machine.objects.using(alias).select_related('owner').filter(pk=machine_id).first()
+		if machine is not None:
+			_machine_aliases[machine_id] = alias
+			return machine
+	return None
+
+
+def authenticate(header: str) -> Machine | None:
+	"""Máquina dona do token do cabeçalho Authorization, ou None se ele não vale."""
+	scheme, _, token = header.partition(' ')
+	machine_id, _, secret = token.strip().partition('.')
+	if scheme != AUTH_SCHEME or not machine_id.isdigit() or not secret:
+		return None
+	machine = _find_machine(int(machine_id))
+	if machine is None or not machine.device_token_hash:
+		return None
+	if not hmac.compare_digest(machine.device_token_hash, _hash(secret)):
+		return None
+	return machine
+
+
+def device_or_login_required(view_func):
+	"""
+	Aceita o token do dispositivo (sem CSRF) ou, sem o cabeçalho, o usuário logado (com CSRF).
+
+	Com o token, `request.device` é a máquina e `request.user` o dono dela.
+	"""
+	browser_view = login_required(csrf_protect(view_func))
+
+	@csrf_exempt
+	@wraps(view_func)
+	def wrapper(request, *args, **kwargs):
+		header = request.META.get('HTTP_AUTHORIZATION')
+		if header is None:
+			request.device = None
+			return browser_view(request, *args, **kwargs)
+
+		machine = authenticate(header)
+		if machine is None:
+			return JsonResponse({'error': 'Token de dispositivo inválido.'}, status=401)
+		request.device = machine
+		request.user = machine.owner
+		with tenant_context(machine._state.db):
+			return view_func(request, *args, **kwargs)
+
+	return wrapper
@@ -0,0 +1,168 @@
+"""
+Despacho de máquinas liberadas para produções em espera.
+
+Produções abertas (STANDBY/ONGOING) pedem máquinas de um modelo (`MachineRequest`).
+Quando uma execução termina ou é cancelada, a máquina volta a ficar livre e o despachante
+a atribui ao pedido mais urgente da fila do dono para aquele modelo, na mesma transação:
+maior prioridade, depois prazo mais próximo (sem prazo por último), depois chegada.
+
+- dispatch_machine(): caminho do finish/cancel, uma máquina; a cabeça da fila vem do
+  índice `machine_request_queue` (ORDER BY ... LIMIT 1), sem carregar a fila inteira.
+- dispatch_idle(): varredura em lote (novo pedido, comando dispatch_machines); carrega os
+  pedidos em espera em heaps por (dono, modelo) e distribui todas as máquinas livres.
+"""
+
+from __future__ import annotations
+
+import heapq
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+	Machine,
+	MachineRequest,
+	MachineRequestStatus,
+	MachineRollup,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+)
+
+# Execuções nesses status ainda seguram a máquina.
+BUSY_STATUSES = (ProductionMachineStatus.STANDBY, ProductionMachineStatus.ONGOING, ProductionMachineStatus.HALT)
+OPEN_PRODUCTION_STATUSES = (ProductionStatus.STANDBY, ProductionStatus.ONGOING)
+
+NO_DUE = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+
+def queue_key(request: MachineRequest) -> tuple:
+	return (-request.priority, request.due_at or NO_DUE, request.id)
+
+
+class DispatchQueue:
+	"""Um heap (queue_key, pedido) por (dono, modelo)."""
+
+	def __init__(self):
+		self._heaps: dict[tuple, list] = {}
+
+	@classmethod
+	def load(cls, requests) -> DispatchQueue:
+		queue = cls()
+		for request in requests:
+			queue._heaps.setdefault((request.owner_id, request.machine_model), []).append((queue_key(request), request))
+		for heap in queue._heaps.values():
+			heapq.heapify(heap)
+		return queue
+
+	def __len__(self):
+		return sum(len(heap) for heap in self._heaps.values())
+
+	def keys(self) -> set[tuple]:
+		return {key for key, heap in self._heaps.items() if heap}
+
+	def requests(self):
+		return [request for heap in self._heaps.values() for _, request in heap]
+
+	def push(self, request: MachineRequest):
+		heapq.heappush(self._heaps.setdefault((request.owner_id, request.machine_model), []), (queue_key(request), request))
+
+	def pop(self, owner_id, machine_model: str, skip=None) -> MachineRequest | None:
+		"""Remove e devolve o pedido mais urgente; pedidos recusados por `skip` voltam para a fila."""
+		heap = self._heaps.get((owner_id, machine_model))
+		skipped = []
+		found = None
+		while heap:
+			item = heapq.heappop(heap)
+			if skip is not None and skip(item[1]):
+				skipped.append(item)
+				continue
+			found = item[1]
+			break
+		for item in skipped:
+			heapq.heappush(heap, item)
+		return found
+
+
+def _waiting_requests():
+	return MachineRequest.objects.filter(
+		status=MachineRequestStatus.WAITING,
+		production__status__in=OPEN_PRODUCTION_STATUSES,
+	).select_related('production')
+
+
+def assign(machine: Machine, request: MachineRequest, at) -> ProductionMachine:
+	"""Vincula a máquina à produção do pedido; em produção ONGOING a execução já começa."""
+	production = request.production
+	if production.status == ProductionStatus.ONGOING:
+		pm = ProductionMachine.objects.create(
+			production=production,
+			machine=machine,
+			status=ProductionMachineStatus.ONGOING,
+			started_at=at,
+		)
+		MachineRollup.bump(machine.id, at, executions_started=1)
+	else:
+		pm = ProductionMachine.objects.create(production=production, machine=machine, status=ProductionMachineStatus.STANDBY)
+
+	request.status = MachineRequestStatus.ASSIGNED
+	request.assigned_machine = machine
+	request.assigned_at = at
+	request.save(update_fields=['status', 'assigned_machine', 'assigned_at', 'updated_at'])
+	return pm
+
+
+def dispatch_machine(machine_id: int, at=None) -> ProductionMachine | None:
+	"""Atribui uma máquina recém-liberada ao próximo pedido (chamar dentro da transação da liberação)."""
+	machine = Machine.objects.filter(pk=machine_id).first()
+	if machine is None or ProductionMachine.objects.filter(machine_id=machine_id, status__in=BUSY_STATUSES).exists():
+		return None
+
+	request = (
+		_waiting_requests()
+		.select_for_update()
+		.filter(owner_id=machine.owner_id, machine_model=machine.model)
+		.exclude(production__production_machines__machine_id=machine_id)
+		.order_by('-priority', F('due_at').asc(nulls_last=True), 'id')
+		.first()
+	)
+	if request is None:
+		return None
+	return assign(machine, request, at or timezone.now())
+
+
+def dispatch_idle(owner_id=None, machine_model: str | None = None, at=None) -> list[ProductionMachine]:
+	"""Distribui todas as máquinas livres entre os pedidos em espera (chamar dentro de uma transação)."""
+	requests = _waiting_requests().select_for_update()
+	if owner_id is not None:
+		requests = requests.filter(owner_id=owner_id)
+	if machine_model is not None:
+		requests = requests.filter(machine_model=machine_model)
+	queue = DispatchQueue.load(requests)
+	if not len(queue):
+		return []
+
+	keys = queue.keys()
+	busy = ProductionMachine.objects.filter(status__in=BUSY_STATUSES).values('machine_id')
+	machines = (
+		Machine.objects.filter(owner_id__in={key[0] for key in keys}, model__in={key[1] for key in keys})
+		.exclude(id__in=busy)
+		.order_by('id')
+	)
+	# Pares (produção, máquina) já existentes: a mesma máquina não entra duas vezes na produção.
+	linked = set(
+		ProductionMachine.all_objects.filter(
+			production_id__in={request.production_id for request in queue.requests()}
+		).values_list('production_id', 'machine_id')
+	)
+
+	at = at or timezone.now()
+	assigned = []
+	for machine in machines:
+		request = queue.pop(machine.owner_id, machine.model, skip=lambda r: (r.production_id, machine.id) in linked)
+		if request is None:
+			continue
+		assigned.append(assign(machine, request, at))
+		linked.add((request.production_id, machine.id))
+	return assigned
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
+
 from .models import (
     Machine,
+    MachineRequest,
     Production,
     ProductionMachine,
     ProductionMachineStatus,
@@ -117,4 +122,111 @@ class ProductionForm(forms.ModelForm):
                     for machine in machines
                 ]
             )
-        return production
\ No newline at end of file
+        return production
+
+
+class ProductionFilterForm(forms.Form):
+    """Filtros (GET) da lista de produções e do histograma por dia."""
+
+    DATE_FIELDS = (
+        ('created_at', 'Criação'),
+        ('started_at', 'Início'),
+        ('finished_at', 'Finalização'),
+    )
+
+    status = forms.ChoiceField(
+        choices=[('', 'Todos')] + list(ProductionStatus.choices),
+        required=False,
+        label='Status',
+    )
+    date_field = forms.ChoiceField(choices=DATE_FIELDS, required=False, initial='created_at', label='Data de')
+    date_from = forms.DateField(required=False, label='De', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='Até', widget=forms.DateInput(attrs={'type': 'date'}))
+    machine = forms.ModelChoiceField(queryset=Machine.objects.none(), required=False, label='Máquina', empty_label='Todas')
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            self.fields['machine'].queryset = Machine.objects.filter(owner=user).order_by('model', 'serialnumber')
+        self.fields['machine'].label_from_instance = lambda m: f'{m.model} / {m.serialnumber}'
+
+    def clean(self):
+        cleaned = super().clean()
+        date_from, date_to = cleaned.get('date_from'), cleaned.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('A data inicial deve ser anterior à final.')
+        return cleaned
+
+    @property
+    def selected_date_field(self) -> str:
+        return (self.is_valid() and self.cleaned_data.get('date_field')) or 'created_at'
+
+    def date_range(self):
+        """
+        Faixa [início, fim) em datetimes com fuso, para o filtro cair no índice da coluna
+        (um `__date` envolveria a coluna numa função e ignoraria o índice).
+        """
+        tz = timezone.get_current_timezone()
+        date_from = self.cleaned_data.get('date_from')
+        date_to = self.cleaned_data.get('date_to')
+        start = datetime.combine(date_from, time.min, tzinfo=tz) if date_from else None
+        end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz) if date_to else None
+        return start, end
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+
+        status = self.cleaned_data.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+
+        start, end = self.date_range()
+        if start:
+            queryset = queryset.filter(**{f'{self.selected_date_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{self.selected_date_field}__lt': end})
+
+        machine = self.cleaned_data.get('machine')
+        if machine:
+            queryset = queryset.filter(
+                id__in=ProductionMachine.objects.filter(machine=machine).values('production_id'),
+            )
+        return queryset
+
+
+class MachineRequestForm(forms.ModelForm):
+    """Pede uma máquina de um modelo para a produção; entra na fila do despachante."""
+
+    class Meta:
+        model = MachineRequest
+        fields = ('machine_model', 'priority', 'due_at')
+        labels = {'machine_model': 'Modelo', 'priority': 'Prioridade', 'due_at': 'Prazo'}
+        widgets = {'due_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M')}
+
+    def __init__(self, *args, production=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.production = production
+        models = []
+        if production is not None:
+            models = (
+                Machine.objects.filter(owner_id=production.user_id)
+                .order_by('model')
+                .values_list('model', flat=True)
+                .distinct()
+            )
+        self.fields['machine_model'] = forms.ChoiceField(choices=[(m, m) for m in models], label='Modelo')
+
+    def clean(self):
+        cleaned = super().clean()
+        if self.production is None or self.production.status not in {ProductionStatus.STANDBY, ProductionStatus.ONGOING}:
+            raise forms.ValidationError('Só produções abertas podem pedir máquinas.')
+        return cleaned
+
+    def save(self, commit=True):
+        request: MachineRequest = super().save(commit=False)
+        request.production = self.production
+        request.owner_id = self.production.user_id
+        if commit:
+            request.save()
+        return request
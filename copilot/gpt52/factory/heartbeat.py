@@ -0,0 +1,126 @@
+"""
+Heartbeat das máquinas com escrita coalescida.
+
+Cada máquina manda seu serial a cada poucos segundos (`POST /machines/heartbeat/`). Salvar
+a linha de Machine a cada ping transformaria o sinal mais leve do sistema na maior carga
+de escrita; em vez disso, o último horário de cada máquina fica num mapa em memória e vai
+para o banco no máximo uma vez a cada HEARTBEAT_FLUSH_SECONDS, num único UPDATE por banco
+para todas as máquinas que pingaram no período. Um timer por processo grava o que ficou no
+mapa mesmo que não chegue outro ping.
+
+`last_seen` pode atrasar até HEARTBEAT_FLUSH_SECONDS em relação ao último ping; por isso o
+detector de máquinas sem sinal só considera parada a máquina cujo last_seen passou de
+HEARTBEAT_STALE_SECONDS + HEARTBEAT_FLUSH_SECONDS. Pings perdidos numa queda do processo
+não precisam de journal: o próximo ping já repõe o valor.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Machine, ProductionMachine, ProductionMachineStatus
+
+
+class HeartbeatBuffer:
+	def __init__(self, flush_seconds: float):
+		self.flush_seconds = flush_seconds
+		self._lock = threading.Lock()
+		self._seen: dict[tuple, object] = {}  # (alias, machine_id) -> último ping
+		self._machine_ids: dict[tuple, int] = {}  # (alias, owner_id, serial) -> machine_id
+		self._last_flush = timezone.now()
+		self._started_pid = None
+
+	def _start(self):
+		"""Timer de flush do processo (de novo após um fork)."""
+		if self._started_pid == os.getpid():
+			return
+		self._started_pid = os.getpid()
+		self._seen = {}
+		threading.Thread(target=self._timer, name='heartbeat-flush', daemon=True).start()
+
+	def _timer(self):
+		pid = os.getpid()
+		while self._started_pid == pid:
+			time.sleep(self.flush_seconds)
+			try:
+				self.flush()
+			except Exception:  # banco indisponível: o próximo ping de cada máquina repõe o valor
+				pass
+
+	def machine_id(self, alias: str, owner_id: int, serialnumber: str) -> int | None:
+		"""Id da máquina do dono com esse serial; a busca no banco é feita uma vez por processo."""
+		key = (alias, owner_id, serialnumber)
+		machine_id = self._machine_ids.get(key)
+		if machine_id is None:
+			machine_id = (
+				Machine.objects.using(alias)
+				.filter(owner_id=owner_id, serialnumber=serialnumber)
+				.values_list('id', flat=True)
+				.first()
+			)
+			if machine_id is not None:
+				self._machine_ids[key] = machine_id
+		return machine_id
+
+	def record(self, alias: str, machine_id: int, at=None) -> int:
+		"""Registra o ping; se a janela venceu, grava o lote. Devolve quantas máquinas foram gravadas."""
+		at = at or timezone.now()
+		with self._lock:
+			self._start()
+			self._seen[(alias, machine_id)] = at
+			due = at - self._last_flush >= timedelta(seconds=self.flush_seconds)
+		return self.flush() if due else 0
+
+	def last_seen(self, alias: str, machine_id: int):
+		return self._seen.get((alias, machine_id))
+
+	def flush(self) -> int:
+		with self._lock:
+			seen, self._seen = self._seen, {}
+			self._last_flush = timezone.now()
+		per_db: dict[str, dict[int, object]] = {}
+		for (alias, machine_id), at in seen.items():
+			per_db.setdefault(alias, {})[machine_id] = at
+
+		for alias, values in per_db.items():
+			# Nunca volta no tempo: outro processo pode ter gravado um ping mais novo.
+			Machine.all_objects.using(alias).filter(pk__in=list(values)).update(
+				last_seen=Case(
+					*[
+						When(pk=pk, then=Greatest(Coalesce(F('last_seen'), Value(at)), Value(at)))
+						for pk, at in values.items()
+					]
+				)
+			)
+		return len(seen)
+
+
+def stale_executions(alias: str, now=None, stale_seconds: int | None = None):
+	"""
+	Execuções ONGOING do banco `alias` cuja máquina não manda sinal há mais de `stale_seconds`.
+
+	A janela de flush entra na conta: um ping ainda no mapa de um worker não está no banco.
+	"""
+	now = now or timezone.now()
+	stale_seconds = stale_seconds or settings.HEARTBEAT_STALE_SECONDS
+	cutoff = now - timedelta(seconds=stale_seconds + settings.HEARTBEAT_FLUSH_SECONDS)
+	return (
+		ProductionMachine.objects.using(alias)
+		.filter(status=ProductionMachineStatus.ONGOING)
+		.filter(Q(machine__last_seen__lt=cutoff) | Q(machine__last_seen__isnull=True, started_at__lt=cutoff))
+		.select_related('machine', 'production')
+		.order_by('machine__last_seen', 'id')
+	)
+
+
+buffer = HeartbeatBuffer(flush_seconds=settings.HEARTBEAT_FLUSH_SECONDS)
+atexit.register(buffer.flush)
@@ -0,0 +1,209 @@
+"""
+Ingestão de contagem de unidades produzidas em alta frequência.
+
+As máquinas reportam incrementos (`POST /productions/<id>/produced/`). Gravar uma linha (ou
+um UPDATE) por evento afogaria o SQLite; em vez disso:
+
+1. cada incremento aceito é anexado ao journal do processo (`<pid>.log`, JSON por linha,
+   com fsync) antes da resposta: se o processo cair, nada do que foi confirmado se perde;
+2. o buffer em memória soma os incrementos por produção;
+3. a cada INGEST_FLUSH_EVENTS eventos ou INGEST_FLUSH_SECONDS segundos, o journal é
+   renomeado para `<lote>.flushing` e aplicado: um único
+   UPDATE ... SET produced = produced + CASE id WHEN ... END por banco, na mesma transação
+   do registro `CounterFlush` do lote. Aplicar o mesmo arquivo de novo não soma duas vezes.
+
+Arquivos deixados por processos mortos são aplicados por `recover()` (no primeiro uso do
+buffer e pelo comando `flush_produced`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from core.common.sharding import tenant_context
+
+from .models import CounterFlush, Production
+
+LOG_SUFFIX = '.log'
+FLUSHING_SUFFIX = '.flushing'
+
+
+def _pid_alive(pid: int) -> bool:
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		return True
+	return True
+
+
+def _file_pid(path: Path) -> int | None:
+	try:
+		return int(path.name.split('-', 1)[0].split('.', 1)[0])
+	except ValueError:
+		return None
+
+
+def apply_journal(path: Path) -> int:
+	"""Aplica um arquivo de journal (idempotente por lote) e o remove. Devolve as unidades aplicadas."""
+	batch_id = path.name[: -len(FLUSHING_SUFFIX)]
+	per_db = defaultdict(lambda: defaultdict(int))
+	events = defaultdict(int)
+	with path.open(encoding='utf-8') as journal:
+		for line in journal:
+			try:
+				record = json.loads(line)
+			except json.JSONDecodeError:
+				continue  # última linha cortada por uma queda no meio da escrita: nunca foi confirmada
+			per_db[record['db']][record['p']] += record['n']
+			events[record['db']] += 1
+
+	applied = 0
+	now = timezone.now()
+	for alias, totals in per_db.items():
+		with tenant_context(alias), transaction.atomic(using=alias):
+			_, created = CounterFlush.all_objects.using(alias).get_or_create(
+				batch_id=batch_id,
+				defaults={'events': events[alias], 'units': sum(totals.values())},
+			)
+			if not created:
+				continue  # lote já aplicado antes da queda
+			Production.all_objects.using(alias).filter(pk__in=list(totals)).update(
+				produced=F('produced') + Case(*[When(pk=pk, then=Value(units)) for pk, units in totals.items()], default=Value(0)),
+				updated_at=now,
+			)
+			applied += sum(totals.values())
+	path.unlink()
+	return applied
+
+
+class CounterBuffer:
+	def __init__(self, journal_dir, flush_events: int, flush_seconds: float, fsync: bool = True):
+		self.journal_dir = Path(journal_dir)
+		self.flush_events = flush_events
+		self.flush_seconds = flush_seconds
+		self.fsync = fsync
+
+		self._lock = threading.Lock()
+		self._flush_lock = threading.Lock()
+		self._pending: dict[tuple, int] = defaultdict(int)
+		# Lotes renomeados para .flushing e ainda não confirmados no banco: path -> pendentes.
+		self._inflight: dict[Path, dict[tuple, int]] = {}
+		self._events = 0
+		self._journal = None
+		self._sequence = 0
+		self._started_pid = None
+
+	def _start(self):
+		"""Abre o journal do processo e o timer de flush (de novo após um fork)."""
+		if self._started_pid == os.getpid():
+			return
+		self._started_pid = os.getpid()
+		self._pending = defaultdict(int)
+		self._inflight = {}
+		self._events = 0
+		self.journal_dir.mkdir(parents=True, exist_ok=True)
+		self._journal = (self.journal_dir / f'{os.getpid()}{LOG_SUFFIX}').open('a', encoding='utf-8')
+
+		threading.Thread(target=self._timer, name='produced-flush', daemon=True).start()
+		atexit.register(self.flush)
+		threading.Thread(target=recover, args=(self.journal_dir,), daemon=True).start()
+
+	def _timer(self):
+		pid = os.getpid()
+		while self._started_pid == pid:
+			time.sleep(self.flush_seconds)
+			try:
+				self.flush()
+			except Exception:  # banco indisponível: o arquivo .flushing fica para a próxima tentativa
+				pass
+
+	def add(self, alias: str, production_id: int, units: int):
+		with self._lock:
+			self._start()
+			self._journal.write(json.dumps({'db': alias, 'p': production_id, 'n': units}) + '\n')
+			self._journal.flush()
+			if self.fsync:
+				os.fsync(self._journal.fileno())
+			self._pending[(alias, production_id)] += units
+			self._events += 1
+			full = self._events >= self.flush_events
+		if full:
+			self.flush()
+
+	def pending(self, alias: str, production_id: int) -> int:
+		"""Unidades aceitas por este processo e ainda não gravadas no banco."""
+		key = (alias, production_id)
+		with self._lock:
+			return self._pending.get(key, 0) + sum(batch.get(key, 0) for batch in self._inflight.values())
+
+	def _rotate(self) -> Path | None:
+		with self._lock:
+			if self._started_pid != os.getpid() or not self._events:
+				return None
+			self._journal.close()
+			self._sequence += 1
+			batch_id = f'{os.getpid()}-{self._sequence}-{uuid.uuid4().hex[:8]}'
+			path = self.journal_dir / f'{batch_id}{FLUSHING_SUFFIX}'
+			os.replace(self.journal_dir / f'{os.getpid()}{LOG_SUFFIX}', path)
+			self._journal = (self.journal_dir / f'{os.getpid()}{LOG_SUFFIX}').open('a', encoding='utf-8')
+			# Continua contando em pending() até o lote ser confirmado: um flush que falha
+			# (banco travado) não pode fazer as unidades sumirem da tela.
+			self._inflight[path] = self._pending
+			self._pending = defaultdict(int)
+			self._events = 0
+			return path
+
+	def flush(self) -> int:
+		"""Grava no banco o que está no journal deste processo (incluindo lotes que falharam antes)."""
+		with self._flush_lock:
+			self._rotate()
+			applied = 0
+			for path in sorted(self.journal_dir.glob(f'{os.getpid()}-*{FLUSHING_SUFFIX}')):
+				applied += apply_journal(path)
+				with self._lock:
+					self._inflight.pop(path, None)
+			return applied
+
+
+def recover(journal_dir) -> int:
+	"""Aplica os journals de processos que não existem mais (queda, restart, deploy)."""
+	journal_dir = Path(journal_dir)
+	if not journal_dir.is_dir():
+		return 0
+	applied = 0
+	for path in sorted(journal_dir.iterdir()):
+		pid = _file_pid(path)
+		if pid is None or pid == os.getpid() or _pid_alive(pid):
+			continue
+		try:
+			if path.suffix == LOG_SUFFIX:
+				flushing = path.with_name(f'{pid}-orphan-{uuid.uuid4().hex[:8]}{FLUSHING_SUFFIX}')
+				os.replace(path, flushing)
+				path = flushing
+			if path.suffix == FLUSHING_SUFFIX:
+				applied += apply_journal(path)
+		except FileNotFoundError:
+			continue  # outro processo recuperou o mesmo arquivo primeiro (o lote é idempotente)
+	return applied
+
+
+buffer = CounterBuffer(
+	settings.INGEST_JOURNAL_DIR,
+	flush_events=settings.INGEST_FLUSH_EVENTS,
+	flush_seconds=settings.INGEST_FLUSH_SECONDS,
+	fsync=settings.INGEST_FSYNC,
+)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+from core.common.sharding import shard_aliases
+from factory.models import (
+	MachineRollup,
+	Production,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+	RollupGranularity,
+	UserRollup,
+)
+
+
+TRUNC_KIND = {RollupGranularity.HOUR: 'hour', RollupGranularity.DAY: 'day'}
+
+
+def _grouped(queryset, owner: str, time_field, kind: str, **aggregates):
+	"""GROUP BY (dono, bucket) sobre `time_field` truncado; uma query por série."""
+	return (
+		queryset.annotate(bucket=Trunc(time_field, kind))
+		.values(owner, 'bucket')
+		.annotate(**aggregates)
+		.order_by()
+	)
+
+
+class Command(BaseCommand):
+	help = 'Reconstrói as tabelas de rollup (usuário/máquina, hora/dia) a partir das produções e execuções.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000)
+
+	def handle(self, *args, **options):
+		# Com shards, cada shard tem suas próprias produções e rollups.
+		for alias in shard_aliases() or [DEFAULT_DB_ALIAS]:
+			users, machines = self._rebuild(alias, options['batch_size'])
+			self.stdout.write(self.style.SUCCESS(
+				f'Rollups reconstruídos em {alias}: {users} linhas de usuário, {machines} de máquina.'
+			))
+
+	def _rebuild(self, alias: str, batch_size: int):
+		user_rows = defaultdict(dict)
+		machine_rows = defaultdict(dict)
+
+		productions = Production.all_objects.using(alias)
+		pms = ProductionMachine.all_objects.using(alias)
+		pm_end = Coalesce('finished_at', 'canceled_at')
+
+		for granularity, kind in TRUNC_KIND.items():
+			series = [
+				(user_rows, 'user_id', _grouped(productions.filter(started_at__isnull=False), 'user_id', 'started_at', kind, productions_started=Count('id'))),
+				(user_rows, 'user_id', _grouped(
+					productions.filter(status=ProductionStatus.FINISHED, finished_at__isnull=False), 'user_id', 'finished_at', kind,
+					productions_finished=Count('id'), quantity_produced=Sum('quantity'),
+				)),
+				(user_rows, 'user_id', _grouped(productions.filter(status=ProductionStatus.CANCELED, canceled_at__isnull=False), 'user_id', 'canceled_at', kind, productions_canceled=Count('id'))),
+				(user_rows, 'production__user_id', _grouped(pms.filter(working_time__gt=0), 'production__user_id', pm_end, kind, working_minutes=Sum('working_time'))),
+				(machine_rows, 'machine_id', _grouped(pms.filter(started_at__isnull=False), 'machine_id', 'started_at', kind, executions_started=Count('id'))),
+				(machine_rows, 'machine_id', _grouped(pms.filter(status=ProductionMachineStatus.FINISHED, finished_at__isnull=False), 'machine_id', 'finished_at', kind, executions_finished=Count('id'))),
+				(machine_rows, 'machine_id', _grouped(pms.filter(status=ProductionMachineStatus.CANCELED, canceled_at__isnull=False), 'machine_id', 'canceled_at', kind, executions_canceled=Count('id'))),
+				(machine_rows, 'machine_id', _grouped(pms.filter(working_time__gt=0), 'machine_id', pm_end, kind, working_minutes=Sum('working_time'))),
+			]
+			for rows, owner, queryset in series:
+				for row in queryset:
+					key = (row.pop(owner), granularity, row.pop('bucket'))
+					rows[key].update(row)
+
+		with transaction.atomic(using=alias):
+			UserRollup.all_objects.using(alias).delete()
+			MachineRollup.all_objects.using(alias).delete()
+			UserRollup.all_objects.using(alias).bulk_create(
+				[UserRollup(user_id=k[0], granularity=k[1], bucket=k[2], **v) for k, v in user_rows.items()],
+				batch_size=batch_size,
+			)
+			MachineRollup.all_objects.using(alias).bulk_create(
+				[MachineRollup(machine_id=k[0], granularity=k[1], bucket=k[2], **v) for k, v in machine_rows.items()],
+				batch_size=batch_size,
+			)
+
+		return len(user_rows), len(machine_rows)
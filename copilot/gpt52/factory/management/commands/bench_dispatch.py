@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from factory.dispatch import DispatchQueue, queue_key
+from factory.models import MachineRequest
+
+
+class Command(BaseCommand):
+	help = 'Mede a fila de despacho (heap) com muitos pedidos, comparando com a busca linear pelo mais urgente.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--requests', type=int, default=100_000)
+		parser.add_argument('--models', type=int, default=20)
+		parser.add_argument('--pops', type=int, default=2_000)
+		parser.add_argument('--seed', type=int, default=0)
+
+	def handle(self, *args, **options):
+		rng = random.Random(options['seed'])
+		now = timezone.now()
+		models = [f'M{i}' for i in range(options['models'])]
+		# Objetos em memória (sem banco), só com os campos usados pela fila.
+		requests = [
+			MachineRequest(
+				id=i,
+				owner_id=1,
+				machine_model=rng.choice(models),
+				priority=rng.randint(0, 5),
+				due_at=now + timedelta(hours=rng.randint(1, 500)) if rng.random() < 0.7 else None,
+			)
+			for i in range(1, options['requests'] + 1)
+		]
+		freed = [rng.choice(models) for _ in range(options['pops'])]
+
+		started = time.perf_counter()
+		queue = DispatchQueue.load(requests)
+		load_ms = (time.perf_counter() - started) * 1000
+
+		started = time.perf_counter()
+		heap_picks = [queue.pop(1, model) for model in freed]
+		heap_ms = (time.perf_counter() - started) * 1000
+
+		# Referência: a cada máquina liberada, procura o mais urgente varrendo a lista.
+		waiting = {model: [r for r in requests if r.machine_model == model] for model in models}
+		started = time.perf_counter()
+		linear_picks = []
+		for model in freed:
+			candidates = waiting[model]
+			if not candidates:
+				linear_picks.append(None)
+				continue
+			best = min(range(len(candidates)), key=lambda index: queue_key(candidates[index]))
+			linear_picks.append(candidates.pop(best))
+		linear_ms = (time.perf_counter() - started) * 1000
+
+		assert [r.id if r else None for r in heap_picks] == [r.id if r else None for r in linear_picks]
+
+		pops = options['pops']
+		self.stdout.write(f'{len(requests)} pedidos em {len(models)} modelos, {pops} máquinas liberadas')
+		self.stdout.write(f'  heapify (carga da fila):  {load_ms:9.1f} ms')
+		self.stdout.write(f'  heap pop:                 {heap_ms:9.1f} ms ({heap_ms * 1000 / pops:7.1f} µs por máquina)')
+		self.stdout.write(f'  busca linear:             {linear_ms:9.1f} ms ({linear_ms * 1000 / pops:7.1f} µs por máquina)')
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import Engine, RequestContext
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+
+from factory.models import (
+	Machine,
+	Production,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+)
+
+
+TEMPLATES_TO_BENCH = ('factory/dashboard.html', 'factory/production_detail.html')
+
+BASE_LOADERS = [
+	'django.template.loaders.filesystem.Loader',
+	'django.template.loaders.app_directories.Loader',
+]
+
+
+def _build_engine(cached: bool) -> Engine:
+	config = settings.TEMPLATES[0]
+	options = {k: v for k, v in config.get('OPTIONS', {}).items() if k != 'loaders'}
+	options['loaders'] = [('django.template.loaders.cached.Loader', BASE_LOADERS)] if cached else BASE_LOADERS
+	backend = DjangoTemplates(
+		{
+			'NAME': 'bench-cached' if cached else 'bench-uncached',
+			'DIRS': config.get('DIRS', []),
+			'APP_DIRS': False,
+			'OPTIONS': options,
+		}
+	)
+	return backend.engine
+
+
+def _sample_context(rows: int) -> dict:
+	"""Objetos em memória (sem banco) com o formato que as views passam aos templates."""
+	now = timezone.now()
+	productions = [
+		Production(id=i, description=f'Produção {i}', quantity=i * 10, status=ProductionStatus.FINISHED)
+		for i in range(1, rows + 1)
+	]
+	production = Production(id=1, description='Produção 1', quantity=100, status=ProductionStatus.ONGOING, started_at=now)
+	pms = []
+	for i in range(1, 11):
+		machine = Machine(id=i, model=f'M{i}', serialnumber=f'SN-{i:04d}')
+		pms.append(
+			ProductionMachine(id=i, production=production, machine=machine, status=ProductionMachineStatus.ONGOING, started_at=now)
+		)
+	return {
+		'productions': productions,
+		'ongoing_count': 1,
+		'used_machines': 10,
+		'available_machines': 0,
+		'production': production,
+		'pms': pms,
+		'can_finish': False,
+	}
+
+
+class Command(BaseCommand):
+	help = 'Mede o tempo de renderização de dashboard.html e production_detail.html sem e com cached loader.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--iterations', type=int, default=500)
+		parser.add_argument('--rows', type=int, default=50, help='Linhas na tabela do dashboard')
+
+	def handle(self, *args, **options):
+		iterations = options['iterations']
+		request = RequestFactory().get('/')
+		request.user = AnonymousUser()
+		context = _sample_context(options['rows'])
+
+		engines = {'sem cache (re-parse por request)': _build_engine(cached=False)}
+		cached_engine = _build_engine(cached=True)
+		for name in TEMPLATES_TO_BENCH:
+			cached_engine.get_template(name)  # pré-compilação, como no boot do worker
+		engines['cached loader pré-compilado'] = cached_engine
+
+		for template_name in TEMPLATES_TO_BENCH:
+			self.stdout.write(template_name)
+			for label, engine in engines.items():
+				start = time.perf_counter()
+				for _ in range(iterations):
+					template = engine.get_template(template_name)
+					template.render(RequestContext(request, context))
+				elapsed_ms = (time.perf_counter() - start) * 1000 / iterations
+				self.stdout.write(f'  {label:<35} {elapsed_ms:8.3f} ms/render')
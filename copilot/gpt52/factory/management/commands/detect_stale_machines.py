@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.common.sharding import shard_aliases, tenant_context
+from factory import heartbeat
+
+
+class Command(BaseCommand):
+	help = 'Lista execuções ONGOING cuja máquina parou de mandar heartbeat.'
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			'--seconds',
+			type=int,
+			default=settings.HEARTBEAT_STALE_SECONDS,
+			help='Tempo sem sinal para considerar a máquina parada.',
+		)
+
+	def handle(self, *args, **options):
+		stale = []
+		# Com shards, cada shard tem suas máquinas e execuções.
+		for alias in shard_aliases() or [DEFAULT_DB_ALIAS]:
+			with tenant_context(alias):
+				stale += heartbeat.stale_executions(alias, stale_seconds=options['seconds'])
+		for pm in stale:
+			last_seen = pm.machine.last_seen.isoformat() if pm.machine.last_seen else 'nunca'
+			self.stdout.write(
+				f'Produção #{pm.production_id} / execução #{pm.id}: '
+				f'máquina {pm.machine.serialnumber} sem sinal (último: {last_seen})'
+			)
+		if stale:
+			self.stdout.write(self.style.WARNING(f'{len(stale)} execução(ões) com máquina sem sinal.'))
+		else:
+			self.stdout.write(self.style.SUCCESS('Nenhuma execução com máquina sem sinal.'))
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.common.sharding import shard_aliases, tenant_context
+from factory.dispatch import dispatch_idle
+
+
+class Command(BaseCommand):
+	help = 'Atribui as máquinas livres aos pedidos em espera (varredura completa da fila).'
+
+	def handle(self, *args, **options):
+		# Com shards, cada shard tem sua própria fila e suas máquinas.
+		for alias in shard_aliases() or [DEFAULT_DB_ALIAS]:
+			with tenant_context(alias), transaction.atomic(using=alias):
+				assigned = dispatch_idle()
+			self.stdout.write(self.style.SUCCESS(f'{alias}: {len(assigned)} máquinas atribuídas.'))
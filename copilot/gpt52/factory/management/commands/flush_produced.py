@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from factory.ingest import recover
+
+
+class Command(BaseCommand):
+	help = 'Aplica no banco os journals de contagem deixados por processos que não existem mais.'
+
+	def handle(self, *args, **options):
+		applied = recover(settings.INGEST_JOURNAL_DIR)
+		self.stdout.write(self.style.SUCCESS(f'{applied} unidades recuperadas de {settings.INGEST_JOURNAL_DIR}.'))
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core.common.sharding import shard_aliases
+from factory.devices import issue_token
+from factory.models import Machine
+
+
+class Command(BaseCommand):
+	help = (
+		'Gera o token de dispositivo de uma máquina (heartbeat, contagem de unidades, sync). '
+		'O token só é mostrado agora; gerar outro invalida o anterior.'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('serialnumber')
+		parser.add_argument('--shard', help='Alias do shard, se o serial existir em mais de um.')
+
+	def handle(self, *args, **options):
+		aliases = [options['shard']] if options['shard'] else shard_aliases() or [DEFAULT_DB_ALIAS]
+		machines = [
+			machine
+			for alias in aliases
+			for machine in Machine.objects.using(alias).filter(serialnumber=options['serialnumber'])
+		]
+		if not machines:
+			raise CommandError(f'Máquina não encontrada: {options["serialnumber"]}')
+		if len(machines) > 1:
+			found = ', '.join(machine._state.db for machine in machines)
+			raise CommandError(f'Serial em mais de um shard ({found}); informe --shard.')
+
+		machine = machines[0]
+		self.stdout.write(f'{machine} (#{machine.pk}, {machine._state.db}):')
+		self.stdout.write(issue_token(machine))
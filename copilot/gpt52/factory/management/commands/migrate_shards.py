@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.common.sharding import SHARD_ID_SPAN, SHARD_PREFIX, shard_aliases
+
+
+def reserve_id_range(alias: str) -> None:
+	"""
+	Cada shard gera ids a partir de índice * SHARD_ID_SPAN: ids nunca colidem entre shards,
+	e `move_tenant` pode copiar as linhas mantendo os ids.
+	"""
+	floor = int(alias[len(SHARD_PREFIX):]) * SHARD_ID_SPAN
+	if not floor:
+		return
+	with connections[alias].cursor() as cursor:
+		for model in apps.get_app_config('factory').get_models():
+			table = model._meta.db_table
+			cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+			row = cursor.fetchone()
+			if row is None:
+				cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, floor])
+			elif row[0] < floor:
+				cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [floor, table])
+
+
+class Command(BaseCommand):
+	help = 'Aplica as migrations em todos os shards de tenant (TENANT_SHARDS).'
+
+	def handle(self, *args, **options):
+		aliases = shard_aliases()
+		if not aliases:
+			raise CommandError('Sharding desligado: defina TENANT_SHARDS.')
+
+		for alias in aliases:
+			self.stdout.write(f'== {alias}')
+			call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+			reserve_id_range(alias)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from accounts.models import User
+from core.common.sharding import shard_alias, shard_for_user, sharding_enabled
+from factory.ingest import recover
+from factory.models import (
+	CounterFlush,
+	Machine,
+	MachineRequest,
+	MachineRollup,
+	Production,
+	ProductionMachine,
+	SyncEvent,
+	UserRollup,
+)
+
+
+def _copy(model, rows, target: str):
+	"""
+	Recria `rows` no shard de destino com os mesmos ids e timestamps: URLs, referências
+	externas, o cursor do feed de mudanças e as chaves de sincronização continuam valendo.
+	"""
+	taken = list(model.all_objects.using(target).filter(pk__in=[row.pk for row in rows]).values_list('pk', flat=True)[:5])
+	if taken:
+		raise CommandError(f'{model._meta.label}: ids já usados em {target} ({", ".join(map(str, taken))}...).')
+	for row in rows:
+		# raw=True (como o loaddata): grava created_at/updated_at como estão, sem auto_now.
+		row.save_base(using=target, raw=True, force_insert=True)
+
+
+class Command(BaseCommand):
+	help = (
+		'Move todos os dados de um tenant para outro shard, mantendo os ids. '
+		'Rode com o tenant sem uso (ex.: fora do expediente).'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('user_id', type=int)
+		parser.add_argument('shard', type=int, help='Índice do shard de destino (0..TENANT_SHARDS-1).')
+
+	def handle(self, *args, **options):
+		if not sharding_enabled():
+			raise CommandError('Sharding desligado: defina TENANT_SHARDS.')
+
+		try:
+			user = User.objects.using(DEFAULT_DB_ALIAS).get(pk=options['user_id'])
+			target = shard_alias(options['shard'])
+		except (User.DoesNotExist, ValueError) as exc:
+			raise CommandError(str(exc))
+
+		source = shard_for_user(user)
+		if source == target:
+			self.stdout.write(f'{user} já está em {target}.')
+			return
+
+		# 0) Contagens ainda no journal apontam para o shard de origem: aplica antes de copiar.
+		recover(settings.INGEST_JOURNAL_DIR)
+
+		# 1) Copia para o destino (usuário espelhado primeiro, por causa das FKs).
+		user.shard = options['shard']
+		with transaction.atomic(using=target):
+			values = {f.attname: getattr(user, f.attname) for f in User._meta.concrete_fields if not f.primary_key}
+			User._base_manager.using(target).update_or_create(pk=user.pk, defaults=values)
+
+			machines = list(Machine.all_objects.using(source).filter(owner_id=user.pk).order_by('id'))
+			productions = list(Production.all_objects.using(source).filter(user_id=user.pk).order_by('id'))
+			pms = list(ProductionMachine.all_objects.using(source).filter(production__user_id=user.pk).order_by('id'))
+			machine_requests = list(MachineRequest.all_objects.using(source).filter(owner_id=user.pk).order_by('id'))
+			sync_events = list(SyncEvent.all_objects.using(source).filter(user_id=user.pk).order_by('id'))
+			machine_rollups = list(MachineRollup.all_objects.using(source).filter(machine__owner_id=user.pk))
+			user_rollups = list(UserRollup.all_objects.using(source).filter(user_id=user.pk))
+
+			copied = (
+				(Machine, machines),
+				(Production, productions),
+				(ProductionMachine, pms),
+				(MachineRequest, machine_requests),
+				(SyncEvent, sync_events),
+				(MachineRollup, machine_rollups),
+				(UserRollup, user_rollups),
+			)
+			for model, rows in copied:
+				_copy(model, rows, target)
+
+			# Lotes de contagem já aplicados: o registro vai junto, para um reenvio não somar de novo.
+			flushes = list(CounterFlush.all_objects.using(source).all())
+			for flush in flushes:
+				flush.pk = None
+				flush._state.adding = True
+				flush._state.db = None
+			CounterFlush.all_objects.using(target).bulk_create(flushes, ignore_conflicts=True)
+
+			# Ids explícitos não avançam as sequences (PostgreSQL); no SQLite a lista vem vazia.
+			with connections[target].cursor() as cursor:
+				for sql in connections[target].ops.sequence_reset_sql(no_style(), [model for model, _ in copied]):
+					cursor.execute(sql)
+
+		# 2) Vira o diretório: a partir daqui os requests do tenant vão para o destino.
+		user.save(using=DEFAULT_DB_ALIAS, update_fields=['shard', 'updated_at'])
+
+		# 3) Limpa a origem (delete real; filhos antes dos pais por causa dos PROTECT).
+		# O espelho do usuário fica: não é referenciado por nada e volta a ser atualizado se o
+		# tenant retornar a este shard. O registro de lotes (CounterFlush) é do shard e fica.
+		with transaction.atomic(using=source):
+			MachineRequest.all_objects.using(source).filter(owner_id=user.pk).delete()
+			SyncEvent.all_objects.using(source).filter(user_id=user.pk).delete()
+			ProductionMachine.all_objects.using(source).filter(production__user_id=user.pk).delete()
+			MachineRollup.all_objects.using(source).filter(machine__owner_id=user.pk).delete()
+			UserRollup.all_objects.using(source).filter(user_id=user.pk).delete()
+			Production.all_objects.using(source).filter(user_id=user.pk).delete()
+			Machine.all_objects.using(source).filter(owner_id=user.pk).delete()
+
+		self.stdout.write(self.style.SUCCESS(
+			f'{user}: {source} -> {target} ({len(machines)} máquinas, {len(productions)} produções, '
+			f'{len(pms)} execuções, {len(machine_requests)} pedidos, {len(sync_events)} eventos de sync).'
+		))
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0002_productionmachine_working_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hora'), ('DAY', 'Dia')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('working_minutes', models.PositiveBigIntegerField(default=0)),
+                ('executions_started', models.PositiveIntegerField(default=0)),
+                ('executions_finished', models.PositiveIntegerField(default=0)),
+                ('executions_canceled', models.PositiveIntegerField(default=0)),
+                ('machine', models.ForeignKey(db_column='machine_id', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='factory.machine')),
+            ],
+            options={
+                'ordering': ('-bucket',),
+                'constraints': [models.UniqueConstraint(fields=('machine', 'granularity', 'bucket'), name='uniq_machine_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hora'), ('DAY', 'Dia')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('working_minutes', models.PositiveBigIntegerField(default=0)),
+                ('productions_started', models.PositiveIntegerField(default=0)),
+                ('productions_finished', models.PositiveIntegerField(default=0)),
+                ('productions_canceled', models.PositiveIntegerField(default=0)),
+                ('quantity_produced', models.PositiveBigIntegerField(default=0)),
+                ('user', models.ForeignKey(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-bucket',),
+                'constraints': [models.UniqueConstraint(fields=('user', 'granularity', 'bucket'), name='uniq_user_rollup_bucket')],
+            },
+        ),
+    ]
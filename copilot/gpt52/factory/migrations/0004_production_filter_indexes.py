@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0003_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='production',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='production_user_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='production',
+            index=models.Index(fields=['user', 'started_at'], name='production_user_started'),
+        ),
+        migrations.AddIndex(
+            model_name='production',
+            index=models.Index(fields=['user', 'finished_at'], name='production_user_finished'),
+        ),
+        migrations.AddIndex(
+            model_name='productionmachine',
+            index=models.Index(fields=['machine', 'started_at'], name='pm_machine_started'),
+        ),
+    ]
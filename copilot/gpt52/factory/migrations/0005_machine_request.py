@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0004_production_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineRequest',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('machine_model', models.CharField(max_length=255)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('due_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('WAITING', 'Aguardando'), ('ASSIGNED', 'Atribuída'), ('CANCELED', 'Cancelada')], default='WAITING', max_length=16)),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('assigned_machine', models.ForeignKey(blank=True, db_column='assigned_machine_id', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='machine_requests', to='factory.machine')),
+                ('owner', models.ForeignKey(db_column='owner_user_id', on_delete=django.db.models.deletion.CASCADE, related_name='machine_requests', to=settings.AUTH_USER_MODEL)),
+                ('production', models.ForeignKey(db_column='production_id', on_delete=django.db.models.deletion.CASCADE, related_name='machine_requests', to='factory.production')),
+            ],
+            options={
+                'ordering': ('-priority', 'due_at', 'id'),
+                'indexes': [models.Index(fields=['owner', 'machine_model', 'status', '-priority', 'due_at', 'id'], name='machine_request_queue')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0005_machine_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterFlush',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('batch_id', models.CharField(max_length=64, unique=True)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='production',
+            name='produced',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
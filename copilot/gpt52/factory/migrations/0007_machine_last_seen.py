@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0006_production_produced'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0007_machine_last_seen'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='machine_owner_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='production',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='production_user_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='productionmachine',
+            index=models.Index(fields=['updated_at', 'id'], name='pm_updated'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0008_change_feed_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('key', models.CharField(max_length=64)),
+                ('kind', models.CharField(max_length=32)),
+                ('target_id', models.BigIntegerField(blank=True, null=True)),
+                ('client_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(choices=[('APPLIED', 'Aplicado'), ('NOOP', 'Já estava assim'), ('CONFLICT', 'Conflito'), ('REJECTED', 'Rejeitado')], max_length=16)),
+                ('status', models.CharField(blank=True, default='', max_length=16)),
+                ('detail', models.CharField(blank=True, default='', max_length=255)),
+                ('user', models.ForeignKey(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, related_name='sync_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-id',),
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='uniq_sync_event_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factory', '0009_sync_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='device_token_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
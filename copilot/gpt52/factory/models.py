@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from django.conf import settings
-from django.db import models, transaction
+from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
 from core.common.models import BaseModel
+from core.common.sharding import instance_atomic
 
 
 class Machine(BaseModel):
@@ -16,9 +18,16 @@ class Machine(BaseModel):
 		related_name='machines',
 		db_column='owner_user_id',
 	)
+	# Último heartbeat gravado (factory/heartbeat.py); atrasa até HEARTBEAT_FLUSH_SECONDS.
+	last_seen = models.DateTimeField(null=True, blank=True)
+	# SHA-256 do segredo do token do dispositivo (factory/devices.py); vazio = sem token.
+	device_token_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
 
 	class Meta:
 		ordering = ('-id',)
+		indexes = [
+			models.Index(fields=['owner', 'updated_at', 'id'], name='machine_owner_updated'),
+		]
 
 	def __str__(self):
 		return f'{self.model} / {self.serialnumber}'
@@ -41,6 +50,8 @@ class Production(BaseModel):
 		db_column='user_id',
 	)
 	status = models.CharField(max_length=16, choices=ProductionStatus.choices, default=ProductionStatus.STANDBY)
+	# Unidades produzidas reportadas pelas máquinas (factory/ingest.py); quantity é a meta.
+	produced = models.PositiveIntegerField(default=0)
 	machines = models.ManyToManyField(Machine, through='ProductionMachine', related_name='productions')
 	started_at = models.DateTimeField(null=True, blank=True)
 	finished_at = models.DateTimeField(null=True, blank=True)
@@ -48,6 +59,14 @@ class Production(BaseModel):
 
 	class Meta:
 		ordering = ('-id',)
+		indexes = [
+			# Lista/histograma filtrados por status e período ("última semana").
+			models.Index(fields=['user', 'status', 'created_at'], name='production_user_status_created'),
+			models.Index(fields=['user', 'started_at'], name='production_user_started'),
+			models.Index(fields=['user', 'finished_at'], name='production_user_finished'),
+			# Feed de mudanças (factory/changes.py).
+			models.Index(fields=['user', 'updated_at', 'id'], name='production_user_updated'),
+		]
 
 	def __str__(self):
 		return f'#{self.id} - {self.description}'
@@ -59,49 +78,84 @@ class Production(BaseModel):
 			status__in=forbidden,
 		).exists()
 
-	@transaction.atomic
-	def cancel(self):
-		now = timezone.now()
+	def _lock(self):
+		"""
+		Trava a linha da produção (SELECT ... FOR UPDATE) e recarrega o estado.
+
+		Deve ser chamado dentro de transaction.atomic. Transições concorrentes da mesma
+		produção passam a ser serializadas; produções diferentes não se bloqueiam.
+		"""
+		locked = Production.objects.select_for_update().get(pk=self.pk)
+		for field in ('status', 'started_at', 'finished_at', 'canceled_at'):
+			setattr(self, field, getattr(locked, field))
+
+	def _close_machine_requests(self):
+		# Produção encerrada não recebe mais máquinas (antes de liberar as dela para a fila).
+		MachineRequest.objects.filter(production=self, status=MachineRequestStatus.WAITING).update(
+			status=MachineRequestStatus.CANCELED,
+			updated_at=timezone.now(),
+		)
+
+	@instance_atomic
+	def cancel(self, cancel_time=None):
+		self._lock()
+		if self.status in {ProductionStatus.FINISHED, ProductionStatus.CANCELED}:
+			raise ValueError('Produção já encerrada')
+
+		now = cancel_time or timezone.now()
 		self.status = ProductionStatus.CANCELED
 		self.canceled_at = now
 		self.save(update_fields=['status', 'canceled_at', 'updated_at'])
+		UserRollup.bump(self.user_id, now, productions_canceled=1)
+		self._close_machine_requests()
 
 		for pm in ProductionMachine.objects.filter(production=self):
 			pm.cancel(cancel_time=now)
 
-	@transaction.atomic
-	def finish(self):
+	@instance_atomic
+	def finish(self, finish_time=None):
+		self._lock()
+		if self.status in {ProductionStatus.FINISHED, ProductionStatus.CANCELED}:
+			raise ValueError('Produção já encerrada')
 		if not self.can_finish():
 			raise ValueError('Não é permitido finalizar enquanto houver máquinas em STANDBY ou ONGOING')
 
-		now = timezone.now()
+		now = finish_time or timezone.now()
 		self.status = ProductionStatus.FINISHED
 		self.finished_at = now
 		self.save(update_fields=['status', 'finished_at', 'updated_at'])
+		UserRollup.bump(self.user_id, now, productions_finished=1, quantity_produced=self.quantity)
+		self._close_machine_requests()
 
 		# Ao finalizar a produção, garante timestamps e working_time para associações ainda abertas.
 		for pm in ProductionMachine.objects.filter(production=self, finished_at__isnull=True, canceled_at__isnull=True):
 			pm.finish(finish_time=now)
 
-	@transaction.atomic
-	def start(self):
+	@instance_atomic
+	def start(self, start_time=None):
+		self._lock()
 		if self.status in {ProductionStatus.FINISHED, ProductionStatus.CANCELED}:
 			raise ValueError('Produção já encerrada')
 
 		if self.status == ProductionStatus.ONGOING:
 			return
 
-		now = timezone.now()
+		now = start_time or timezone.now()
 		self.status = ProductionStatus.ONGOING
 		self.started_at = self.started_at or now
 		self.save(update_fields=['status', 'started_at', 'updated_at'])
+		UserRollup.bump(self.user_id, now, productions_started=1)
 
 		# Inicia todas as máquinas associadas que ainda estão em STANDBY
-		ProductionMachine.objects.filter(
+		to_start = ProductionMachine.objects.filter(
 			production=self,
 			status=ProductionMachineStatus.STANDBY,
 			started_at__isnull=True,
-		).update(status=ProductionMachineStatus.ONGOING, started_at=now)
+		)
+		machine_ids = list(to_start.values_list('machine_id', flat=True))
+		to_start.update(status=ProductionMachineStatus.ONGOING, started_at=now, updated_at=now)
+		for machine_id in machine_ids:
+			MachineRollup.bump(machine_id, now, executions_started=1)
 
 
 class ProductionMachineStatus(models.TextChoices):
@@ -136,6 +190,10 @@ class ProductionMachine(BaseModel):
 		constraints = [
 			models.UniqueConstraint(fields=['production', 'machine'], name='uniq_production_machine'),
 		]
+		indexes = [
+			models.Index(fields=['machine', 'started_at'], name='pm_machine_started'),
+			models.Index(fields=['updated_at', 'id'], name='pm_updated'),
+		]
 
 	def __str__(self):
 		return f'{self.machine} ({self.status})'
@@ -148,7 +206,15 @@ class ProductionMachine(BaseModel):
 			return 0
 		return int(delta_seconds // 60)
 
+	def _lock(self):
+		"""Trava a linha da execução e recarrega o estado (dentro de transaction.atomic)."""
+		locked = ProductionMachine.objects.select_for_update().get(pk=self.pk)
+		for field in ('status', 'started_at', 'finished_at', 'canceled_at', 'working_time'):
+			setattr(self, field, getattr(locked, field))
+
+	@instance_atomic
 	def cancel(self, cancel_time=None):
+		self._lock()
 		if self.status in {ProductionMachineStatus.FINISHED, ProductionMachineStatus.CANCELED}:
 			return
 		now = cancel_time or timezone.now()
@@ -157,8 +223,12 @@ class ProductionMachine(BaseModel):
 		self.canceled_at = now
 		self.working_time = self._compute_working_time_minutes(now)
 		self.save(update_fields=['status', 'canceled_at', 'working_time', 'updated_at'])
+		self._record_end(now, executions_canceled=1)
+		self._release_machine(now)
 
+	@instance_atomic
 	def finish(self, finish_time=None):
+		self._lock()
 		if self.status in {ProductionMachineStatus.FINISHED, ProductionMachineStatus.CANCELED}:
 			return
 		now = finish_time or timezone.now()
@@ -166,5 +236,235 @@ class ProductionMachine(BaseModel):
 		self.finished_at = now
 		self.working_time = self._compute_working_time_minutes(now)
 		self.save(update_fields=['status', 'finished_at', 'working_time', 'updated_at'])
+		self._record_end(now, executions_finished=1)
+		self._release_machine(now)
+
+	@instance_atomic
+	def inherit_production_start(self):
+		"""
+		Execução que nunca iniciou herda o início da produção antes de ser encerrada, e entra
+		em executions_started no rollup desse horário (como o backfill_rollups a conta).
+		"""
+		self._lock()
+		if self.status in {ProductionMachineStatus.FINISHED, ProductionMachineStatus.CANCELED}:
+			return
+		if self.started_at is not None or self.production.started_at is None:
+			return
+		self.started_at = self.production.started_at
+		self.save(update_fields=['started_at', 'updated_at'])
+		MachineRollup.bump(self.machine_id, self.started_at, executions_started=1)
+
+	def _release_machine(self, at):
+		"""Máquina liberada: o despachante tenta atribuí-la ao próximo pedido da fila, na mesma transação."""
+		from .dispatch import dispatch_machine
+
+		dispatch_machine(self.machine_id, at)
+
+	def _record_end(self, at, **deltas):
+		MachineRollup.bump(self.machine_id, at, working_minutes=self.working_time, **deltas)
+		if self.working_time:
+			user_id = Production.all_objects.filter(pk=self.production_id).values_list('user_id', flat=True).get()
+			UserRollup.bump(user_id, at, working_minutes=self.working_time)
+
+
+class MachineRequestStatus(models.TextChoices):
+	WAITING = 'WAITING', 'Aguardando'
+	ASSIGNED = 'ASSIGNED', 'Atribuída'
+	CANCELED = 'CANCELED', 'Cancelada'
+
+
+class MachineRequest(BaseModel):
+	"""
+	Pedido de uma máquina de determinado modelo para uma produção aberta.
+
+	Fica na fila do dono (owner + machine_model) até o despachante (factory/dispatch.py)
+	atribuir uma máquina liberada: maior prioridade primeiro, depois o prazo mais próximo,
+	depois a ordem de chegada.
+	"""
+
+	production = models.ForeignKey(
+		Production,
+		on_delete=models.CASCADE,
+		related_name='machine_requests',
+		db_column='production_id',
+	)
+	owner = models.ForeignKey(
+		settings.AUTH_USER_MODEL,
+		on_delete=models.CASCADE,
+		related_name='machine_requests',
+		db_column='owner_user_id',
+	)
+	machine_model = models.CharField(max_length=255)
+	priority = models.SmallIntegerField(default=0)
+	due_at = models.DateTimeField(null=True, blank=True)
+	status = models.CharField(max_length=16, choices=MachineRequestStatus.choices, default=MachineRequestStatus.WAITING)
+	assigned_machine = models.ForeignKey(
+		Machine,
+		on_delete=models.PROTECT,
+		null=True,
+		blank=True,
+		related_name='machine_requests',
+		db_column='assigned_machine_id',
+	)
+	assigned_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ('-priority', 'due_at', 'id')
+		indexes = [
+			# Cabeça da fila de um modelo: busca no índice, sem varrer os pedidos em espera.
+			models.Index(
+				fields=['owner', 'machine_model', 'status', '-priority', 'due_at', 'id'],
+				name='machine_request_queue',
+			),
+		]
+
+	def __str__(self):
+		return f'{self.machine_model} p/ produção #{self.production_id} ({self.status})'
+
+
+class CounterFlush(BaseModel):
+	"""
+	Lote do journal de contagem já aplicado neste banco.
+
+	Gravado na mesma transação dos UPDATEs de `produced`: reaplicar o mesmo arquivo de
+	journal depois de uma queda não soma as unidades duas vezes.
+	"""
+
+	batch_id = models.CharField(max_length=64, unique=True)
+	events = models.PositiveIntegerField(default=0)
+	units = models.PositiveBigIntegerField(default=0)
+
+	class Meta:
+		ordering = ('-id',)
+
+	def __str__(self):
+		return self.batch_id
+
+
+class SyncOutcome(models.TextChoices):
+	APPLIED = 'APPLIED', 'Aplicado'
+	NOOP = 'NOOP', 'Já estava assim'
+	CONFLICT = 'CONFLICT', 'Conflito'
+	REJECTED = 'REJECTED', 'Rejeitado'
+
+
+class SyncEvent(BaseModel):
+	"""
+	Evento de ciclo de vida enviado por um terminal offline (factory/sync.py).
+
+	A chave de idempotência é única por usuário: reenviar o mesmo lote depois de uma
+	queda de conexão devolve o resultado gravado em vez de aplicar de novo.
+	"""
+
+	user = models.ForeignKey(
+		settings.AUTH_USER_MODEL,
+		on_delete=models.CASCADE,
+		related_name='sync_events',
+		db_column='user_id',
+	)
+	key = models.CharField(max_length=64)
+	kind = models.CharField(max_length=32)
+	target_id = models.BigIntegerField(null=True, blank=True)
+	client_at = models.DateTimeField(null=True, blank=True)
+	outcome = models.CharField(max_length=16, choices=SyncOutcome.choices)
+	status = models.CharField(max_length=16, blank=True, default='')
+	detail = models.CharField(max_length=255, blank=True, default='')
+
+	class Meta:
+		ordering = ('-id',)
+		constraints = [
+			models.UniqueConstraint(fields=['user', 'key'], name='uniq_sync_event_key'),
+		]
+
+	def __str__(self):
+		return f'{self.key} ({self.kind}: {self.outcome})'
+
+
+class RollupGranularity(models.TextChoices):
+	HOUR = 'HOUR', 'Hora'
+	DAY = 'DAY', 'Dia'
+
+
+def bucket_start(at, granularity: str):
+	"""Início do bucket (hora ou dia, no fuso do projeto) que contém `at`."""
+	local = timezone.localtime(at).replace(minute=0, second=0, microsecond=0)
+	if granularity == RollupGranularity.DAY:
+		local = local.replace(hour=0)
+	return local
+
+
+class Rollup(BaseModel):
+	"""
+	Contadores pré-agregados por hora e por dia.
+
+	Atualizados incrementalmente pelos métodos de ciclo de vida (start/finish/cancel) na
+	mesma transação da transição; `backfill_rollups` reconstrói a partir das linhas brutas.
+	"""
+
+	granularity = models.CharField(max_length=4, choices=RollupGranularity.choices)
+	bucket = models.DateTimeField()
+	working_minutes = models.PositiveBigIntegerField(default=0)
+
+	owner_field: str = ''
+
+	class Meta:
+		abstract = True
+
+	@classmethod
+	def bump(cls, owner_id, at, **deltas):
+		"""Soma `deltas` nos buckets de hora e de dia de `at` (UPDATE ... SET campo = campo + n)."""
+		deltas = {field: value for field, value in deltas.items() if value}
+		if not deltas:
+			return
+		for granularity in RollupGranularity.values:
+			row, _ = cls.all_objects.get_or_create(
+				granularity=granularity,
+				bucket=bucket_start(at, granularity),
+				**{f'{cls.owner_field}_id': owner_id},
+			)
+			cls.all_objects.filter(pk=row.pk).update(
+				updated_at=timezone.now(),
+				**{field: F(field) + value for field, value in deltas.items()},
+			)
+
+
+class UserRollup(Rollup):
+	user = models.ForeignKey(
+		settings.AUTH_USER_MODEL,
+		on_delete=models.CASCADE,
+		related_name='rollups',
+		db_column='user_id',
+	)
+	productions_started = models.PositiveIntegerField(default=0)
+	productions_finished = models.PositiveIntegerField(default=0)
+	productions_canceled = models.PositiveIntegerField(default=0)
+	quantity_produced = models.PositiveBigIntegerField(default=0)
+
+	owner_field = 'user'
+
+	class Meta:
+		ordering = ('-bucket',)
+		constraints = [
+			models.UniqueConstraint(fields=['user', 'granularity', 'bucket'], name='uniq_user_rollup_bucket'),
+		]
+
+
+class MachineRollup(Rollup):
+	machine = models.ForeignKey(
+		Machine,
+		on_delete=models.CASCADE,
+		related_name='rollups',
+		db_column='machine_id',
+	)
+	executions_started = models.PositiveIntegerField(default=0)
+	executions_finished = models.PositiveIntegerField(default=0)
+	executions_canceled = models.PositiveIntegerField(default=0)
+
+	owner_field = 'machine'
+
+	class Meta:
+		ordering = ('-bucket',)
+		constraints = [
+			models.UniqueConstraint(fields=['machine', 'granularity', 'bucket'], name='uniq_machine_rollup_bucket'),
+		]
 
-# Create your models here.
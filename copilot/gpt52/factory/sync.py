@@ -0,0 +1,193 @@
+"""
+Sincronização de terminais offline: eventos de ciclo de vida enviados em lote.
+
+O terminal enfileira localmente cada ação (iniciar/finalizar/cancelar produção, finalizar/
+cancelar máquina) com o horário em que aconteceu e uma chave de idempotência, e ao
+reconectar manda tudo num único `POST /sync/`. O servidor:
+
+- aplica os eventos na ordem da fila do terminal, cada um na sua transação;
+- usa o horário do cliente (limitado a "agora" e ao início da execução) como horário da
+  transição, para working_time e rollups refletirem quando a ação aconteceu de fato;
+- resolve conflitos pelas mesmas regras de status das telas: o estado atual do banco vence,
+  e o evento volta como CONFLICT com o status atual;
+- grava o resultado em `SyncEvent` na mesma transação; reenviar a mesma chave devolve
+  o resultado gravado sem aplicar de novo.
+
+A resposta inclui o feed de mudanças (factory/changes.py) a partir do cursor do cliente.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from core.common.sharding import instance_transaction
+
+from .models import (
+	Production,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+	SyncEvent,
+	SyncOutcome,
+)
+
+MAX_EVENTS = 500
+
+PRODUCTION_CLOSED = {ProductionStatus.FINISHED, ProductionStatus.CANCELED}
+MACHINE_CLOSED = {ProductionMachineStatus.FINISHED, ProductionMachineStatus.CANCELED}
+
+
+class InvalidEvent(ValueError):
+	pass
+
+
+def _client_time(value, now):
+	"""Horário do evento no cliente; ausente ou no futuro (relógio adiantado) vira `now`."""
+	if not value:
+		return now
+	try:
+		at = datetime.fromisoformat(str(value))
+	except ValueError:
+		raise InvalidEvent('at deve estar em ISO 8601.')
+	if timezone.is_naive(at):
+		at = timezone.make_aware(at)
+	return min(at, now)
+
+
+def _not_before(at, *floors):
+	return max([at, *[floor for floor in floors if floor is not None]])
+
+
+def _production_start(production: Production, at):
+	if production.status in PRODUCTION_CLOSED:
+		return SyncOutcome.CONFLICT, 'Produção já encerrada'
+	if production.status == ProductionStatus.ONGOING:
+		return SyncOutcome.NOOP, ''
+	production.start(start_time=_not_before(at, production.created_at))
+	return SyncOutcome.APPLIED, ''
+
+
+def _production_close(target_status, method_name):
+	def handler(production: Production, at):
+		if production.status == target_status:
+			return SyncOutcome.NOOP, ''
+		try:
+			getattr(production, method_name)(_not_before(at, production.created_at, production.started_at))
+		except ValueError as exc:
+			return SyncOutcome.CONFLICT, str(exc)
+		return SyncOutcome.APPLIED, ''
+
+	return handler
+
+
+def _machine_close(target_status, method_name):
+	def handler(pm: ProductionMachine, at):
+		if pm.status == target_status:
+			return SyncOutcome.NOOP, ''
+		if pm.status in MACHINE_CLOSED:
+			return SyncOutcome.CONFLICT, f'Execução já está {pm.status}'
+		# Mesmo ajuste das views: execução que não iniciou herda o início da produção.
+		pm.inherit_production_start()
+		getattr(pm, method_name)(_not_before(at, pm.started_at))
+		return SyncOutcome.APPLIED, ''
+
+	return handler
+
+
+# tipo do evento -> (modelo alvo, campo do dono, handler)
+HANDLERS = {
+	'production.start': (Production, 'user', _production_start),
+	'production.finish': (Production, 'user', _production_close(ProductionStatus.FINISHED, 'finish')),
+	'production.cancel': (Production, 'user', _production_close(ProductionStatus.CANCELED, 'cancel')),
+	'production_machine.finish': (
+		ProductionMachine,
+		'production__user',
+		_machine_close(ProductionMachineStatus.FINISHED, 'finish'),
+	),
+	'production_machine.cancel': (
+		ProductionMachine,
+		'production__user',
+		_machine_close(ProductionMachineStatus.CANCELED, 'cancel'),
+	),
+}
+
+
+def _result(event: SyncEvent, duplicate: bool = False) -> dict:
+	return {
+		'key': event.key,
+		'type': event.kind,
+		'id': event.target_id,
+		'outcome': event.outcome,
+		'status': event.status,
+		'detail': event.detail,
+		'duplicate': duplicate,
+	}
+
+
+def _apply(user, key: str, payload: dict, now) -> SyncEvent:
+	kind = payload.get('type')
+	event = SyncEvent(user=user, key=key, kind=str(kind or '')[:32])
+	try:
+		if kind not in HANDLERS:
+			raise InvalidEvent(f'Tipo de evento desconhecido: {kind}')
+		try:
+			event.target_id = int(payload.get('id'))
+		except (TypeError, ValueError):
+			raise InvalidEvent('id deve ser um inteiro.')
+		event.client_at = _client_time(payload.get('at'), now)
+	except InvalidEvent as exc:
+		event.outcome, event.detail = SyncOutcome.REJECTED, str(exc)
+		event.save()
+		return event
+
+	model, owner_field, handler = HANDLERS[kind]
+	target = (
+		model.objects.filter(**{owner_field: user}, pk=event.target_id)
+		.select_related(*(['production'] if model is ProductionMachine else []))
+		.first()
+	)
+	if target is None:
+		event.outcome, event.detail = SyncOutcome.REJECTED, 'Registro não encontrado.'
+		event.save()
+		return event
+
+	with instance_transaction(target):
+		target._lock()  # decide o conflito sobre o estado travado, não sobre a leitura acima
+		event.outcome, event.detail = handler(target, event.client_at)
+		event.status = target.status
+		event.save(using=target._state.db)
+	return event
+
+
+def apply_events(user, events: list) -> list[dict]:
+	"""Aplica os eventos na ordem recebida e devolve um resultado por evento, na mesma ordem."""
+	if len(events) > MAX_EVENTS:
+		raise InvalidEvent(f'No máximo {MAX_EVENTS} eventos por lote.')
+	keys = []
+	for payload in events:
+		key = payload.get('key') if isinstance(payload, dict) else None
+		if not isinstance(key, str) or not 0 < len(key) <= 64:
+			raise InvalidEvent('Todo evento precisa de uma key (texto de até 64 caracteres).')
+		keys.append(key)
+
+	# Uma query para as chaves já vistas (reenvio do lote após falha de rede).
+	seen = {event.key: event for event in SyncEvent.objects.filter(user=user, key__in=keys)}
+	now = timezone.now()
+	results = []
+	for key, payload in zip(keys, events):
+		if key in seen:
+			results.append(_result(seen[key], duplicate=True))
+			continue
+		try:
+			seen[key] = _apply(user, key, payload, now)
+		except IntegrityError:
+			# Mesmo lote enviado em paralelo: a outra requisição gravou a chave primeiro (e a
+			# transição deste evento foi desfeita junto com o SyncEvent).
+			seen[key] = SyncEvent.objects.get(user=user, key=key)
+			results.append(_result(seen[key], duplicate=True))
+			continue
+		results.append(_result(seen[key]))
+	return results
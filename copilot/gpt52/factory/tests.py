@@ -1,3 +1,623 @@
-from django.test import TestCase
+import atexit
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, router
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.common.db import STICKY_COOKIE, ReplicaStickinessMiddleware
+from core.common.sharding import SHARD_ID_SPAN, tenant_context
+
+from . import changes, dispatch, heartbeat, ingest
+from .admin import EstimatedCountPaginator
+from .devices import issue_token
+from .models import (
+	CounterFlush,
+	Machine,
+	MachineRequest,
+	MachineRequestStatus,
+	MachineRollup,
+	Production,
+	ProductionMachine,
+	ProductionMachineStatus,
+	ProductionStatus,
+	RollupGranularity,
+	SyncEvent,
+	SyncOutcome,
+	UserRollup,
+)
+
+
+class ConcurrentTransitionStressTest(TransactionTestCase):
+	"""Dispara transições concorrentes (threads) e verifica os invariantes do ciclo de vida."""
+
+	productions_count = 6
+	threads_per_production = 4
+
+	def setUp(self):
+		self.user = User.objects.create_user(name='stress', email='stress@example.com', cnpj='1', password='x')
+		self.productions = []
+		for i in range(self.productions_count):
+			production = Production.objects.create(description=f'P{i}', quantity=1, user=self.user)
+			for j in range(2):
+				machine = Machine.objects.create(model='M', serialnumber=f'SN-{i}-{j}', owner=self.user)
+				ProductionMachine.objects.create(production=production, machine=machine)
+			production.start()
+			self.productions.append(production)
+
+	def _hammer(self, targets):
+		"""Executa cada alvo em uma thread própria, liberadas ao mesmo tempo."""
+		barrier = threading.Barrier(len(targets))
+		errors = []
+
+		def run(target):
+			try:
+				barrier.wait()
+				target()
+			except ValueError:
+				pass  # transição recusada pela regra de negócio: esperado sob concorrência
+			except Exception as exc:
+				errors.append(exc)
+			finally:
+				connection.close()
+
+		threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(errors, [])
+
+	def _stale(self, production_id):
+		# Cada thread recebe sua própria instância (estado lido antes da corrida).
+		return Production.objects.get(pk=production_id)
+
+	def test_parallel_finish_and_cancel_keep_invariants(self):
+		for production in self.productions:
+			for pm in production.production_machines.all():
+				pm.finish()
+
+		targets = []
+		for production in self.productions:
+			for k in range(self.threads_per_production):
+				stale = self._stale(production.pk)
+				targets.append(stale.finish if k % 2 == 0 else stale.cancel)
+		self._hammer(targets)
+
+		for production in Production.objects.filter(pk__in=[p.pk for p in self.productions]):
+			self.assertIn(production.status, {ProductionStatus.FINISHED, ProductionStatus.CANCELED})
+			# exatamente um desfecho registrado
+			self.assertNotEqual(production.finished_at is None, production.canceled_at is None)
+
+	def test_parallel_machine_cancel_and_production_finish(self):
+		targets = []
+		for production in self.productions:
+			for pm in ProductionMachine.objects.filter(production=production):
+				targets.append(pm.cancel)
+			targets.append(self._stale(production.pk).finish)
+		self._hammer(targets)
+
+		for production in Production.objects.filter(pk__in=[p.pk for p in self.productions]):
+			open_machines = production.production_machines.filter(
+				status__in=[ProductionMachineStatus.STANDBY, ProductionMachineStatus.ONGOING],
+			)
+			if production.status == ProductionStatus.FINISHED:
+				self.assertFalse(open_machines.exists())
+			for pm in production.production_machines.all():
+				# nenhuma execução com os dois desfechos
+				self.assertFalse(pm.finished_at is not None and pm.canceled_at is not None)
+
+
+class ProductionHistogramTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='hist', email='hist@example.com', cnpj='2', password='x')
+		Production.objects.create(description='P', quantity=1, user=self.user)
+		self.client.force_login(self.user)
+
+	def test_missing_or_blank_dates_default_to_last_week(self):
+		url = reverse('production_histogram')
+		for params in ({}, {'date_from': '', 'date_to': ''}, {'date_from': ''}):
+			response = self.client.get(url, params)
+			self.assertEqual(response.status_code, 200, params)
+			days = response.json()['days']
+			self.assertEqual(len(days), 7)
+			self.assertEqual(sum(day['total'] for day in days), 1)
+
+
+class AdminChangelistTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='admin-list', email='admin-list@example.com', cnpj='3', password='x')
+		for i in range(5):
+			Machine.objects.create(model='Prensa' if i else 'Torno', serialnumber=f'SN-{i}', owner=self.user)
+
+	def _paginator(self, queryset):
+		paginator = EstimatedCountPaginator(queryset, 50)
+		paginator.count_cap = 3
+		return paginator
+
+	def test_unfiltered_list_over_cap_uses_table_estimate(self):
+		paginator = self._paginator(Machine.objects.all())
+		with self.assertNumQueries(2):  # COUNT com LIMIT + MAX/MIN do id
+			self.assertEqual(paginator.count, 5)
+
+	def test_filtered_list_counts_once_and_exactly(self):
+		paginator = self._paginator(Machine.objects.filter(model='Prensa'))
+		with self.assertNumQueries(1):
+			self.assertEqual(paginator.count, 4)
+
+	def test_serial_prefix_is_ored_with_other_search_fields(self):
+		model_admin = admin.site._registry[Machine]
+		results, _ = model_admin.get_search_results(None, Machine.objects.all(), 'SN-1')
+		self.assertEqual([m.serialnumber for m in results.order_by('id')], ['SN-1'])
+		results, _ = model_admin.get_search_results(None, Machine.objects.all(), 'Torno')
+		self.assertEqual([m.serialnumber for m in results], ['SN-0'])
+
+
+class CounterIngestTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='ingest', email='ingest@example.com', cnpj='4', password='x')
+		self.production = Production.objects.create(description='P', quantity=100, user=self.user)
+		self.journal_dir = Path(tempfile.mkdtemp())
+		self.addCleanup(shutil.rmtree, self.journal_dir, ignore_errors=True)
+		self.buffer = ingest.CounterBuffer(self.journal_dir, flush_events=1000, flush_seconds=3600, fsync=False)
+		self.addCleanup(atexit.unregister, self.buffer.flush)  # o banco de teste não existe mais no atexit
+
+	def _produced(self):
+		return Production.objects.values_list('produced', flat=True).get(pk=self.production.pk)
+
+	def _write_batch(self, name, lines):
+		path = self.journal_dir / name
+		path.write_text(''.join(lines), encoding='utf-8')
+		return path
+
+	def _line(self, units):
+		return json.dumps({'db': 'default', 'p': self.production.pk, 'n': units}) + '\n'
+
+	def test_flush_applies_pending_units_once(self):
+		for units in (2, 3):
+			self.buffer.add('default', self.production.pk, units)
+		self.assertEqual(self.buffer.pending('default', self.production.pk), 5)
+
+		self.assertEqual(self.buffer.flush(), 5)
+		self.assertEqual(self.buffer.flush(), 0)
+		self.assertEqual(self._produced(), 5)
+		self.assertEqual(self.buffer.pending('default', self.production.pk), 0)
+		self.assertEqual(CounterFlush.objects.count(), 1)
+
+	def test_failed_flush_keeps_units_pending(self):
+		self.buffer.add('default', self.production.pk, 4)
+		with mock.patch.object(ingest, 'apply_journal', side_effect=OperationalError('database is locked')):
+			with self.assertRaises(OperationalError):
+				self.buffer.flush()
+		self.assertEqual(self.buffer.pending('default', self.production.pk), 4)
+
+		self.assertEqual(self.buffer.flush(), 4)  # o .flushing que falhou é reaplicado
+		self.assertEqual(self.buffer.pending('default', self.production.pk), 0)
+		self.assertEqual(self._produced(), 4)
+
+	def test_replayed_batch_is_applied_once(self):
+		lines = [self._line(1), self._line(2)]
+		path = self._write_batch('1-1-abc.flushing', lines)
+		self.assertEqual(ingest.apply_journal(path), 3)
+		# Queda depois do commit e antes de apagar o arquivo: o mesmo lote volta a ser aplicado.
+		path = self._write_batch('1-1-abc.flushing', lines)
+		self.assertEqual(ingest.apply_journal(path), 0)
+		self.assertFalse(path.exists())
+		self.assertEqual(self._produced(), 3)
+		self.assertEqual(CounterFlush.objects.get().units, 3)
+
+	def test_recover_applies_journal_of_dead_process(self):
+		dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+		dead.wait()
+		# Última linha cortada no meio da escrita: nunca foi confirmada ao cliente.
+		self._write_batch(f'{dead.pid}.log', [self._line(5), self._line(6), '{"db": "def'])
+		self._write_batch(f'{os.getpid()}.log', [self._line(100)])  # processo vivo: fica
+
+		self.assertEqual(ingest.recover(self.journal_dir), 11)
+		self.assertEqual(self._produced(), 11)
+		self.assertEqual([path.name for path in self.journal_dir.iterdir()], [f'{os.getpid()}.log'])
+
+
+class DeviceTokenTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='device', email='device@example.com', cnpj='5', password='x')
+		self.machine = Machine.objects.create(model='M', serialnumber='DEV-1', owner=self.user)
+		self.token = issue_token(self.machine)
+		# Dispositivo: sem sessão e com a checagem de CSRF ligada, como um cliente real.
+		self.device = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f'Device {self.token}')
+		# Buffer próprio: nada pendente para o flush do atexit depois que o banco de teste some.
+		patcher = mock.patch.object(heartbeat, 'buffer', heartbeat.HeartbeatBuffer(flush_seconds=3600))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_heartbeat_with_token_needs_no_session_or_csrf(self):
+		response = self.device.post(reverse('machine_heartbeat'))
+		self.assertEqual(response.status_code, 204)
+		self.assertIsNotNone(heartbeat.buffer.last_seen('default', self.machine.id))
+
+	def test_invalid_or_replaced_token_is_refused(self):
+		issue_token(self.machine)
+		response = self.device.post(reverse('machine_heartbeat'))
+		self.assertEqual(response.status_code, 401)
+		response = self.client.post(reverse('machine_heartbeat'), HTTP_AUTHORIZATION=f'Device {self.machine.id}.x')
+		self.assertEqual(response.status_code, 401)
+
+	def test_report_produced_only_from_a_running_machine(self):
+		production = Production.objects.create(description='P', quantity=10, user=self.user)
+		pm = ProductionMachine.objects.create(production=production, machine=self.machine)
+		other = Production.objects.create(description='Q', quantity=10, user=self.user)
+		ProductionMachine.objects.create(
+			production=other, machine=Machine.objects.create(model='M', serialnumber='DEV-2', owner=self.user),
+		)
+		production.start()
+		other.start()
+		buffer = ingest.CounterBuffer(tempfile.mkdtemp(), flush_events=1000, flush_seconds=3600, fsync=False)
+		self.addCleanup(shutil.rmtree, buffer.journal_dir, ignore_errors=True)
+		self.addCleanup(atexit.unregister, buffer.flush)  # o banco de teste não existe mais no atexit
+
+		with mock.patch.object(ingest, 'buffer', buffer):
+			with self.assertNumQueries(3):  # máquina + dono, produção, execução
+				response = self.device.post(
+					reverse('production_report_produced', args=[production.id]), {'units': 2},
+				)
+			self.assertEqual(response.status_code, 202)
+			self.assertEqual(response.json()['produced'], 2)
+
+			response = self.device.post(reverse('production_report_produced', args=[other.id]), {'units': 2})
+			self.assertEqual(response.status_code, 403)
+			pm.finish()
+			response = self.device.post(reverse('production_report_produced', args=[production.id]), {'units': 2})
+			self.assertEqual(response.status_code, 403)
+
+	def test_browser_session_still_needs_csrf(self):
+		browser = Client(enforce_csrf_checks=True)
+		browser.force_login(self.user)
+		response = browser.post(reverse('machine_heartbeat'), {'serialnumber': 'DEV-1'})
+		self.assertEqual(response.status_code, 403)
+
+
+class SyncDeviceTokenTest(TestCase):
+	def test_terminal_syncs_and_pages_changes_with_device_token(self):
+		user = User.objects.create_user(name='terminal', email='terminal@example.com', cnpj='6', password='x')
+		machine = Machine.objects.create(model='M', serialnumber='TERM-1', owner=user)
+		production = Production.objects.create(description='P', quantity=1, user=user)
+		ProductionMachine.objects.create(production=production, machine=machine)
+		terminal = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f'Device {issue_token(machine)}')
+
+		response = terminal.post(
+			reverse('sync_api'),
+			json.dumps({'events': [{'key': 'k1', 'type': 'production.start', 'id': production.id}]}),
+			content_type='application/json',
+		)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['results'][0]['outcome'], SyncOutcome.APPLIED)
+		self.assertEqual(SyncEvent.objects.get().user, user)
+
+		response = terminal.get(reverse('changes_api'))
+		self.assertEqual(response.status_code, 200)
+
+
+class ReplicaStickinessTest(TestCase):
+	def _response(self, view):
+		return ReplicaStickinessMiddleware(view)(RequestFactory().post('/'))
+
+	def test_choosing_the_write_database_does_not_pin_the_client(self):
+		def view(request):
+			router.db_for_write(Machine)
+			Machine.objects.exists()
+			return HttpResponse()
+
+		self.assertNotIn(STICKY_COOKIE, self._response(view).cookies)
+
+	def test_real_write_pins_the_client_to_the_primary(self):
+		user = User.objects.create_user(name='sticky', email='sticky@example.com', cnpj='7', password='x')
+
+		def view(request):
+			Machine.objects.create(model='M', serialnumber='STICKY-1', owner=user)
+			return HttpResponse()
+
+		self.assertIn(STICKY_COOKIE, self._response(view).cookies)
+
+
+class TenantShardingTest(TransactionTestCase):
+	"""Dois shards SQLite temporários, migrados por `migrate_shards` como em produção."""
+
+	shards = ('shard_0', 'shard_1')
+	# '__all__' é resolvido no setUpClass, depois que os shards entram em connections.
+	databases = '__all__'
+
+	@classmethod
+	def setUpClass(cls):
+		cls.shards_dir = Path(tempfile.mkdtemp())
+		for alias in cls.shards:
+			connections.settings[alias] = {
+				**connections.settings['default'],
+				'NAME': str(cls.shards_dir / f'{alias}.sqlite3'),
+				'TEST': {**connections.settings['default']['TEST'], 'NAME': None},
+			}
+		super().setUpClass()
+		call_command('migrate_shards', verbosity=0, stdout=io.StringIO())
+
+	@classmethod
+	def tearDownClass(cls):
+		try:
+			super().tearDownClass()
+		finally:
+			for alias in cls.shards:
+				connections[alias].close()
+				del connections[alias]
+				del connections.settings[alias]
+			shutil.rmtree(cls.shards_dir, ignore_errors=True)
+
+	def _tenant(self, name, shard):
+		user = User.objects.create_user(name=name, email=f'{name}@example.com', cnpj=name, password='x')
+		user.shard = shard
+		user.save(update_fields=['shard'])
+		return user
+
+	def test_factory_queries_need_a_tenant(self):
+		with self.assertRaises(RuntimeError):
+			Machine.objects.count()
+		self.assertEqual(User.objects.count(), 0)  # diretório: sempre no default
+
+		user = self._tenant('routing', 1)
+		self.assertEqual(router.db_for_read(Machine, instance=user), 'shard_1')
+		with tenant_context('shard_0'):
+			self.assertEqual(router.db_for_write(Machine), 'shard_0')
+			self.assertEqual(Machine.objects.count(), 0)
+
+	def test_instance_transaction_writes_to_the_instance_shard(self):
+		user = self._tenant('atomic', 1)
+		with tenant_context('shard_1'):
+			production = Production.objects.create(description='P', quantity=1, user=user)
+			machine = Machine.objects.create(model='M', serialnumber='SH-1', owner=user)
+			ProductionMachine.objects.create(production=production, machine=machine)
+		# Fora do tenant: o método de ciclo de vida abre a transação (e o tenant) do shard da instância.
+		production.start()
+		self.assertEqual(
+			ProductionMachine.objects.using('shard_1').get().status, ProductionMachineStatus.ONGOING,
+		)
+
+	def test_migrate_shards_reserves_disjoint_id_ranges(self):
+		user = self._tenant('ranges', 0)
+		ids = {}
+		for alias in self.shards:
+			with tenant_context(alias):
+				ids[alias] = Machine.objects.create(model='M', serialnumber=f'R-{alias}', owner=user).pk
+		self.assertLess(ids['shard_0'], SHARD_ID_SPAN)
+		self.assertGreater(ids['shard_1'], SHARD_ID_SPAN)
+
+	@override_settings(INGEST_JOURNAL_DIR=Path(tempfile.gettempdir()) / 'move-tenant-test')
+	def test_move_tenant_keeps_ids_and_foreign_keys(self):
+		user = self._tenant('mover', 0)
+		with tenant_context('shard_0'):
+			machine = Machine.objects.create(model='M', serialnumber='MV-1', owner=user)
+			production = Production.objects.create(description='P', quantity=1, user=user)
+			pm = ProductionMachine.objects.create(production=production, machine=machine)
+			production.start()
+			created_at = Production.objects.get(pk=production.pk).created_at
+
+		call_command('move_tenant', user.pk, 1, stdout=io.StringIO())
+
+		user.refresh_from_db()
+		self.assertEqual(user.shard, 1)
+		with tenant_context('shard_1'):
+			moved = ProductionMachine.objects.select_related('production', 'machine').get(pk=pm.pk)
+			self.assertEqual((moved.production_id, moved.machine_id), (production.pk, machine.pk))
+			self.assertEqual(moved.production.created_at, created_at)
+			self.assertEqual(moved.status, ProductionMachineStatus.ONGOING)
+		with tenant_context('shard_0'):
+			self.assertFalse(Production.all_objects.exists())
+			self.assertFalse(Machine.all_objects.exists())
+
+
+class MachineDispatchTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='dispatch', email='dispatch@example.com', cnpj='8', password='x')
+
+	def _production(self, description, start=False):
+		production = Production.objects.create(description=description, quantity=1, user=self.user)
+		if start:
+			production.start()
+		return production
+
+	def _request(self, production, priority=0, due_at=None):
+		return MachineRequest.objects.create(
+			production=production, owner=self.user, machine_model='Prensa', priority=priority, due_at=due_at,
+		)
+
+	def test_queue_pops_priority_then_due_date_then_arrival(self):
+		production = self._production('P')
+		tomorrow = timezone.now() + timedelta(days=1)
+		no_due = self._request(production)
+		due = self._request(production, due_at=tomorrow)
+		urgent = self._request(production, priority=1)
+		due_later_arrival = self._request(production, due_at=tomorrow)
+
+		queue = dispatch.DispatchQueue.load([no_due, due, urgent, due_later_arrival])
+		popped = [queue.pop(self.user.id, 'Prensa') for _ in range(4)]
+		self.assertEqual(popped, [urgent, due, due_later_arrival, no_due])
+		self.assertIsNone(queue.pop(self.user.id, 'Prensa'))
+
+	def test_finish_and_cancel_hand_the_machine_to_the_next_request(self):
+		machine = Machine.objects.create(model='Prensa', serialnumber='DSP-1', owner=self.user)
+		current = self._production('atual')
+		pm = ProductionMachine.objects.create(production=current, machine=machine)
+		current.start()
+		waiting_ongoing = self._production('em andamento', start=True)
+		waiting_standby = self._production('em espera')
+		low = self._request(waiting_ongoing)
+		high = self._request(waiting_standby, priority=5)
+
+		pm.finish()
+		high.refresh_from_db()
+		self.assertEqual((high.status, high.assigned_machine_id), (MachineRequestStatus.ASSIGNED, machine.id))
+		handed = ProductionMachine.objects.get(production=waiting_standby)
+		self.assertEqual(handed.status, ProductionMachineStatus.STANDBY)
+
+		handed.cancel()
+		low.refresh_from_db()
+		self.assertEqual(low.status, MachineRequestStatus.ASSIGNED)
+		started = ProductionMachine.objects.get(production=waiting_ongoing)
+		# Produção já em andamento: a execução começa na hora da atribuição.
+		self.assertEqual(started.status, ProductionMachineStatus.ONGOING)
+		self.assertIsNotNone(started.started_at)
+
+
+class ChangeFeedTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='feed', email='feed@example.com', cnpj='9', password='x')
+		self.client.force_login(self.user)
+
+	def test_pages_through_rows_with_the_same_updated_at(self):
+		productions = [Production.objects.create(description=f'P{i}', quantity=1, user=self.user) for i in range(5)]
+		# Mesmo updated_at em todas: o desempate pelo id não pode pular nem repetir linhas.
+		Production.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+		seen, cursor = [], ''
+		for _ in range(5):
+			page = self.client.get(reverse('changes_api'), {'cursor': cursor, 'limit': 2}).json()
+			seen += [row['id'] for row in page['changes']['productions']]
+			cursor = page['next_cursor']
+			if not page['has_more']:
+				break
+		self.assertEqual(seen, [p.id for p in sorted(productions, key=lambda p: p.id)])
+
+		page = self.client.get(reverse('changes_api'), {'cursor': cursor}).json()
+		self.assertEqual(page['changes']['productions'], [])
+
+	def test_recent_changes_wait_for_the_settle_window(self):
+		production = Production.objects.create(description='P', quantity=1, user=self.user)
+		now = timezone.now()
+
+		page = changes.changes_since(self.user, None, now=now)
+		self.assertEqual(page['changes']['productions'], [])
+		page = changes.changes_since(self.user, page['next_cursor'], now=now + timedelta(seconds=settings.SYNC_SETTLE_SECONDS + 1))
+		self.assertEqual([row['id'] for row in page['changes']['productions']], [production.id])
+
+	def test_invalid_cursor_is_rejected(self):
+		response = self.client.get(reverse('changes_api'), {'cursor': 'não-é-cursor'})
+		self.assertEqual(response.status_code, 400)
+
+
+class OfflineSyncTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='sync', email='sync@example.com', cnpj='10', password='x')
+		self.client.force_login(self.user)
+		self.production = Production.objects.create(description='P', quantity=1, user=self.user)
+
+	def _sync(self, *events):
+		response = self.client.post(reverse('sync_api'), json.dumps({'events': list(events)}), content_type='application/json')
+		self.assertEqual(response.status_code, 200)
+		return response.json()['results']
+
+	def test_outcomes_follow_the_current_status(self):
+		other = User.objects.create_user(name='other', email='other@example.com', cnpj='11', password='x')
+		foreign = Production.objects.create(description='Q', quantity=1, user=other)
+		results = self._sync(
+			{'key': 'a', 'type': 'production.start', 'id': self.production.id},
+			{'key': 'b', 'type': 'production.start', 'id': self.production.id},
+			{'key': 'c', 'type': 'production.cancel', 'id': self.production.id},
+			{'key': 'd', 'type': 'production.start', 'id': self.production.id},
+			{'key': 'e', 'type': 'production.explode', 'id': self.production.id},
+			{'key': 'f', 'type': 'production.start', 'id': foreign.id},
+		)
+		self.assertEqual(
+			[(r['outcome'], r['status']) for r in results],
+			[
+				(SyncOutcome.APPLIED, ProductionStatus.ONGOING),
+				(SyncOutcome.NOOP, ProductionStatus.ONGOING),
+				(SyncOutcome.APPLIED, ProductionStatus.CANCELED),
+				(SyncOutcome.CONFLICT, ProductionStatus.CANCELED),
+				(SyncOutcome.REJECTED, ''),
+				(SyncOutcome.REJECTED, ''),
+			],
+		)
+		foreign.refresh_from_db()
+		self.assertEqual(foreign.status, ProductionStatus.STANDBY)
+
+	def test_replayed_batch_returns_recorded_results_without_reapplying(self):
+		Production.objects.filter(pk=self.production.pk).update(created_at=timezone.now() - timedelta(days=1))
+		at = (timezone.now() - timedelta(hours=1)).isoformat()
+		event = {'key': 'start-1', 'type': 'production.start', 'id': self.production.id, 'at': at}
+		first = self._sync(event)
+		self.production.refresh_from_db()
+		started_at = self.production.started_at
+
+		replay = self._sync(event)
+		self.assertEqual(replay[0]['outcome'], first[0]['outcome'])
+		self.assertTrue(replay[0]['duplicate'])
+		self.assertEqual(SyncEvent.objects.filter(key='start-1').count(), 1)
+		self.production.refresh_from_db()
+		self.assertEqual(self.production.started_at, started_at)
+		self.assertLess(started_at, timezone.now() - timedelta(minutes=59))  # horário do terminal
+
+
+class RollupTest(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(name='rollup', email='rollup@example.com', cnpj='12', password='x')
+		self.client.force_login(self.user)
+
+	def _snapshot(self):
+		return {
+			'user': sorted(UserRollup.objects.values_list(
+				'user_id', 'granularity', 'bucket', 'productions_started', 'productions_finished',
+				'productions_canceled', 'quantity_produced', 'working_minutes',
+			)),
+			'machine': sorted(MachineRollup.objects.values_list(
+				'machine_id', 'granularity', 'bucket', 'executions_started', 'executions_finished',
+				'executions_canceled', 'working_minutes',
+			)),
+		}
+
+	def _machine_totals(self, machine):
+		# Soma os dias: perto da meia-noite o início e o fim caem em buckets diferentes.
+		return MachineRollup.objects.filter(machine=machine, granularity=RollupGranularity.DAY).aggregate(
+			started=Sum('executions_started'),
+			finished=Sum('executions_finished'),
+			canceled=Sum('executions_canceled'),
+		)
+
+	def test_incremental_rollups_match_backfill(self):
+		now = timezone.now()
+		machines = [Machine.objects.create(model='M', serialnumber=f'RU-{i}', owner=self.user) for i in range(3)]
+		finished = Production.objects.create(description='F', quantity=7, user=self.user)
+		pms = [ProductionMachine.objects.create(production=finished, machine=m) for m in machines[:2]]
+		finished.start(start_time=now - timedelta(hours=3))
+		pms[0].finish(finish_time=now - timedelta(hours=2))
+		pms[1].cancel(cancel_time=now - timedelta(hours=1))
+		# Execução vinculada depois do início: nunca iniciou e herda o início ao ser finalizada.
+		late = ProductionMachine.objects.create(production=finished, machine=machines[2])
+		self.client.post(reverse('production_machine_finish', args=[finished.id, late.id]))
+		finished.finish()
+
+		canceled = Production.objects.create(description='C', quantity=1, user=self.user)
+		canceled.start(start_time=now - timedelta(minutes=30))
+		canceled.cancel()
+
+		late.refresh_from_db()
+		self.assertEqual(late.started_at, finished.started_at)
+		self.assertEqual(self._machine_totals(machines[2]), {'started': 1, 'finished': 1, 'canceled': 0})
+		self.assertEqual(self._machine_totals(machines[0]), {'started': 1, 'finished': 1, 'canceled': 0})
+		self.assertEqual(self._machine_totals(machines[1]), {'started': 1, 'finished': 0, 'canceled': 1})
+
+		incremental = self._snapshot()
+		call_command('backfill_rollups', stdout=io.StringIO())
+		self.assertEqual(incremental, self._snapshot())
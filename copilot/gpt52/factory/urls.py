@@ -5,13 +5,30 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('machines/', views.machine_list, name='machine_list'),
+    path('machines/heartbeat/', views.machine_heartbeat, name='machine_heartbeat'),
     path('machines/<int:machine_id>/delete/', views.machine_delete, name='machine_delete'),
+    path('machines/<int:machine_id>/timeline/', views.machine_timeline, name='machine_timeline'),
+    path('machines/<int:machine_id>/timeline.json', views.machine_timeline_api, name='machine_timeline_api'),
+    path('sync/', views.sync_api, name='sync_api'),
+    path('sync/changes/', views.changes_api, name='changes_api'),
     path('productions/', views.production_list, name='production_list'),
+    path('productions/histogram/', views.production_histogram, name='production_histogram'),
     path('productions/<int:production_id>/', views.production_detail, name='production_detail'),
     path('productions/<int:production_id>/delete/', views.production_delete, name='production_delete'),
     path('productions/<int:production_id>/start/', views.production_start, name='production_start'),
     path('productions/<int:production_id>/cancel/', views.production_cancel, name='production_cancel'),
     path('productions/<int:production_id>/finish/', views.production_finish, name='production_finish'),
+    path('productions/<int:production_id>/produced/', views.production_report_produced, name='production_report_produced'),
+    path(
+        'productions/<int:production_id>/machine-requests/',
+        views.production_request_machine,
+        name='production_request_machine',
+    ),
+    path(
+        'productions/<int:production_id>/machine-requests/<int:request_id>/cancel/',
+        views.machine_request_cancel,
+        name='machine_request_cancel',
+    ),
     path(
         'productions/<int:production_id>/machines/<int:pm_id>/cancel/',
         views.production_machine_cancel,
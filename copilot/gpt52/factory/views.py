@@ -1,23 +1,43 @@
 from __future__ import annotations
 
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 
-from .forms import MachineForm, ProductionForm
+from core.common.db import use_replica
+from core.common.sharding import instance_transaction, tenant_alias
+
+from . import changes, heartbeat, ingest, sync
+from .devices import device_or_login_required
+from .dispatch import dispatch_idle
+from .forms import MachineForm, MachineRequestForm, ProductionFilterForm, ProductionForm
 from .models import (
 	Machine,
+	MachineRequest,
+	MachineRequestStatus,
 	Production,
 	ProductionMachine,
 	ProductionMachineStatus,
 	ProductionStatus,
+	RollupGranularity,
+	UserRollup,
+	bucket_start,
 )
 
 
 @login_required
+@use_replica
 def dashboard(request):
 	productions = Production.objects.filter(user=request.user).order_by('-id')
 
@@ -32,6 +52,18 @@ def dashboard(request):
 	used_machines = Machine.objects.filter(owner=request.user, id__in=used_machine_ids).distinct().count()
 	available_machines = total_machines - used_machines
 
+	# Últimos 7 dias: no máximo 7 linhas do rollup diário, em vez de varrer as execuções.
+	week = UserRollup.objects.filter(
+		user=request.user,
+		granularity=RollupGranularity.DAY,
+		bucket__gte=bucket_start(timezone.now() - timedelta(days=6), RollupGranularity.DAY),
+	).aggregate(
+		finished=Sum('productions_finished', default=0),
+		canceled=Sum('productions_canceled', default=0),
+		quantity=Sum('quantity_produced', default=0),
+		working_minutes=Sum('working_minutes', default=0),
+	)
+
 	return render(
 		request,
 		'factory/dashboard.html',
@@ -40,11 +72,13 @@ def dashboard(request):
 			'ongoing_count': ongoing_count,
 			'used_machines': used_machines,
 			'available_machines': available_machines,
+			'week': week,
 		},
 	)
 
 
 @login_required
+@use_replica
 def machine_list(request):
 	machines = Machine.objects.filter(owner=request.user).order_by('-id')
 	if request.method == 'POST':
@@ -59,13 +93,204 @@ def machine_list(request):
 	else:
 		form = MachineForm(user=request.user)
 
-	return render(request, 'factory/machines.html', {'machines': machines, 'form': form})
+	# Pings ainda não gravados (heartbeat coalescido) valem mais que o last_seen do banco.
+	machines = list(machines)
+	for machine in machines:
+		machine.seen_at = heartbeat.buffer.last_seen(machine._state.db, machine.id) or machine.last_seen
+	# Pings de outros workers podem estar até HEARTBEAT_FLUSH_SECONDS atrás no banco.
+	stale_before = timezone.now() - timedelta(
+		seconds=settings.HEARTBEAT_STALE_SECONDS + settings.HEARTBEAT_FLUSH_SECONDS
+	)
+
+	return render(
+		request,
+		'factory/machines.html',
+		{'machines': machines, 'form': form, 'stale_before': stale_before},
+	)
+
+
+@require_POST
+@device_or_login_required
+def machine_heartbeat(request):
+	"""
+	Ping da máquina. Com o token do dispositivo, o corpo pode vir vazio; logado no
+	navegador, identifica a máquina por `{"serialnumber": "..."}` (JSON ou formulário).
+
+	Só atualiza o mapa em memória; o banco recebe o last_seen em lote a cada
+	HEARTBEAT_FLUSH_SECONDS (factory/heartbeat.py).
+	"""
+	if request.device is not None:
+		heartbeat.buffer.record(request.device._state.db, request.device.id)
+		return HttpResponse(status=204)
+
+	try:
+		payload = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+		serialnumber = str(payload.get('serialnumber', '')).strip()
+	except (ValueError, AttributeError):
+		return JsonResponse({'error': 'Corpo inválido.'}, status=400)
+	if not serialnumber:
+		return JsonResponse({'error': 'serialnumber é obrigatório.'}, status=400)
+
+	alias = tenant_alias(request.user)
+	machine_id = heartbeat.buffer.machine_id(alias, request.user.id, serialnumber)
+	if machine_id is None:
+		return JsonResponse({'error': 'Máquina não encontrada.'}, status=404)
+	heartbeat.buffer.record(alias, machine_id)
+	return HttpResponse(status=204)
+
+
+TIMELINE_PAGE_SIZE = 50
+
+
+def _encode_timeline_cursor(pm: ProductionMachine) -> str:
+	raw = f'{pm.started_at.isoformat()}|{pm.id}'
+	return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_timeline_cursor(token: str):
+	try:
+		started_at, pk = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+		return datetime.fromisoformat(started_at), int(pk)
+	except (ValueError, UnicodeDecodeError):
+		return None
+
+
+def _machine_timeline(machine: Machine, cursor: str | None):
+	"""
+	Execuções da máquina, da mais recente para a mais antiga, com paginação por chave
+	(started_at, id): cada página é uma busca no índice (machine, started_at), sem OFFSET.
+
+	Execuções que nunca iniciaram não têm started_at e ficam fora da linha do tempo.
+	"""
+	executions = (
+		ProductionMachine.objects.filter(machine=machine, started_at__isnull=False)
+		.select_related('production')
+		.order_by('-started_at', '-id')
+	)
+	if cursor:
+		position = _decode_timeline_cursor(cursor)
+		if position is None:
+			return None
+		started_at, pk = position
+		executions = executions.filter(Q(started_at__lt=started_at) | Q(started_at=started_at, id__lt=pk))
+
+	page = list(executions[: TIMELINE_PAGE_SIZE + 1])
+	has_more = len(page) > TIMELINE_PAGE_SIZE
+	page = page[:TIMELINE_PAGE_SIZE]
+
+	now = timezone.now()
+	for pm in page:
+		end = pm.finished_at or pm.canceled_at
+		if end is None:
+			# Em andamento: duração até agora, mesmo cálculo do working_time.
+			pm.duration_minutes = pm._compute_working_time_minutes(now)
+		else:
+			pm.duration_minutes = pm.working_time
+
+	totals = ProductionMachine.objects.filter(machine=machine).aggregate(
+		executions=Count('id'),
+		working_minutes=Sum('working_time', default=0),
+		**{
+			status.lower(): Count('id', filter=Q(status=status))
+			for status in ProductionMachineStatus.values
+		},
+	)
+
+	return {
+		'executions': page,
+		'totals': totals,
+		'next_cursor': _encode_timeline_cursor(page[-1]) if has_more else None,
+	}
+
+
+@login_required
+@use_replica
+def machine_timeline(request, machine_id: int):
+	machine = get_object_or_404(Machine, id=machine_id, owner=request.user)
+	timeline = _machine_timeline(machine, request.GET.get('cursor'))
+	if timeline is None:
+		return HttpResponseBadRequest('Cursor inválido')
+	return render(request, 'factory/machine_timeline.html', {'machine': machine, **timeline})
+
+
+@login_required
+@use_replica
+def machine_timeline_api(request, machine_id: int):
+	machine = get_object_or_404(Machine, id=machine_id, owner=request.user)
+	timeline = _machine_timeline(machine, request.GET.get('cursor'))
+	if timeline is None:
+		return JsonResponse({'error': 'Cursor inválido'}, status=400)
+
+	return JsonResponse({
+		'machine': {'id': machine.id, 'model': machine.model, 'serialnumber': machine.serialnumber},
+		'totals': timeline['totals'],
+		'executions': [
+			{
+				'id': pm.id,
+				'production_id': pm.production_id,
+				'production': pm.production.description,
+				'status': pm.status,
+				'started_at': pm.started_at.isoformat(),
+				'finished_at': pm.finished_at.isoformat() if pm.finished_at else None,
+				'canceled_at': pm.canceled_at.isoformat() if pm.canceled_at else None,
+				'duration_minutes': pm.duration_minutes,
+			}
+			for pm in timeline['executions']
+		],
+		'next_cursor': timeline['next_cursor'],
+	})
+
+
+@device_or_login_required
+def changes_api(request):
+	"""
+	Mudanças desde `?cursor=` (vazio = tudo), até `?limit=` linhas por modelo.
+	O cliente aplica as linhas (upsert por id; `deleted_at` preenchido = excluída), guarda
+	`next_cursor` e repete enquanto `has_more` for verdadeiro.
+	"""
+	try:
+		limit = min(max(int(request.GET.get('limit', changes.DEFAULT_LIMIT)), 1), changes.MAX_LIMIT)
+	except ValueError:
+		return JsonResponse({'error': 'limit deve ser um inteiro.'}, status=400)
+	try:
+		page = changes.changes_since(request.user, request.GET.get('cursor'), limit)
+	except changes.InvalidCursor as exc:
+		return JsonResponse({'error': str(exc)}, status=400)
+	return JsonResponse(page)
+
+
+@require_POST
+@device_or_login_required
+def sync_api(request):
+	"""
+	Lote de eventos de um terminal que ficou offline (factory/sync.py):
+	`{"cursor": "...", "events": [{"key": "...", "type": "production.start", "id": 1, "at": "..."}]}`.
+
+	Devolve um resultado por evento e as mudanças desde `cursor`, como em /sync/changes/.
+	"""
+	try:
+		payload = json.loads(request.body)
+		events = payload.get('events', [])
+		if not isinstance(events, list):
+			raise ValueError
+	except (ValueError, AttributeError):
+		return JsonResponse({'error': 'Corpo deve ser um JSON com a lista "events".'}, status=400)
+
+	try:
+		changes.decode_cursor(payload.get('cursor'))  # cursor inválido: falha antes de aplicar
+		results = sync.apply_events(request.user, events)
+		page = changes.changes_since(request.user, payload.get('cursor'))
+	except (changes.InvalidCursor, sync.InvalidEvent) as exc:
+		return JsonResponse({'error': str(exc)}, status=400)
+	return JsonResponse({'results': results, **page})
 
 
 @login_required
+@use_replica
 def production_list(request):
+	filter_form = ProductionFilterForm(request.GET or None, user=request.user)
 	productions = (
-		Production.objects.filter(user=request.user)
+		filter_form.filter(Production.objects.filter(user=request.user))
 		.prefetch_related('production_machines__machine')
 		.order_by('-id')
 	)
@@ -79,13 +304,80 @@ def production_list(request):
 	else:
 		form = ProductionForm(user=request.user)
 
-	return render(request, 'factory/productions.html', {'productions': productions, 'form': form})
+	last_week = timezone.localdate() - timedelta(days=6)
+	return render(
+		request,
+		'factory/productions.html',
+		{
+			'productions': productions,
+			'form': form,
+			'filter_form': filter_form,
+			'last_week': last_week.isoformat(),
+		},
+	)
+
+
+HISTOGRAM_MAX_DAYS = 366
+
+
+@login_required
+@use_replica
+def production_histogram(request):
+	"""
+	Quantidade de produções por dia (JSON), com os mesmos filtros da lista.
+
+	Sem período informado, considera os últimos 7 dias. Dias sem produções vêm com 0.
+	"""
+	params = request.GET.copy()
+	today = timezone.localdate()
+	# Campos em branco (o formulário "Filtrar" envia `date_from=`) também caem no padrão.
+	if not params.get('date_from'):
+		params['date_from'] = (today - timedelta(days=6)).isoformat()
+	if not params.get('date_to'):
+		params['date_to'] = today.isoformat()
+
+	filter_form = ProductionFilterForm(params, user=request.user)
+	if not filter_form.is_valid():
+		return JsonResponse({'errors': filter_form.errors}, status=400)
+
+	date_field = filter_form.selected_date_field
+	rows = (
+		filter_form.filter(Production.objects.filter(user=request.user))
+		.annotate(day=TruncDate(date_field))
+		.values('day', 'status')
+		.annotate(total=Count('id'))
+		.order_by()
+	)
+
+	date_from = filter_form.cleaned_data['date_from']
+	date_to = filter_form.cleaned_data['date_to']
+	if (date_to - date_from).days >= HISTOGRAM_MAX_DAYS:
+		return JsonResponse({'errors': {'__all__': [f'Período máximo de {HISTOGRAM_MAX_DAYS} dias.']}}, status=400)
+	buckets = {
+		date_from + timedelta(days=offset): {'total': 0, 'by_status': {}}
+		for offset in range((date_to - date_from).days + 1)
+	}
+	for row in rows:
+		bucket = buckets.get(row['day'])
+		if bucket is None:
+			continue
+		bucket['total'] += row['total']
+		bucket['by_status'][row['status']] = row['total']
+
+	return JsonResponse({
+		'date_field': date_field,
+		'days': [{'day': day.isoformat(), **values} for day, values in buckets.items()],
+	})
+
+
+MAX_UNITS_PER_REPORT = 10_000
 
 
 @login_required
 def production_detail(request, production_id: int):
 	production = get_object_or_404(Production, id=production_id, user=request.user)
 	pms = ProductionMachine.objects.filter(production=production).select_related('machine').order_by('id')
+	machine_requests = MachineRequest.objects.filter(production=production).select_related('assigned_machine')
 	return render(
 		request,
 		'factory/production_detail.html',
@@ -93,10 +385,93 @@ def production_detail(request, production_id: int):
 			'production': production,
 			'pms': pms,
 			'can_finish': production.can_finish(),
+			# Inclui o que este processo já aceitou e ainda não foi gravado no banco.
+			'produced': production.produced + ingest.buffer.pending(production._state.db, production.id),
+			'machine_requests': machine_requests,
+			'request_form': MachineRequestForm(production=production),
+		},
+	)
+
+
+@require_POST
+@device_or_login_required
+def production_report_produced(request, production_id: int):
+	"""
+	Incremento de unidades produzidas: `{"units": n}` (JSON ou formulário).
+
+	Responde 202 assim que o incremento está no journal; o banco é atualizado em lote
+	(factory/ingest.py). Só produções ONGOING aceitam contagem e, com o token do
+	dispositivo, só a partir de uma máquina com execução ONGOING nela.
+	"""
+	production = get_object_or_404(Production, id=production_id, user=request.user)
+	if production.status != ProductionStatus.ONGOING:
+		return JsonResponse({'error': 'A produção não está em andamento.'}, status=409)
+	if request.device is not None and not ProductionMachine.objects.filter(
+		production=production,
+		machine=request.device,
+		status=ProductionMachineStatus.ONGOING,
+	).exists():
+		return JsonResponse({'error': 'A máquina não está executando esta produção.'}, status=403)
+
+	try:
+		payload = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+		units = int(payload.get('units', 1))
+	except (ValueError, TypeError, AttributeError):
+		return JsonResponse({'error': 'units deve ser um inteiro.'}, status=400)
+	if not 1 <= units <= MAX_UNITS_PER_REPORT:
+		return JsonResponse({'error': f'units deve estar entre 1 e {MAX_UNITS_PER_REPORT}.'}, status=400)
+
+	alias = production._state.db
+	ingest.buffer.add(alias, production.id, units)
+	return JsonResponse(
+		{
+			'production': production.id,
+			'accepted': units,
+			'produced': production.produced + ingest.buffer.pending(alias, production.id),
+			'quantity': production.quantity,
 		},
+		status=202,
 	)
 
 
+@require_POST
+@login_required
+def production_request_machine(request, production_id: int):
+	production = get_object_or_404(Production, id=production_id, user=request.user)
+	form = MachineRequestForm(request.POST, production=production)
+	if not form.is_valid():
+		for error in form.errors.values():
+			messages.error(request, ' '.join(error))
+		return redirect('production_detail', production_id=production.id)
+
+	with instance_transaction(production):
+		machine_request = form.save()
+		# Se já houver máquina livre do modelo, atribui agora (respeitando a ordem da fila).
+		assigned = dispatch_idle(owner_id=production.user_id, machine_model=machine_request.machine_model)
+
+	if any(pm.production_id == production.id for pm in assigned):
+		messages.success(request, 'Máquina livre encontrada e atribuída à produção.')
+	else:
+		messages.success(request, 'Pedido na fila: a produção recebe a próxima máquina liberada desse modelo.')
+	return redirect('production_detail', production_id=production.id)
+
+
+@require_POST
+@login_required
+def machine_request_cancel(request, production_id: int, request_id: int):
+	updated = MachineRequest.objects.filter(
+		id=request_id,
+		production_id=production_id,
+		production__user=request.user,
+		status=MachineRequestStatus.WAITING,
+	).update(status=MachineRequestStatus.CANCELED, updated_at=timezone.now())
+	if updated:
+		messages.success(request, 'Pedido de máquina cancelado.')
+	else:
+		messages.error(request, 'Pedido não encontrado ou já atendido.')
+	return redirect('production_detail', production_id=production_id)
+
+
 @require_POST
 @login_required
 def production_start(request, production_id: int):
@@ -134,19 +509,20 @@ def production_finish(request, production_id: int):
 
 
 def _get_pm_for_user(user, production_id: int, pm_id: int) -> ProductionMachine:
-	pm = get_object_or_404(ProductionMachine, id=pm_id, production_id=production_id)
-	if pm.production.user_id != user.id:
-		raise Http404()
-	return pm
+	# Uma query: a posse é checada no WHERE e a produção já vem junto (pm.production sem novo SELECT)
+	return get_object_or_404(
+		ProductionMachine.objects.select_related('production', 'machine'),
+		id=pm_id,
+		production_id=production_id,
+		production__user=user,
+	)
 
 
 @require_POST
 @login_required
 def production_machine_cancel(request, production_id: int, pm_id: int):
 	pm = _get_pm_for_user(request.user, production_id, pm_id)
-	if pm.started_at is None and pm.production.started_at is not None:
-		pm.started_at = pm.production.started_at
-		pm.save(update_fields=['started_at', 'updated_at'])
+	pm.inherit_production_start()
 	pm.cancel()
 	messages.success(request, 'Execução cancelada para esta máquina (sem alterar a produção).')
 	return redirect('production_detail', production_id=production_id)
@@ -156,9 +532,7 @@ def production_machine_cancel(request, production_id: int, pm_id: int):
 @login_required
 def production_machine_finish(request, production_id: int, pm_id: int):
 	pm = _get_pm_for_user(request.user, production_id, pm_id)
-	if pm.started_at is None and pm.production.started_at is not None:
-		pm.started_at = pm.production.started_at
-		pm.save(update_fields=['started_at', 'updated_at'])
+	pm.inherit_production_start()
 	pm.finish()
 	messages.success(request, 'Máquina marcada como FINISHED (sem alterar a produção).')
 	return redirect('production_detail', production_id=production_id)
@@ -0,0 +1,11 @@
+THEME_COOKIE = 'theme_mode'
+THEMES = ('light', 'dark')
+
+
+def theme(request):
+    """Tema vindo do cookie; sem cookie usa a preferência salva no usuário (já carregada pelo auth)."""
+    mode = request.COOKIES.get(THEME_COOKIE)
+    if mode not in THEMES:
+        user = getattr(request, 'user', None)
+        mode = getattr(user, 'theme_mode', 'light') if user is not None else 'light'
+    return {'theme_mode': mode if mode in THEMES else 'light'}
@@ -3,6 +3,9 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.contrib import messages
+from django.db import transaction
+from django.http import Http404
+from .context_processors import THEME_COOKIE, theme
 from .models import Machine, Production, ProductionMachine, User
 
 def register(request):
@@ -83,14 +86,33 @@ def production_create(request):
         if not machine_ids:
             messages.error(request, "Selecione ao menos uma máquina para iniciar a produção.")
         else:
-            prod = Production.objects.create(
-                description=request.POST['description'],
-                quantity=request.POST['quantity'],
-                user=request.user
-            )
-            for m_id in machine_ids:
-                m = get_object_or_404(Machine, id=m_id, owner=request.user)
-                ProductionMachine.objects.create(production=prod, machine=m)
+            with transaction.atomic():
+                # Uma query trava e valida (dono) todas as máquinas selecionadas de uma vez
+                machines = list(
+                    Machine.objects.select_for_update().filter(owner=request.user, id__in=set(machine_ids))
+                )
+                if len(machines) != len(set(machine_ids)):
+                    raise Http404('Máquina não encontrada')
+
+                # ... e outra confere a disponibilidade de todas, já com o lock
+                busy = ProductionMachine.objects.filter(
+                    machine__in=machines,
+                    production__status__in=['STANDBY', 'ONGOING'],
+                    status__in=['STANDBY', 'ONGOING', 'HALT']
+                ).exists()
+                if busy:
+                    messages.error(request, "Uma ou mais máquinas selecionadas já estão em outra produção ativa.")
+                    return render(request, 'production_form.html', {'machines': available_machines})
+
+                prod = Production.objects.create(
+                    description=request.POST['description'],
+                    quantity=request.POST['quantity'],
+                    user=request.user
+                )
+                # Um único INSERT para todos os vínculos
+                ProductionMachine.objects.bulk_create(
+                    [ProductionMachine(production=prod, machine=m) for m in machines]
+                )
             return redirect('dashboard')
             
     return render(request, 'production_form.html', {'machines': available_machines})
@@ -145,7 +167,8 @@ def update_status(request, pk, target, status):
 
 @login_required
 def toggle_theme(request):
-    user = request.user
-    user.theme_mode = 'dark' if user.theme_mode == 'light' else 'light'
-    user.save()
-    return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
\ No newline at end of file
+    # Tema persiste só no cookie: alternar não grava a linha do usuário
+    current = theme(request)['theme_mode']
+    response = redirect(request.META.get('HTTP_REFERER', 'dashboard'))
+    response.set_cookie(THEME_COOKIE, 'dark' if current == 'light' else 'light', max_age=60 * 60 * 24 * 365, samesite='Lax')
+    return response
\ No newline at end of file
@@ -41,6 +41,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.theme',
             ],
         },
     },
@@ -53,6 +54,13 @@ DATABASES = {
     }
 }
 
+# Engine de sessão configurável: cached_db (padrão), signed_cookies ou db
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[os.environ.get('DJANGO_SESSION_ENGINE', 'cached_db')]
+
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'core/static')]
 LOGIN_REDIRECT_URL = '/'
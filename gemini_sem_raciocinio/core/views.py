@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.db import transaction
 from .models import Machine, Production, ProductionMachine
 from .forms import MachineForm, ProductionForm
 from .forms import UserRegistrationForm
@@ -61,24 +62,34 @@ def production_create(request):
     if request.method == 'POST':
         form = ProductionForm(request.POST, user=request.user)
         if form.is_valid():
-            prod = form.save(commit=False)
-            prod.user = request.user
-            prod.status = 'ONGOING' # Inicia como Ongoing ao criar
-            prod.started_at = timezone.now()
-            prod.save()
-            
-            # Associa as máquinas selecionadas
-            machines = form.cleaned_data['selected_machines']
-            for m in machines:
-                ProductionMachine.objects.create(
-                    production=prod, 
-                    machine=m, 
-                    status='ONGOING', 
-                    started_at=timezone.now()
-                )
-            
-            messages.success(request, "Produção iniciada com sucesso.")
-            return redirect('dashboard')
+            selected_ids = [m.id for m in form.cleaned_data['selected_machines']]
+            with transaction.atomic():
+                # Trava as máquinas escolhidas e confere a disponibilidade de todas numa query só
+                machines = list(Machine.objects.select_for_update().filter(owner=request.user, id__in=selected_ids))
+                busy = ProductionMachine.objects.filter(
+                    machine__in=machines,
+                    production__status__in=['STANDBY', 'ONGOING']
+                ).exists()
+
+                if busy or len(machines) != len(selected_ids):
+                    form.add_error('selected_machines', "Uma ou mais máquinas não estão mais disponíveis.")
+                else:
+                    now = timezone.now()
+                    prod = form.save(commit=False)
+                    prod.user = request.user
+                    prod.status = 'ONGOING' # Inicia como Ongoing ao criar
+                    prod.started_at = now
+                    prod.save()
+
+                    # Associa as máquinas selecionadas com um único INSERT
+                    ProductionMachine.objects.bulk_create([
+                        ProductionMachine(production=prod, machine=m, status='ONGOING', started_at=now)
+                        for m in machines
+                    ])
+
+            if form.is_valid():
+                messages.success(request, "Produção iniciada com sucesso.")
+                return redirect('dashboard')
     else:
         form = ProductionForm(user=request.user)
     return render(request, 'production_form.html', {'form': form})